@@ -1,5 +1,5 @@
 import streamlit as st
-from utils.constants import STREAMLIT_CSS_STYLES, APP_NAME
+from utils.constants import STREAMLIT_CSS_STYLES, APP_NAME, DEFAULT_MAX_WORKERS
 from streamlit_dir.side_bar import cwp_sidebar
 from streamlit_dir.elements.chunk_processor_panel import process_chunks_ui
 
@@ -111,6 +111,10 @@ def main():
         st.subheader("🧩 Process Chunks")
 
         start_btn = st.button(label="🚀 Start Chunk Processing", type="primary")
+        stop_btn = st.button(
+            label="⏹️ Stop Processing",
+            help="Stops sending chunks; requests already in flight finish and are saved."
+        )
         st.markdown("<br>", unsafe_allow_html=True)
 
         process_chunks_ui(
@@ -118,7 +122,12 @@ def main():
             prompt,
             chunk_file_path,
             chunk_count=st.session_state.get("num_chunks", 2),
-            run_now=start_btn
+            max_workers=st.session_state.get("max_workers", DEFAULT_MAX_WORKERS),
+            use_cache=st.session_state.get("use_response_cache", True),
+            adaptive_concurrency=st.session_state.get("adaptive_concurrency", False),
+            hedge_requests=st.session_state.get("hedge_requests", False),
+            run_now=start_btn,
+            stop_requested=stop_btn
         )
     else:
         st.warning(
@@ -0,0 +1,82 @@
+"""
+Times chunk row serialization across chunk sizes and column counts, comparing the
+original iterrows-based formatter with the column-wise `format_rows`, and reports
+the size of each compact layout relative to the default one.
+
+Usage:
+    python -m benchmarks.bench_format_input [--repeat 5]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from model.core.llms.row_formats import ROW_FORMATTERS, format_rows
+from model.core.llms.token_estimator import estimate_tokens
+
+CHUNK_SIZES = (25, 100, 500)
+COLUMN_COUNTS = (5, 20, 50)
+
+
+def legacy_format_rows(df: pd.DataFrame) -> str:
+    """Row formatting as originally implemented in BaseLLMClient._format_input."""
+    blocks = []
+    df = df.fillna("")
+    for idx, row in df.iterrows():
+        lines = [f"Row {idx + 1}:"]
+        for col in df.columns:
+            lines.append(f"- {col}: {row[col]}")
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+
+def make_frame(rows: int, columns: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = {}
+    for i in range(columns):
+        kind = i % 3
+        if kind == 0:
+            data[f"text_{i}"] = [f"value {v}" for v in rng.integers(0, 1000, rows)]
+        elif kind == 1:
+            data[f"int_{i}"] = rng.integers(0, 10_000, rows)
+        else:
+            values = rng.random(rows).round(4)
+            values[rng.random(rows) < 0.1] = np.nan
+            data[f"float_{i}"] = values
+    return pd.DataFrame(data)
+
+
+def best_time(func, df: pd.DataFrame, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>5} {'cols':>5} {'iterrows ms':>12} {'columnar ms':>12} {'speedup':>8}")
+    for rows in CHUNK_SIZES:
+        for columns in COLUMN_COUNTS:
+            df = make_frame(rows, columns)
+            assert format_rows(df) == legacy_format_rows(df)
+            legacy = best_time(legacy_format_rows, df, args.repeat)
+            current = best_time(format_rows, df, args.repeat)
+            print(f"{rows:>5} {columns:>5} {legacy * 1000:>12.2f} {current * 1000:>12.2f} {legacy / current:>7.1f}x")
+
+    df = make_frame(100, 20)
+    baseline = estimate_tokens(format_rows(df))
+    print(f"\nEstimated tokens for 100 rows x 20 columns (baseline: rows = {baseline})")
+    for name, formatter in ROW_FORMATTERS.items():
+        tokens = estimate_tokens(formatter(df))
+        print(f"{name:>6}: {tokens:>7} ({tokens / baseline:.0%})")
+
+
+if __name__ == "__main__":
+    main()
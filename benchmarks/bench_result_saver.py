@@ -0,0 +1,118 @@
+"""
+Measures SQLiteResultSaver insert throughput against the original implementation,
+which reconnected and inserted one row per statement into a single results table.
+
+Usage:
+    python -m benchmarks.bench_result_saver [--chunks 200] [--rows 25]
+"""
+import argparse
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from model.io.sqlite_result_saver import SQLiteResultSaver
+
+
+PROMPT = (
+    "You are a careful annotator. Classify the sentiment of each customer review as "
+    "positive, negative or neutral, and answer with the label only."
+)
+
+
+def make_chunk(chunk_index: int, rows: int):
+    return [
+        {
+            "source_id": f"src-{chunk_index}-{row}",
+            "chunk_id": f"chunk-{chunk_index}",
+            "prompt": PROMPT,
+            "response": "positive",
+            "used_tokens": 120,
+            "model_version": "gemini-2.0-flash",
+        }
+        for row in range(rows)
+    ]
+
+
+def legacy_save(db_path: Path, results):
+    """The per-row, connection-per-call insert loop SQLiteResultSaver used to run."""
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.cursor()
+        for item in results:
+            cursor.execute("""
+                INSERT OR IGNORE INTO results (
+                    source_id, chunk_id, prompt, response, used_tokens, model_version, timestamp
+                ) VALUES (?, ?, ?, ?, ?, ?, ?);
+            """, (
+                item["source_id"],
+                item["chunk_id"],
+                item["prompt"],
+                item["response"],
+                item.get("used_tokens"),
+                item["model_version"],
+                datetime.utcnow().isoformat() + "Z"
+            ))
+        conn.commit()
+
+
+def create_legacy_table(db_path: Path):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source_id TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                response TEXT NOT NULL,
+                used_tokens INTEGER,
+                model_version TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                UNIQUE(source_id, prompt)
+            );
+        """)
+
+
+def run_legacy(db_path: Path, chunks) -> float:
+    start = time.perf_counter()
+    for results in chunks:
+        # The UI used to construct a new saver (and run CREATE TABLE) for every chunk
+        create_legacy_table(db_path)
+        legacy_save(db_path, results)
+    return time.perf_counter() - start
+
+
+def run_current(db_path: Path, chunks) -> float:
+    start = time.perf_counter()
+    with SQLiteResultSaver(db_path) as saver:
+        for results in chunks:
+            saver.save(results)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=25)
+    args = parser.parse_args()
+
+    chunks = [make_chunk(i, args.rows) for i in range(args.chunks)]
+    total_rows = args.chunks * args.rows
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy_path = Path(tmp_dir) / "legacy.db"
+        current_path = Path(tmp_dir) / "current.db"
+        legacy_seconds = run_legacy(legacy_path, chunks)
+        current_seconds = run_current(current_path, chunks)
+        legacy_size = legacy_path.stat().st_size
+        current_size = current_path.stat().st_size
+
+    print(f"{total_rows} rows in {args.chunks} chunks of {args.rows}")
+    print(f"before: {total_rows / legacy_seconds:>12,.0f} rows/s ({legacy_seconds:.3f}s)")
+    print(f"after:  {total_rows / current_seconds:>12,.0f} rows/s ({current_seconds:.3f}s)")
+    print(f"speedup: {legacy_seconds / current_seconds:.1f}x")
+    print(f"db size: {legacy_size / 1024:,.0f} KiB before, {current_size / 1024:,.0f} KiB after")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import threading
+from typing import Optional
+
+from utils.constants import (
+    DEFAULT_MAX_WORKERS,
+    MAX_WORKERS_LIMIT,
+    CONCURRENCY_LATENCY_TOLERANCE,
+    CONCURRENCY_BACKOFF_RATIO,
+)
+
+
+class AdaptiveConcurrencyLimit:
+    """
+    AIMD limit on the number of chunk requests in flight.
+
+    The limit grows by one after a full window of ``limit`` successful requests
+    whose latency stayed within ``latency_tolerance`` times the smoothed latency,
+    and is multiplied by ``backoff_ratio`` when the runner reports an overload
+    error or a latency spike. After a decrease, further overload signals are
+    ignored until as many requests as the new limit have completed, since requests
+    already in flight were sent under the old limit.
+
+    ``limit`` is read by the dispatcher before every lease and is the metric shown
+    while processing. Safe to share between worker threads.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = DEFAULT_MAX_WORKERS,
+        min_limit: int = 1,
+        max_limit: int = MAX_WORKERS_LIMIT,
+        latency_tolerance: float = CONCURRENCY_LATENCY_TOLERANCE,
+        backoff_ratio: float = CONCURRENCY_BACKOFF_RATIO,
+        smoothing: float = 0.2,
+    ):
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError("Concurrency limits must satisfy 1 <= min_limit <= max_limit.")
+        if not 0 < backoff_ratio < 1:
+            raise ValueError("backoff_ratio must be between 0 and 1.")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        self.smoothing = smoothing
+        self.limit = min(max(int(initial_limit), min_limit), max_limit)
+        self.latency: Optional[float] = None
+        self.decreases = 0
+        self._successes = 0
+        self._cooldown = 0
+        self._lock = threading.Lock()
+
+    def record_success(self, latency: float):
+        """Feeds the latency of a successful request; grows the limit while latencies stay stable."""
+        with self._lock:
+            self._completed()
+            if self.latency is not None and latency > self.latency * self.latency_tolerance:
+                self._decrease()
+            else:
+                self._successes += 1
+                if self._successes >= self.limit:
+                    self.limit = min(self.limit + 1, self.max_limit)
+                    self._successes = 0
+            self.latency = latency if self.latency is None else (
+                (1 - self.smoothing) * self.latency + self.smoothing * latency
+            )
+
+    def record_failure(self):
+        """Counts a request that ended in an error other than an overload."""
+        with self._lock:
+            self._completed()
+            self._successes = 0
+
+    def record_overload(self):
+        """Backs off after the service signalled overload (timeouts, 503s, quota errors)."""
+        with self._lock:
+            self._decrease()
+
+    def _completed(self):
+        if self._cooldown > 0:
+            self._cooldown -= 1
+
+    def _decrease(self):
+        self._successes = 0
+        if self._cooldown > 0:
+            return
+        self.limit = max(self.min_limit, int(self.limit * self.backoff_ratio))
+        self.decreases += 1
+        self._cooldown = self.limit
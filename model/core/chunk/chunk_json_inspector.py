@@ -2,7 +2,8 @@ import json
 from pathlib import Path
 from typing import Optional, Dict, Any
 
-from utils.constants import TEMP_DIR
+from model.core.chunk.chunk_store import ProgressJournal
+from utils.constants import TEMP_DIR, JSONL_CHUNK_FORMAT
 
 
 class ChunkJSONInspector:
@@ -81,8 +82,16 @@ class ChunkJSONInspector:
         chunk_size = summary.get("chunk_size", 0)
         processed_ids = set(summary.get("processed_ids", []))
 
-        chunks = data.get("chunks", [])
+        # Manifest-based files list their chunks in a lightweight index instead of inline
+        chunks = data.get("chunk_index") if data.get("format") == JSONL_CHUNK_FORMAT else data.get("chunks", [])
         all_chunk_ids = {chunk.get("chunk_id") for chunk in chunks if "chunk_id" in chunk}
+
+        # Progress not yet compacted into the file lives in its journal
+        ids_by_str = {str(chunk_id): chunk_id for chunk_id in all_chunk_ids}
+        processed_ids.update(
+            ids_by_str[chunk_id] for chunk_id in ProgressJournal(Path(file_path)).read()
+            if chunk_id in ids_by_str
+        )
         unprocessed = all_chunk_ids - processed_ids
 
         return {
@@ -106,6 +115,15 @@ class ChunkJSONInspector:
         Returns:
             True if structure looks like a valid chunk file
         """
+        if isinstance(data, dict) and data.get("format") == JSONL_CHUNK_FORMAT:
+            return (
+                isinstance(data.get("chunk_index"), list)
+                and isinstance(data.get("summary"), dict)
+                and "total_chunks" in data["summary"]
+                and isinstance(data.get("data_file"), str)
+                and all("chunk_id" in entry and "offset" in entry for entry in data["chunk_index"])
+            )
+
         return (
             isinstance(data, dict)
             and isinstance(data.get("chunks"), list)
@@ -0,0 +1,134 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional
+from uuid import uuid4
+
+from utils.constants import DEFAULT_LEASE_SECONDS
+
+
+class ChunkLeaseStore:
+    """
+    SQLite-backed chunk leases shared by every worker draining the same chunk file.
+
+    A worker claims a chunk for ``lease_seconds`` and renews the lease while the
+    chunk is being processed; until the lease expires or is released no other
+    owner can claim it. Completed chunks stay recorded so no
+    process picks them up again, even before the chunk file summary is compacted.
+    Several processes on one machine can safely share the database.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        owner: Optional[str] = None,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    ):
+        self.db_path = Path(db_path)
+        self.owner = owner or uuid4().hex
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.db_path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._init_db()
+
+    @classmethod
+    def for_chunk_file(cls, chunk_file_path: str, **kwargs) -> "ChunkLeaseStore":
+        """Opens the lease database stored next to a chunk file as ``<name>.leases.db``."""
+        return cls(Path(chunk_file_path).with_suffix(".leases.db"), **kwargs)
+
+    def _init_db(self):
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL;")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS chunk_leases (
+                    chunk_id TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    done INTEGER NOT NULL DEFAULT 0
+                );
+            """)
+
+    def acquire(self, chunk_ids: Iterable[str], limit: int) -> List[str]:
+        """
+        Claims up to ``limit`` of the given chunks, in order, for this owner.
+
+        A chunk can be claimed when it has no lease, its lease has expired, or it is
+        already leased by this owner. Completed chunks are never claimed.
+
+        Returns:
+            The chunk ids that were claimed.
+        """
+        acquired = []
+        with self._lock:
+            now = time.time()
+            self._conn.execute("BEGIN IMMEDIATE;")
+            try:
+                for chunk_id in chunk_ids:
+                    if len(acquired) >= limit:
+                        break
+                    cursor = self._conn.execute("""
+                        INSERT INTO chunk_leases (chunk_id, owner, expires_at)
+                        VALUES (?, ?, ?)
+                        ON CONFLICT(chunk_id) DO UPDATE SET
+                            owner = excluded.owner,
+                            expires_at = excluded.expires_at
+                        WHERE chunk_leases.done = 0
+                          AND (chunk_leases.expires_at <= ? OR chunk_leases.owner = excluded.owner);
+                    """, (str(chunk_id), self.owner, now + self.lease_seconds, now))
+                    if cursor.rowcount == 1:
+                        acquired.append(str(chunk_id))
+                self._conn.execute("COMMIT;")
+            except Exception:
+                self._conn.execute("ROLLBACK;")
+                raise
+        return acquired
+
+    def renew(self, chunk_ids: Iterable[str]):
+        """Extends this owner's leases on the given chunks by another ``lease_seconds``."""
+        expires_at = time.time() + self.lease_seconds
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE chunk_leases SET expires_at = ? WHERE chunk_id = ? AND owner = ? AND done = 0;",
+                [(expires_at, str(chunk_id), self.owner) for chunk_id in chunk_ids],
+            )
+
+    def release(self, chunk_ids: Iterable[str]):
+        """Returns this owner's unfinished chunks to the pool."""
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM chunk_leases WHERE chunk_id = ? AND owner = ? AND done = 0;",
+                [(str(chunk_id), self.owner) for chunk_id in chunk_ids],
+            )
+
+    def complete(self, chunk_ids: Iterable[str]):
+        """Records chunks as processed so that no owner claims them again."""
+        with self._lock:
+            self._conn.executemany("""
+                INSERT INTO chunk_leases (chunk_id, owner, expires_at, done)
+                VALUES (?, ?, 0, 1)
+                ON CONFLICT(chunk_id) DO UPDATE SET done = 1;
+            """, [(str(chunk_id), self.owner) for chunk_id in chunk_ids])
+
+    def forget(self, chunk_ids: Iterable[str]):
+        """Drops every record of the given chunks, e.g. ids no longer in a re-chunked file."""
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM chunk_leases WHERE chunk_id = ?;", [(str(chunk_id),) for chunk_id in chunk_ids]
+            )
+
+    def completed_ids(self) -> List[str]:
+        """Returns every chunk id recorded as processed by any owner."""
+        with self._lock:
+            rows = self._conn.execute("SELECT chunk_id FROM chunk_leases WHERE done = 1;").fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        """Releases this owner's outstanding leases and closes the connection."""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM chunk_leases WHERE owner = ? AND done = 0;", (self.owner,)
+            )
+            self._conn.close()
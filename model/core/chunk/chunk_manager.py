@@ -1,21 +1,52 @@
-import json
-from typing import Any, Dict, Optional, List, Tuple
+import threading
+import time
+from collections import deque
+from typing import Iterable, Optional, List, Tuple
 import pandas as pd
 from pathlib import Path
 
-from utils.constants import JSON_CHUNK_VERSION
+from model.core.chunk.chunk_lease_store import ChunkLeaseStore
+from model.core.chunk.chunk_store import ProgressJournal, open_chunk_store
+from utils.constants import SUPPORTED_CHUNK_VERSIONS, JOURNAL_COMPACT_INTERVAL, LEASE_HEARTBEAT_SECONDS
 
 
 class ChunkManager:
-    """Manages loading and tracking of chunks from JSON storage."""
+    """
+    Manages loading and tracking of chunks from JSON storage.
 
-    def __init__(self, json_path: str):
+    Supports both version-1.0 single-document chunk files and manifest-based
+    JSON Lines chunk files, whose rows are only read when a chunk is requested.
+
+    Processed chunk ids are appended to a progress journal on every save and only
+    compacted into the chunk file every ``compact_interval`` entries and on `close`.
+    Journal entries left behind by an interrupted run are replayed on load.
+
+    Unprocessed chunk ids are kept in a queue, so finding the next chunk and the
+    remaining count do not rescan the chunk list. Concurrent workers lease chunks
+    with `get_next_chunks`; a leased chunk is not handed out again until it is
+    marked processed or returned with `release_chunks`.
+
+    When a ``lease_store`` is given, leases are also claimed in that shared store,
+    so several sessions or processes can drain the same chunk file without
+    processing a chunk twice. Chunks still being processed must have their leases
+    kept alive with `renew_leases`. Completed records of chunks that are no longer
+    in the chunk file are dropped on load. The manager closes the lease store in `close`.
+    """
+
+    def __init__(
+        self,
+        json_path: str,
+        compact_interval: int = JOURNAL_COMPACT_INTERVAL,
+        lease_store: Optional[ChunkLeaseStore] = None,
+    ):
         self.json_path = Path(json_path)
         self._validate_json_file()
         self._current_chunk_id = None
+        self.lease_store = lease_store
 
-        with open(self.json_path, "r") as f:
-            self.data = json.load(f)
+        self.store = open_chunk_store(self.json_path)
+        self.journal = ProgressJournal(self.json_path)
+        self.compact_interval = max(1, int(compact_interval))
 
         self._check_version()
         self._init_chunk_state()
@@ -32,57 +63,201 @@ class ChunkManager:
             raise ValueError("File must be JSON format")
 
     def _check_version(self):
-        version = self.data.get("version", None)
-        if version is None or version != JSON_CHUNK_VERSION:
+        version = self.store.version
+        if version is None or version not in SUPPORTED_CHUNK_VERSIONS:
             raise ValueError(f"Unsupported or missing JSON version: {version}")
 
     def _init_chunk_state(self):
-        self.chunks = self.data.get("chunks", [])
-        self.summary = self.data.get("summary", {})
+        self.chunk_ids = self.store.chunk_ids
+        self.summary = self.store.summary
         raw_ids = self.summary.get("processed_ids", [])
         self._processed_set = set(str(i) for i in raw_ids)
 
+        self._chunk_id_set = set(self.chunk_ids)
+        # Ids recorded since the last compaction; foreign ids from a replaced chunk file are dropped
+        self._journaled_ids = [i for i in self.journal.read() if i in self._chunk_id_set]
+        self._processed_set.update(self._journaled_ids)
+        self._unsaved_ids: List[str] = []
+
+        self._lock = threading.RLock()
+        self._pending = deque(i for i in self.chunk_ids if i not in self._processed_set)
+        self._leased = set()
+        self._remaining = len(self._pending)
+        self._last_renewal = time.monotonic()
+        self._sync_completed(forget_stale=True)
+
+    def _sync_completed(self, forget_stale: bool = False):
+        # Chunks completed by other lease holders count as processed here too
+        if self.lease_store is None:
+            return
+        stale = []
+        for chunk_id in self.lease_store.completed_ids():
+            if chunk_id not in self._chunk_id_set:
+                stale.append(chunk_id)
+            elif chunk_id not in self._processed_set:
+                self._processed_set.add(chunk_id)
+                self._remaining -= 1
+        if forget_stale and stale:
+            # Left over from an earlier chunk file; chunk ids are never reused
+            self.lease_store.forget(stale)
+
+    def renew_leases(self, force: bool = False):
+        """
+        Extends the shared leases of every chunk this manager holds, at most once per
+        heartbeat interval unless ``force`` is set. Call periodically while chunks are
+        processed, so a slow chunk is not claimed by another session when its lease
+        would otherwise expire.
+        """
+        if self.lease_store is None:
+            return
+        interval = min(LEASE_HEARTBEAT_SECONDS, self.lease_store.lease_seconds / 4)
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_renewal < interval:
+                return
+            self._last_renewal = now
+            leased = list(self._leased)
+        if leased:
+            self.lease_store.renew(leased)
+
     @property
     def total_chunks(self) -> int:
-        return self.summary.get("total_chunks", len(self.chunks))
+        return self.summary.get("total_chunks", len(self.chunk_ids))
 
     @property
     def remaining_chunks(self) -> int:
-        return len(self._get_unprocessed_chunks())
+        return self._remaining
+
+    @property
+    def leased_chunks(self) -> int:
+        return len(self._leased)
 
-    def _get_unprocessed_chunks(self) -> List[Dict[str, Any]]:
-        return [
-            chunk for chunk in self.chunks
-            if str(chunk.get("chunk_id")) not in self._processed_set
-        ]
+    def _skip_unavailable(self):
+        # Ids processed or leased since they were queued are dropped lazily
+        while self._pending and (
+            self._pending[0] in self._processed_set or self._pending[0] in self._leased
+        ):
+            self._pending.popleft()
 
     def get_next_chunk(self) -> Tuple[pd.DataFrame, Optional[str]]:
         """Returns the next unprocessed chunk as a DataFrame."""
-        for chunk in self.chunks:
-            chunk_id = str(chunk.get("chunk_id"))
-            if chunk_id and chunk_id not in self._processed_set:
-                self._current_chunk_id = chunk_id
-                return pd.DataFrame(chunk["data"]), chunk_id
-        return None
+        with self._lock:
+            self._skip_unavailable()
+            if not self._pending:
+                return None
+            chunk_id = self._pending[0]
+            self._current_chunk_id = chunk_id
+        return self.store.read_chunk(chunk_id), chunk_id
+
+    def get_next_chunks(self, n: int) -> List[Tuple[pd.DataFrame, str]]:
+        """
+        Leases up to ``n`` unprocessed chunks in file order.
+
+        Leased chunks are skipped by later calls until they are marked processed
+        or handed back with `release_chunks`.
+
+        Returns:
+            List of (DataFrame, chunk_id) pairs; empty when no chunks are left.
+        """
+        leased_ids = []
+        with self._lock:
+            busy = []
+            to_examine = len(self._pending)
+            while len(leased_ids) < n and to_examine > 0:
+                candidates = []
+                while to_examine > 0 and len(candidates) < n - len(leased_ids):
+                    chunk_id = self._pending.popleft()
+                    to_examine -= 1
+                    if chunk_id not in self._processed_set and chunk_id not in self._leased:
+                        candidates.append(chunk_id)
+                if not candidates:
+                    continue
+
+                if self.lease_store is not None:
+                    acquired = self.lease_store.acquire(candidates, len(candidates))
+                else:
+                    acquired = candidates
+                acquired_set = set(acquired)
+                busy.extend(chunk_id for chunk_id in candidates if chunk_id not in acquired_set)
+                self._leased.update(acquired)
+                leased_ids.extend(acquired)
+
+            # Chunks held by another lease holder are retried after the rest of the queue
+            self._pending.extend(busy)
+        return [(self.store.read_chunk(chunk_id), chunk_id) for chunk_id in leased_ids]
+
+    def release_chunks(self, chunk_ids: Iterable[str]):
+        """Returns leased chunks that were not processed to the front of the queue."""
+        chunk_ids = [str(chunk_id) for chunk_id in chunk_ids]
+        with self._lock:
+            if self.lease_store is not None:
+                self.lease_store.release(chunk_ids)
+            for chunk_id in reversed(chunk_ids):
+                if chunk_id in self._leased:
+                    self._leased.discard(chunk_id)
+                    if chunk_id not in self._processed_set:
+                        self._pending.appendleft(chunk_id)
 
     def mark_chunk_processed(self, chunk_id: Optional[str] = None):
         """Mark the most recent or specified chunk as processed."""
-        if chunk_id:
-            self._processed_set.add(str(chunk_id))
-        elif self._current_chunk_id is not None:  
-            self._processed_set.add(self._current_chunk_id)
-            self._current_chunk_id = None
-        else:
-            raise RuntimeError("No chunk to mark as processed.")
+        with self._lock:
+            if chunk_id:
+                self._add_processed(str(chunk_id))
+            elif self._current_chunk_id is not None:
+                self._add_processed(self._current_chunk_id)
+                self._current_chunk_id = None
+            else:
+                raise RuntimeError("No chunk to mark as processed.")
+
+    def _add_processed(self, chunk_id: str):
+        self._leased.discard(chunk_id)
+        if self.lease_store is not None:
+            self.lease_store.complete([chunk_id])
+        if chunk_id not in self._processed_set:
+            self._processed_set.add(chunk_id)
+            self._unsaved_ids.append(chunk_id)
+            if chunk_id in self._chunk_id_set:
+                self._remaining -= 1
 
     def save_state(self):
-        """Save updated processed chunk IDs to the JSON file."""
-        self.summary["processed"] = len(self._processed_set)
-        self.summary["processed_ids"] = sorted(self._processed_set)
-        self.data["summary"] = self.summary
+        """
+        Records newly processed chunk IDs in the progress journal, compacting the
+        journal into the JSON file once it holds ``compact_interval`` entries.
+        """
+        with self._lock:
+            if self._unsaved_ids:
+                self.journal.append(self._unsaved_ids)
+                self._journaled_ids.extend(self._unsaved_ids)
+                self._unsaved_ids = []
+
+            if len(self._journaled_ids) >= self.compact_interval:
+                self.compact()
+
+    def compact(self):
+        """Writes all processed chunk IDs into the JSON file and clears the journal."""
+        with self._lock:
+            self._sync_completed()
+            self.summary["processed"] = len(self._processed_set)
+            self.summary["processed_ids"] = sorted(self._processed_set)
+            self.store.save_summary(self.summary)
+            self.journal.clear()
+            self._journaled_ids = []
+            self._unsaved_ids = []
 
-        with open(self.json_path, "w") as f:
-            json.dump(self.data, f, indent=2)
+    def close(self):
+        """
+        Saves any pending progress and compacts the journal; call when a run ends.
+        Outstanding leases are released and the lease store is closed.
+        """
+        with self._lock:
+            outstanding = list(self._leased)
+        self.release_chunks(outstanding)
+        self.save_state()
+        if self._journaled_ids or self.journal.path.exists() or self.lease_store is not None:
+            self.compact()
+        if self.lease_store is not None:
+            self.lease_store.close()
+            self.lease_store = None
 
     def __repr__(self) -> str:
         return (
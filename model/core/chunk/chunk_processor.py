@@ -1,15 +1,32 @@
+import asyncio
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import AsyncIterator, Iterator, Optional
 
-from tenacity import RetryError
+import pandas as pd
 
+from model.core.chunk.adaptive_concurrency import AdaptiveConcurrencyLimit
 from model.core.chunk.chunk_manager import ChunkManager
 from model.core.llms.base_llm_client import BaseLLMClient
+from model.core.llms.circuit_breaker import CircuitBreaker, CircuitState
+from model.core.llms.request_hedger import RequestHedger
 from model.core.llms.gemini_client import GeminiClient
 from model.core.llms.gemini_resilient_runner import GeminiResilientRunner
+from model.core.llms.rate_limiter import RateLimiter
 from model.io.model_prefs import ModelPreference
-from utils.exceptions import TokenBudgetExceededError
+from model.io.response_cache import ResponseCache
+from utils.constants import DEFAULT_MAX_WORKERS, DEFAULT_ASYNC_CONCURRENCY, LEASE_HEARTBEAT_SECONDS
+from utils.cancellation_token import CancellationToken
+from utils.exceptions import (
+    CircuitOpenError, IncompleteResponseError, OperationCancelledError, RetriesExhaustedError,
+    TokenBudgetExceededError
+)
 from utils.chunk_process_result import ChunkProcessResult
 from utils.result_type import ResultType
+from utils.retry_stats import RetryStats
+from utils.token_usage import TokenUsage
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(
@@ -17,6 +34,13 @@ logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
 )
 
+# Results after which no further chunks are dispatched in a concurrent run
+STOPPING_RESULT_TYPES = (
+    ResultType.FATAL_ERROR,
+    ResultType.TOKENS_BUDGET_EXCEEDED,
+    ResultType.UNEXPECTED_ERROR,
+)
+
 
 class ChunkProcessor:
     def __init__(
@@ -25,6 +49,10 @@ class ChunkProcessor:
         client: BaseLLMClient,
         chunk_manager: ChunkManager,
         model_preference: ModelPreference,
+        response_cache: Optional[ResponseCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        hedger: Optional[RequestHedger] = None,
     ):
         self.prompt = prompt
         self.client = client
@@ -33,7 +61,10 @@ class ChunkProcessor:
         self._validate_inputs()
 
         if isinstance(client, GeminiClient):
-            self.runner = GeminiResilientRunner(client=self.client)
+            self.runner = GeminiResilientRunner(
+                client=self.client, response_cache=response_cache, rate_limiter=rate_limiter,
+                circuit_breaker=circuit_breaker, hedger=hedger
+            )
         else:
             raise ValueError("Unsupported LLM client type")
 
@@ -41,6 +72,9 @@ class ChunkProcessor:
         # TODO: create a dictionary for different llms to get each remaining tokens
         self.remaining_tokens = self.prefs.remaining_total_tokens
 
+        # Guards token accounting and chunk state when chunks complete concurrently
+        self._state_lock = threading.Lock()
+
 
     def _validate_inputs(self):
         if not self.prompt:
@@ -58,11 +92,263 @@ class ChunkProcessor:
             return ChunkProcessResult(ResultType.NO_MORE_CHUNKS)
 
         df, chunk_id = chunk_data
+        return self._process_chunk(df, chunk_id)
+
+    def process_chunks(
+        self,
+        max_chunks: int,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        concurrency: Optional[AdaptiveConcurrencyLimit] = None,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> Iterator[ChunkProcessResult]:
+        """
+        Processes up to ``max_chunks`` unprocessed chunks with at most ``max_workers``
+        requests in flight, yielding each result as soon as it completes.
+
+        With ``concurrency``, the number of requests in flight follows its adaptive
+        limit (never above ``max_workers``): it is fed the latency of every model request,
+        excluding retry backoff and rate limiter waits, and the runner's overload errors,
+        and grows or backs off accordingly.
+
+        Chunks are leased from the chunk manager as workers free up. Dispatch stops after
+        a fatal, unexpected or token budget result; requests that are already in flight
+        are still drained and yielded. A NO_MORE_CHUNKS result is yielded last when the
+        chunk file runs out before ``max_chunks`` is reached. Chunks that fail are leased
+        until the run ends, so each chunk is attempted at most once per run. Leases are
+        renewed every heartbeat while requests are in flight.
+
+        While the runner's circuit breaker is open, dispatch pauses until the next probe
+        is due and then sends a single chunk. Chunks the breaker rejected yield a
+        CIRCUIT_OPEN result and go straight back to the pool; they still count towards
+        ``max_chunks``, which bounds a run during a long outage.
+
+        Cancelling ``cancel_token`` stops dispatch; chunks in flight skip any remaining
+        retries and yield CANCELLED unless their request already completed. The run
+        then ends once every in-flight request has returned or hit the client deadline.
+
+        Args:
+            max_chunks: Maximum number of chunks to dispatch in this run.
+            max_workers: Maximum number of concurrent LLM requests.
+            concurrency: Optional adaptive limit on the concurrent LLM requests.
+            cancel_token: Optional token that stops the run cooperatively.
+
+        Yields:
+            ChunkProcessResult for every dispatched chunk, in completion order.
+        """
+        max_workers = max(1, int(max_workers))
+        in_flight = {}
+        failed_ids = []
+        dispatched = 0
+        exhausted = False
+        stop = False
+
+        def capacity():
+            return self._circuit_capacity(
+                max_workers if concurrency is None else min(concurrency.limit, max_workers)
+            )
 
+        def cancelled():
+            return cancel_token is not None and cancel_token.cancelled
+
+        self._attach_concurrency(concurrency)
         try:
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chunk-worker") as executor:
+
+                def dispatch():
+                    nonlocal dispatched, exhausted
+                    while not stop and not cancelled() and not exhausted and dispatched < max_chunks:
+                        free = capacity() - len(in_flight)
+                        if free <= 0:
+                            if in_flight:
+                                return
+                            # Circuit open with nothing running: wait for the probe slot
+                            pause = self._circuit_pause()
+                            if cancel_token is None:
+                                time.sleep(pause)
+                            else:
+                                cancel_token.wait(pause)
+                            continue
+                        leased = self.chunk_manager.get_next_chunks(min(free, max_chunks - dispatched))
+                        if not leased:
+                            exhausted = True
+                            return
+                        for df, chunk_id in leased:
+                            future = executor.submit(self._process_chunk, df, chunk_id, cancel_token)
+                            in_flight[future] = chunk_id
+                            dispatched += 1
+
+                dispatch()
+                while in_flight:
+                    done, _ = wait(in_flight, timeout=LEASE_HEARTBEAT_SECONDS, return_when=FIRST_COMPLETED)
+                    self.chunk_manager.renew_leases()
+                    for future in done:
+                        in_flight.pop(future)
+                        result = future.result()
+                        if result.result_type == ResultType.CIRCUIT_OPEN:
+                            self.chunk_manager.release_chunks([result.chunk_id])
+                        elif result.result_type != ResultType.SUCCESS:
+                            failed_ids.append(result.chunk_id)
+                        if result.result_type in STOPPING_RESULT_TYPES:
+                            stop = True
+                        yield result
+                    dispatch()
+        finally:
+            # Requests left running when the caller stopped early have finished by now
+            for future, chunk_id in in_flight.items():
+                if future.result().result_type != ResultType.SUCCESS:
+                    failed_ids.append(chunk_id)
+            self.chunk_manager.release_chunks(failed_ids)
+            self._attach_concurrency(None)
+
+        if exhausted and not stop and not cancelled():
+            yield ChunkProcessResult(ResultType.NO_MORE_CHUNKS)
+
+    async def aprocess_chunks(
+        self,
+        max_chunks: int,
+        max_concurrency: int = DEFAULT_ASYNC_CONCURRENCY,
+        concurrency: Optional[AdaptiveConcurrencyLimit] = None,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> AsyncIterator[ChunkProcessResult]:
+        """
+        Async counterpart of `process_chunks`: keeps up to ``max_concurrency`` chunk
+        requests in flight on the running event loop and yields each result as it completes.
+
+        Args:
+            max_chunks: Maximum number of chunks to dispatch in this run.
+            max_concurrency: Maximum number of concurrent LLM requests.
+            concurrency: Optional adaptive limit on the concurrent LLM requests.
+            cancel_token: Optional token that stops the run cooperatively.
+
+        Yields:
+            ChunkProcessResult for every dispatched chunk, in completion order.
+        """
+        max_concurrency = max(1, int(max_concurrency))
+        in_flight = {}
+        failed_ids = []
+        dispatched = 0
+        exhausted = False
+        stop = False
+
+        def capacity():
+            return self._circuit_capacity(
+                max_concurrency if concurrency is None else min(concurrency.limit, max_concurrency)
+            )
+
+        def cancelled():
+            return cancel_token is not None and cancel_token.cancelled
+
+        async def dispatch():
+            nonlocal dispatched, exhausted
+            while not stop and not cancelled() and not exhausted and dispatched < max_chunks:
+                free = capacity() - len(in_flight)
+                if free <= 0:
+                    if in_flight:
+                        return
+                    pause = self._circuit_pause()
+                    if cancel_token is None:
+                        await asyncio.sleep(pause)
+                    else:
+                        await cancel_token.async_wait(pause)
+                    continue
+                leased = self.chunk_manager.get_next_chunks(min(free, max_chunks - dispatched))
+                if not leased:
+                    exhausted = True
+                    return
+                for df, chunk_id in leased:
+                    task = asyncio.ensure_future(self._aprocess_chunk(df, chunk_id, cancel_token))
+                    in_flight[task] = chunk_id
+                    dispatched += 1
+
+        self._attach_concurrency(concurrency)
+        try:
+            await dispatch()
+            while in_flight:
+                done, _ = await asyncio.wait(
+                    in_flight, timeout=LEASE_HEARTBEAT_SECONDS, return_when=asyncio.FIRST_COMPLETED
+                )
+                self.chunk_manager.renew_leases()
+                for task in done:
+                    in_flight.pop(task)
+                    result = task.result()
+                    if result.result_type == ResultType.CIRCUIT_OPEN:
+                        self.chunk_manager.release_chunks([result.chunk_id])
+                    elif result.result_type != ResultType.SUCCESS:
+                        failed_ids.append(result.chunk_id)
+                    if result.result_type in STOPPING_RESULT_TYPES:
+                        stop = True
+                    yield result
+                await dispatch()
+        finally:
+            for task, chunk_id in in_flight.items():
+                task.cancel()
+                failed_ids.append(chunk_id)
+            self.chunk_manager.release_chunks(failed_ids)
+            self._attach_concurrency(None)
+
+        if exhausted and not stop and not cancelled():
+            yield ChunkProcessResult(ResultType.NO_MORE_CHUNKS)
 
-            response, used_tokens = self.runner.run(self.prompt, df)
+    def _circuit_capacity(self, limit: int) -> int:
+        """Requests that may be in flight: none while the circuit is open, one probe when half-open."""
+        breaker = self.runner.circuit_breaker
+        if breaker is None:
+            return limit
+        state = breaker.state
+        if state == CircuitState.OPEN:
+            return 0
+        return 1 if state == CircuitState.HALF_OPEN else limit
 
+    def _circuit_pause(self) -> float:
+        """Seconds to hold dispatch until the open circuit admits a probe."""
+        breaker = self.runner.circuit_breaker
+        return 0.0 if breaker is None else breaker.retry_in()
+
+    def _attach_concurrency(self, concurrency: Optional[AdaptiveConcurrencyLimit]):
+        """
+        Routes the runner's request latencies and overload errors to the adaptive limit of
+        the current run. Whole-chunk times are not used: they include retry backoff, rate
+        limiter waits and repair calls, which say nothing about congestion.
+        """
+        if concurrency is None:
+            self.runner.latency_listener = None
+            self.runner.overload_listener = None
+        else:
+            self.runner.latency_listener = concurrency.record_success
+            self.runner.overload_listener = lambda error: concurrency.record_overload()
+
+    def _process_chunk(
+        self, df: pd.DataFrame, chunk_id: str, cancel_token: Optional[CancellationToken] = None
+    ) -> ChunkProcessResult:
+        """Sends one chunk through the runner and records its token usage, retries and state."""
+        retry_stats = RetryStats()
+        try:
+            response, usage = self.runner.run(self.prompt, df, retry_stats=retry_stats, cancel_token=cancel_token)
+            result = self._record_success(df, chunk_id, response, usage)
+        except Exception as e:
+            result = self._error_result(e, df, chunk_id)
+        result.retry_stats = retry_stats
+        return result
+
+    async def _aprocess_chunk(
+        self, df: pd.DataFrame, chunk_id: str, cancel_token: Optional[CancellationToken] = None
+    ) -> ChunkProcessResult:
+        """Async version of `_process_chunk` using the runner's `arun`."""
+        retry_stats = RetryStats()
+        try:
+            response, usage = await self.runner.arun(
+                self.prompt, df, retry_stats=retry_stats, cancel_token=cancel_token
+            )
+            result = self._record_success(df, chunk_id, response, usage)
+        except Exception as e:
+            result = self._error_result(e, df, chunk_id)
+        result.retry_stats = retry_stats
+        return result
+
+    def _record_success(self, df: pd.DataFrame, chunk_id: str, response: str, usage: TokenUsage) -> ChunkProcessResult:
+        """Charges the token budget and marks the chunk processed, raising if the budget is exceeded."""
+        used_tokens = usage.total_tokens
+        with self._state_lock:
             if self.remaining_tokens - used_tokens <= 0:
                 raise TokenBudgetExceededError(used_tokens, self.remaining_tokens)
 
@@ -71,39 +357,80 @@ class ChunkProcessor:
 
             self.chunk_manager.mark_chunk_processed(chunk_id)
             self.chunk_manager.save_state()
+            remaining_tokens = self.remaining_tokens
 
+        return ChunkProcessResult(
+            result_type=ResultType.SUCCESS,
+            response=response,
+            chunk=df,
+            remaining_tokens=remaining_tokens,
+            chunk_id=chunk_id,
+            token_usage=usage
+        )
+
+    def _charge_tokens(self, usage: TokenUsage):
+        """Charges tokens spent on a request whose response could not be used; the chunk stays unprocessed."""
+        with self._state_lock:
+            self.remaining_tokens = max(0, self.remaining_tokens - usage.total_tokens)
+            self.prefs.remaining_total_tokens = self.remaining_tokens
+
+    def _error_result(self, error: Exception, df: pd.DataFrame, chunk_id: str) -> ChunkProcessResult:
+        """Maps an exception raised while processing a chunk to a typed result."""
+        if isinstance(error, OperationCancelledError):
             return ChunkProcessResult(
-                result_type=ResultType.SUCCESS,
-                response=response,
+                result_type=ResultType.CANCELLED,
                 chunk=df,
-                remaining_tokens=self.remaining_tokens,
+                error=error,
                 chunk_id=chunk_id
             )
 
-        except self.runner.fatal_errors as ue:
+        if isinstance(error, CircuitOpenError):
+            return ChunkProcessResult(
+                result_type=ResultType.CIRCUIT_OPEN,
+                chunk=df,
+                error=error,
+                chunk_id=chunk_id
+            )
+
+        if isinstance(error, self.runner.fatal_errors):
             return ChunkProcessResult(
                 result_type=ResultType.FATAL_ERROR,
                 chunk=df,
-                error=ue
+                error=error,
+                chunk_id=chunk_id
             )
-        except RetryError as re:
-            last_exc = re.last_attempt.exception()
+
+        if isinstance(error, RetriesExhaustedError):
             return ChunkProcessResult(
                 result_type=ResultType.RETRYABLE_ERROR,
                 chunk=df,
-                error=last_exc
+                error=error.last_error,
+                chunk_id=chunk_id
             )
 
-        except TokenBudgetExceededError as ve:
+        if isinstance(error, IncompleteResponseError):
+            # Rows are still missing after the runner's repair; the chunk is released for another run
+            self._charge_tokens(error.usage)
             return ChunkProcessResult(
-                result_type=ResultType.TOKENS_BUDGET_EXCEEDED,
+                result_type=ResultType.RETRYABLE_ERROR,
                 chunk=df,
-                error=ve
+                error=error,
+                chunk_id=chunk_id,
+                remaining_tokens=self.remaining_tokens,
+                token_usage=error.usage
             )
 
-        except Exception as e:
+        if isinstance(error, TokenBudgetExceededError):
             return ChunkProcessResult(
-                result_type=ResultType.UNEXPECTED_ERROR,
+                result_type=ResultType.TOKENS_BUDGET_EXCEEDED,
                 chunk=df,
-                error=e
+                error=error,
+                chunk_id=chunk_id
             )
+
+        return ChunkProcessResult(
+            result_type=ResultType.UNEXPECTED_ERROR,
+            chunk=df,
+            error=error,
+            chunk_id=chunk_id
+        )
@@ -0,0 +1,318 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from uuid import uuid4
+
+import pandas as pd
+
+from utils.constants import JSONL_CHUNK_VERSION, JSONL_CHUNK_FORMAT
+
+
+class LegacyChunkStore:
+    """
+    Reads version-1.0 chunk files, where every chunk and its rows live in a
+    single JSON document that has to be loaded into memory at once.
+    """
+
+    def __init__(self, path: Path, data: Dict[str, Any]):
+        self.path = path
+        self.manifest = data
+        self._chunks_by_id = {
+            str(chunk.get("chunk_id")): chunk for chunk in data.get("chunks", [])
+        }
+
+    @property
+    def version(self) -> Any:
+        return self.manifest.get("version")
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self.manifest.get("metadata", {})
+
+    @property
+    def summary(self) -> Dict[str, Any]:
+        return self.manifest.get("summary", {})
+
+    @property
+    def chunk_ids(self) -> List[str]:
+        return list(self._chunks_by_id)
+
+    @property
+    def columns(self) -> List[str]:
+        """Columns of the chunked rows, in first-seen order across chunks."""
+        return _ordered_union(
+            list(chunk["data"][0]) for chunk in self._chunks_by_id.values() if chunk.get("data")
+        )
+
+    def read_chunk(self, chunk_id: str) -> pd.DataFrame:
+        return pd.DataFrame(self._chunks_by_id[str(chunk_id)]["data"])
+
+    def iter_chunks(self) -> Iterator[Tuple[str, pd.DataFrame]]:
+        for chunk_id, chunk in self._chunks_by_id.items():
+            yield chunk_id, pd.DataFrame(chunk["data"])
+
+    def save_summary(self, summary: Dict[str, Any]) -> None:
+        """Rewrites the whole document with an updated summary."""
+        self.manifest["summary"] = summary
+        _atomic_write_json(self.path, self.manifest, indent=2)
+
+
+class JsonlChunkStore:
+    """
+    Reads chunk files split into a small JSON manifest and a JSON Lines data file
+    holding one chunk per line. Chunks are read lazily by seeking to the byte
+    offset recorded in the manifest's chunk index.
+    """
+
+    def __init__(self, path: Path, manifest: Dict[str, Any]):
+        self.path = path
+        self.manifest = manifest
+        self.data_path = path.parent / manifest["data_file"]
+        self._index = {str(entry["chunk_id"]): entry for entry in manifest.get("chunk_index", [])}
+
+        if not self.data_path.exists():
+            raise FileNotFoundError(f"Chunk data file not found: {self.data_path}")
+
+    @property
+    def version(self) -> Any:
+        return self.manifest.get("version")
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self.manifest.get("metadata", {})
+
+    @property
+    def summary(self) -> Dict[str, Any]:
+        return self.manifest.get("summary", {})
+
+    @property
+    def chunk_ids(self) -> List[str]:
+        return list(self._index)
+
+    @property
+    def columns(self) -> List[str]:
+        """Columns of the chunked rows; files written before they were recorded read the first chunk."""
+        if "columns" in self.manifest:
+            return list(self.manifest["columns"])
+        return list(self.read_chunk(self.chunk_ids[0]).columns) if self._index else []
+
+    def read_chunk(self, chunk_id: str) -> pd.DataFrame:
+        entry = self._index[str(chunk_id)]
+        with open(self.data_path, "rb") as f:
+            f.seek(entry["offset"])
+            record = json.loads(f.read(entry["length"]))
+        return pd.DataFrame(record["data"])
+
+    def iter_chunks(self) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """Streams chunks in file order, holding a single chunk in memory at a time."""
+        with open(self.data_path, "rb") as f:
+            for line in f:
+                record = json.loads(line)
+                yield str(record["chunk_id"]), pd.DataFrame(record["data"])
+
+    def save_summary(self, summary: Dict[str, Any]) -> None:
+        """Rewrites only the manifest; the chunk data file is never touched."""
+        self.manifest["summary"] = summary
+        _atomic_write_json(self.path, self.manifest)
+
+
+class ChunkStoreWriter:
+    """
+    Incrementally writes chunks to a JSON Lines data file and, on close, the
+    manifest that indexes them. Both files are written to temporary paths and
+    moved into place only once every chunk has been written.
+
+    Every write gets a data file of its own, named after a new generation
+    (``chunks.<generation>.jsonl``). The manifest switches to it in a single atomic
+    replace and the previous data file is removed afterwards, so a crash at any point
+    leaves a manifest whose byte offsets match the data file it names.
+
+    Usage:
+        with ChunkStoreWriter("chunks.json", chunk_size=25) as writer:
+            for df in chunks:
+                writer.write_chunk(df)
+    """
+
+    def __init__(
+            self,
+            file_path: str,
+            chunk_size: Optional[int] = None,
+            metadata: Optional[Dict[str, Any]] = None
+    ):
+        self.path = Path(file_path)
+        self.generation = uuid4().hex[:12]
+        self.data_path = self.path.with_name(f"{self.path.stem}.{self.generation}.jsonl")
+        self.chunk_size = chunk_size
+        self.metadata = metadata or {}
+        self.chunk_index: List[Dict[str, Any]] = []
+        self.processed_ids: List[str] = []
+        self.columns: List[str] = []
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._temp_data_path = self.data_path.with_suffix(".jsonl.tmp")
+        self._data_file = open(self._temp_data_path, "wb")
+        self._offset = 0
+
+    def write_chunk(self, df: pd.DataFrame, max_rows: Optional[int] = None, processed: bool = False) -> str:
+        """
+        Appends one chunk to the data file and returns its generated chunk_id.
+
+        Chunks written with ``processed=True`` are recorded in the summary as already
+        processed, e.g. rows carried over from an earlier run whose results are stored.
+        """
+        chunk_data = df.head(max_rows) if max_rows else df
+        chunk_id = str(uuid4())
+        line = json.dumps({
+            "chunk_id": chunk_id,
+            "data": chunk_data.to_dict(orient="records"),
+            "original_rows": len(df)
+        }).encode("utf-8") + b"\n"
+
+        self._data_file.write(line)
+        self.columns = _ordered_union([self.columns, list(map(str, chunk_data.columns))])
+        if processed:
+            self.processed_ids.append(chunk_id)
+        self.chunk_index.append({
+            "chunk_id": chunk_id,
+            "offset": self._offset,
+            "length": len(line),
+            "original_rows": len(df)
+        })
+        self._offset += len(line)
+        return chunk_id
+
+    def close(self) -> None:
+        """Publishes the data file, points the manifest at it and removes the replaced data file."""
+        self._data_file.close()
+        previous_data_path = _manifest_data_path(self.path)
+        os.replace(self._temp_data_path, self.data_path)
+
+        manifest = {
+            "version": JSONL_CHUNK_VERSION,
+            "format": JSONL_CHUNK_FORMAT,
+            "metadata": self.metadata,
+            "data_file": self.data_path.name,
+            "columns": self.columns,
+            "chunk_index": self.chunk_index,
+            "summary": {
+                "total_chunks": len(self.chunk_index),
+                "processed_ids": self.processed_ids,
+                "chunk_size": self.chunk_size
+            }
+        }
+        _atomic_write_json(self.path, manifest)
+        if previous_data_path is not None and previous_data_path != self.data_path:
+            previous_data_path.unlink(missing_ok=True)
+        # Progress recorded against a previous chunk file no longer applies
+        ProgressJournal(self.path).clear()
+
+    def discard(self) -> None:
+        """Abandons the write, removing any partially written data."""
+        self._data_file.close()
+        if self._temp_data_path.exists():
+            self._temp_data_path.unlink()
+
+    def __enter__(self) -> "ChunkStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class ProgressJournal:
+    """
+    Append-only sidecar log of processed chunk ids, stored next to the chunk file
+    as ``<name>.journal``. Recording progress appends one short line per chunk and
+    fsyncs it, so the cost of a save no longer depends on the size of the chunk file.
+    The journal is folded back into the chunk file's summary when it is compacted.
+    """
+
+    def __init__(self, chunk_file_path: Path):
+        self.path = Path(chunk_file_path).with_suffix(".journal")
+
+    def read(self) -> List[str]:
+        """
+        Replays the journal, returning the recorded chunk ids in write order.
+
+        A trailing line without a newline is the remains of an interrupted append;
+        it is ignored and truncated away so later appends start on a clean line.
+        """
+        if not self.path.exists():
+            return []
+
+        with open(self.path, "rb") as f:
+            content = f.read()
+
+        complete_end = content.rfind(b"\n") + 1
+        if complete_end < len(content):
+            with open(self.path, "r+b") as f:
+                f.truncate(complete_end)
+
+        lines = content[:complete_end].decode("utf-8").splitlines()
+        return [line.strip() for line in lines if line.strip()]
+
+    def append(self, chunk_ids: Iterable[str]) -> None:
+        """Durably appends chunk ids to the journal."""
+        payload = "".join(f"{chunk_id}\n" for chunk_id in chunk_ids)
+        if not payload:
+            return
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception as e:
+            raise OSError(f"Failed to write progress journal: {str(e)}") from e
+
+    def clear(self) -> None:
+        """Removes the journal once its entries are persisted elsewhere."""
+        if self.path.exists():
+            self.path.unlink()
+
+
+def open_chunk_store(file_path: str):
+    """
+    Opens a chunk file in either format.
+
+    Returns:
+        JsonlChunkStore for manifest-based files, LegacyChunkStore otherwise.
+    """
+    path = Path(file_path)
+    with open(path, "r") as f:
+        data = json.load(f)
+
+    if isinstance(data, dict) and data.get("format") == JSONL_CHUNK_FORMAT:
+        return JsonlChunkStore(path, data)
+    return LegacyChunkStore(path, data)
+
+
+def _manifest_data_path(path: Path) -> Optional[Path]:
+    """Data file named by an existing JSON Lines manifest at ``path``, if there is one."""
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if isinstance(data, dict) and data.get("format") == JSONL_CHUNK_FORMAT and data.get("data_file"):
+        return path.parent / data["data_file"]
+    return None
+
+
+def _ordered_union(column_lists: Iterable[List[str]]) -> List[str]:
+    return list(dict.fromkeys(column for columns in column_lists for column in columns))
+
+
+def _atomic_write_json(path: Path, data: Dict[str, Any], indent: Optional[int] = None) -> None:
+    temp_path = path.with_suffix(".tmp")
+    try:
+        with open(temp_path, "w") as f:
+            json.dump(data, f, indent=indent)
+        os.replace(temp_path, path)
+    except Exception as e:
+        if temp_path.exists():
+            temp_path.unlink()
+        raise OSError(f"Failed to save chunk file: {str(e)}") from e
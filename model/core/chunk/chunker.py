@@ -1,13 +1,105 @@
 import json
 import os
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import Iterable, List, Optional, Dict, Any, Sequence
 from uuid import uuid4
+import numpy as np
 import pandas as pd
+from pandas.util import hash_array
 
+from model.core.chunk.chunk_store import ChunkStoreWriter, ProgressJournal
 from utils.constants import JSON_CHUNK_FILE, DEFAULT_CHUNK_SIZE, JSON_CHUNK_VERSION
 
 
+def _mix64(values: np.ndarray) -> np.ndarray:
+    """MurmurHash3 64-bit finalizer; a bijection on uint64, so distinct inputs stay distinct."""
+    values = values.copy()
+    values ^= values >> np.uint64(33)
+    values *= np.uint64(0xFF51AFD7ED558CCD)
+    values ^= values >> np.uint64(33)
+    values *= np.uint64(0xC4CEB9FE1A85EC53)
+    values ^= values >> np.uint64(33)
+    return values
+
+
+# Hash of every missing or blank cell, whatever the column's dtype
+_BLANK_CELL_HASH = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _cell_hashes(column: pd.Series) -> np.ndarray:
+    """
+    64-bit hash of every cell, independent of the column's dtype: missing and blank cells
+    share one sentinel and integral floats hash as int64, so an int column widened to
+    float64 by a blank cell keeps the hashes of its existing values.
+    """
+    dtype = column.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in "iub":
+        return hash_array(column.to_numpy().astype(np.int64, copy=False))
+    if isinstance(dtype, np.dtype) and dtype.kind == "f":
+        values = column.to_numpy(dtype=np.float64)
+        with np.errstate(invalid="ignore"):
+            integral = np.isfinite(values) & (values == np.trunc(values)) & (np.abs(values) < 2.0 ** 63)
+        hashes = hash_array(values)
+        hashes[integral] = hash_array(values[integral].astype(np.int64))
+        hashes[np.isnan(values)] = _BLANK_CELL_HASH
+        return hashes
+
+    hashes = pd.util.hash_pandas_object(column, index=False).to_numpy(dtype=np.uint64)
+    blank = column.isna().to_numpy(dtype=bool)
+    if dtype == object or pd.api.types.is_string_dtype(dtype):
+        blank |= (column == "").to_numpy(dtype=bool)
+    hashes[blank] = _BLANK_CELL_HASH
+    return hashes
+
+
+def _row_fingerprints(df: pd.DataFrame) -> np.ndarray:
+    """64-bit hash per row, combining its cell hashes column by column in column name order."""
+    rows = np.zeros(len(df), dtype=np.uint64)
+    names = [str(column) for column in df.columns]
+    name_hashes = hash_array(np.array(names, dtype=object))
+    for position in sorted(range(len(names)), key=names.__getitem__):
+        rows = _mix64(rows ^ _cell_hashes(df.iloc[:, position]) ^ name_hashes[position])
+    return rows
+
+
+def content_source_ids(df: pd.DataFrame) -> np.ndarray:
+    """
+    Deterministic, UUID-formatted ids derived from each row's content.
+
+    The first 64 bits are a hash of the row's values, normalized so that neither the
+    column order nor dtype changes (such as an int column turning float64 when a blank
+    row is appended) alter existing ids; the last 64 bits mix that hash
+    with how many identical rows came before it, so duplicate rows still get distinct
+    ids. Chunking the same data again yields the same ids, so stored results keep
+    matching their rows. Hashing, duplicate counting and hex formatting run on
+    whole arrays; only the final str objects are built one by one.
+
+    Returns:
+        Object array of id strings, one per row
+    """
+    if len(df) == 0:
+        return np.array([], dtype=object)
+
+    row_hashes = _row_fingerprints(df)
+
+    occurrences = np.zeros(len(df), dtype=np.uint64)
+    duplicated = pd.Series(row_hashes).duplicated(keep=False).to_numpy()
+    if duplicated.any():
+        positions = np.flatnonzero(duplicated)
+        occurrences[positions] = (
+            pd.Series(row_hashes[positions]).groupby(row_hashes[positions]).cumcount().to_numpy(dtype=np.uint64)
+        )
+    tails = _mix64(_mix64(row_hashes) + occurrences)
+
+    digits = np.frombuffer(
+        np.column_stack([row_hashes, tails]).astype(">u8").tobytes().hex().encode("ascii"), dtype=np.uint8
+    ).reshape(-1, 32)
+    formatted = np.full((len(df), 36), ord("-"), dtype=np.uint8)
+    for start, end, offset in ((0, 8, 0), (8, 12, 1), (12, 16, 2), (16, 20, 3), (20, 32, 4)):
+        formatted[:, start + offset:end + offset] = digits[:, start:end]
+    return np.array([value.decode("ascii") for value in formatted.view("S36").ravel().tolist()], dtype=object)
+
+
 class DataFrameChunker:
     """Handles DataFrame chunking and JSON serialization only."""
 
@@ -24,7 +116,8 @@ class DataFrameChunker:
     def chunk_dataframe(
             self,
             df: pd.DataFrame,
-            chunk_size: Optional[int] = None
+            chunk_size: Optional[int] = None,
+            source_ids: Optional[Sequence[str]] = None
     ) -> List[pd.DataFrame]:
         """
         Split DataFrame into smaller chunks and add a unique source_id per row.
@@ -32,6 +125,8 @@ class DataFrameChunker:
         Args:
             df: Input DataFrame to split
             chunk_size: Optional override for chunk size. If None or <= 0, uses the instance's chunk_size.
+            source_ids: Optional precomputed ids, one per row (see `content_source_ids`).
+                Needed when ``df`` is a subset of a dataset whose ids were derived as a whole.
 
         Returns:
             List of DataFrame chunks
@@ -44,9 +139,7 @@ class DataFrameChunker:
             self._chunks = []
             return self._chunks
 
-        # ✅ NEW: Add a UUID to each row as 'source_id'
-        df = df.copy()
-        df["source_id"] = [str(uuid4()) for _ in range(len(df))]
+        df = self._with_source_ids(df, source_ids)
 
         total_rows = len(df)
         self._chunks = [
@@ -58,6 +151,73 @@ class DataFrameChunker:
               f"chunks of ~{size:,} rows each")
         return self._chunks
 
+    def chunk_dataframe_by_tokens(
+            self,
+            df: pd.DataFrame,
+            row_tokens: Sequence[int],
+            token_target: int,
+            max_rows: Optional[int] = None,
+            source_ids: Optional[Sequence[str]] = None
+    ) -> List[pd.DataFrame]:
+        """
+        Split DataFrame into chunks packed by token weight and add a unique source_id per row.
+
+        Consecutive rows are packed into a chunk until adding the next row would exceed
+        ``token_target``. A row heavier than the target on its own gets a chunk to itself.
+        Chunk boundaries are found with binary searches over the cumulative token counts.
+
+        Args:
+            df: Input DataFrame to split
+            row_tokens: Estimated tokens of each row, in row order
+            token_target: Maximum tokens of rows per chunk
+            max_rows: Optional cap on the number of rows per chunk
+            source_ids: Optional precomputed ids, one per row (see `chunk_dataframe`)
+
+        Returns:
+            List of DataFrame chunks
+
+        Raises:
+            ValueError: If ``row_tokens`` does not match the number of rows, or ``token_target`` is not positive
+        """
+        if len(row_tokens) != len(df):
+            raise ValueError(f"Expected {len(df)} row token counts, got {len(row_tokens)}")
+        if token_target <= 0:
+            raise ValueError("token_target must be positive")
+
+        if df.empty:
+            self._chunks = []
+            return self._chunks
+
+        df = self._with_source_ids(df, source_ids)
+
+        cumulative = np.cumsum(np.asarray(row_tokens, dtype=np.int64))
+        total_rows = len(df)
+        self._chunks = []
+        start = 0
+        while start < total_rows:
+            used_before = cumulative[start - 1] if start else 0
+            end = int(np.searchsorted(cumulative, used_before + token_target, side="right"))
+            end = max(end, start + 1)
+            if max_rows:
+                end = min(end, start + max_rows)
+            self._chunks.append(df.iloc[start:end])
+            start = end
+
+        print(f"Packed {total_rows:,} rows into {len(self._chunks)} "
+              f"chunks of up to {token_target:,} tokens each")
+        return self._chunks
+
+    @staticmethod
+    def _with_source_ids(df: pd.DataFrame, source_ids: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Shallow copy of ``df`` with a deterministic id per row in the 'source_id' column."""
+        if source_ids is None:
+            source_ids = content_source_ids(df)
+        elif len(source_ids) != len(df):
+            raise ValueError(f"Expected {len(df)} source ids, got {len(source_ids)}")
+        df = df.copy(deep=False)
+        df["source_id"] = source_ids
+        return df
+
     @property
     def chunks(self) -> List[pd.DataFrame]:
         """Access stored chunks."""
@@ -120,4 +280,47 @@ class DataFrameChunker:
                 temp_path.unlink()
             raise OSError(f"Failed to save chunks: {str(e)}") from e
 
+        ProgressJournal(path).clear()
+
         print(f"Saved {len(chunks)} chunks to {file_path}")
+
+    def save_chunks_to_jsonl(
+            self,
+            chunks: Iterable[pd.DataFrame],
+            file_path: str = JSON_CHUNK_FILE,
+            max_rows_per_chunk: Optional[int] = None,
+            metadata: Optional[Dict[str, Any]] = None,
+            processed_chunks: Iterable[pd.DataFrame] = ()
+    ) -> List[str]:
+        """
+        Stream chunks to a JSON Lines data file plus a small manifest at ``file_path``.
+
+        Each chunk is serialized and written as soon as it is produced, so ``chunks``
+        may be a generator and the whole dataset never has to be held as one JSON
+        document. The data file is written next to the manifest as ``<name>.<generation>.jsonl``.
+
+        Args:
+            chunks: DataFrames to save, in order
+            file_path: Output manifest path
+            max_rows_per_chunk: Max rows per chunk (None = all)
+            metadata: Optional metadata to include
+            processed_chunks: DataFrames written after ``chunks`` and recorded as already processed
+
+        Returns:
+            The generated chunk ids, in write order
+
+        Raises:
+            ValueError: If there are no chunks to save
+            OSError: If file operations fail
+        """
+        with ChunkStoreWriter(file_path, chunk_size=self.chunk_size, metadata=metadata) as writer:
+            for df in chunks:
+                writer.write_chunk(df, max_rows=max_rows_per_chunk)
+            for df in processed_chunks:
+                writer.write_chunk(df, max_rows=max_rows_per_chunk, processed=True)
+
+            if not writer.chunk_index:
+                raise ValueError("No chunks to save")
+
+        print(f"Saved {len(writer.chunk_index)} chunks to {file_path}")
+        return [entry["chunk_id"] for entry in writer.chunk_index]
@@ -1,8 +1,15 @@
+import threading
 from abc import ABC, abstractmethod
-from typing import Any, Tuple
+from typing import Any, Callable, Tuple, TypeVar
 import pandas as pd
 
-from utils.constants import DEFAULT_TEMPERATURE, DEFAULT_TOP_K, DEFAULT_TOP_P
+from model.core.llms.row_formats import ROW_FORMATTERS, format_table
+from utils.constants import (
+    DEFAULT_TEMPERATURE, DEFAULT_TOP_K, DEFAULT_TOP_P, DEFAULT_ROW_FORMAT, DEFAULT_REQUEST_TIMEOUT_SECONDS
+)
+from utils.token_usage import TokenUsage
+
+T = TypeVar("T")
 
 
 class BaseLLMClient(ABC):
@@ -10,7 +17,21 @@ class BaseLLMClient(ABC):
     Abstract base class for all LLM clients.
     """
 
-    def __init__(self, model: str, api_key: str, generation_config: dict = None):
+    # Layout used by `_format_input`; overridden per instance through the constructor
+    row_format = DEFAULT_ROW_FORMAT
+    # Seconds before a request is abandoned with TimeoutError; 0 or None waits indefinitely
+    request_timeout = DEFAULT_REQUEST_TIMEOUT_SECONDS
+
+    def __init__(
+        self,
+        model: str,
+        api_key: str,
+        generation_config: dict = None,
+        row_format: str = DEFAULT_ROW_FORMAT,
+        request_timeout: float = DEFAULT_REQUEST_TIMEOUT_SECONDS
+    ):
+        if row_format not in ROW_FORMATTERS:
+            raise ValueError(f"Unknown row format: {row_format}")
         self.model = model
         self.api_key = api_key
         self.generation_config = generation_config or {
@@ -19,6 +40,8 @@ class BaseLLMClient(ABC):
             "top_p": DEFAULT_TOP_P
         }
         self.model_name = model  # Add this to make it accessible externally
+        self.row_format = row_format
+        self.request_timeout = request_timeout
         self.llm = self._init_llm()
 
     @abstractmethod
@@ -27,24 +50,58 @@ class BaseLLMClient(ABC):
         pass
 
     @abstractmethod
-    def call(self, prompt: str, df: pd.DataFrame) -> Tuple[str, int]:
+    def call(self, prompt: str, df: pd.DataFrame) -> Tuple[str, TokenUsage]:
         """
         Format input and call the LLM.
-        Returns a tuple of (response_text, token_count).
+        Returns a tuple of (response_text, token_usage).
+        """
+        pass
+
+    @abstractmethod
+    async def acall(self, prompt: str, df: pd.DataFrame) -> Tuple[str, TokenUsage]:
+        """
+        Async counterpart of `call` for use inside an event loop.
+        Returns a tuple of (response_text, token_usage).
         """
         pass
 
+    def _with_deadline(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Runs a blocking SDK call, raising TimeoutError after ``request_timeout`` seconds.
+
+        The call runs on a daemon thread so a request that never returns is abandoned
+        rather than left blocking the caller; its eventual result is discarded.
+        """
+        if not self.request_timeout:
+            return func(*args, **kwargs)
+
+        outcome = {}
+        finished = threading.Event()
+
+        def target():
+            try:
+                outcome["result"] = func(*args, **kwargs)
+            except BaseException as e:
+                outcome["error"] = e
+            finally:
+                finished.set()
+
+        threading.Thread(target=target, name="llm-request", daemon=True).start()
+        if not finished.wait(self.request_timeout):
+            raise TimeoutError(f"Request exceeded its {self.request_timeout:g}s deadline.")
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["result"]
+
     def _format_input(self, prompt: str, df: pd.DataFrame) -> str:
         """
-        Combines prompt and DataFrame into a structured string.
+        Combines prompt and DataFrame into a structured string, serializing the
+        rows with the client's ``row_format`` layout.
         """
         output = [prompt.strip(), ""]
 
-        df = df.fillna("")
-        for idx, row in df.iterrows():
-            lines = [f"Row {idx + 1}:"]
-            for col in df.columns:
-                lines.append(f"- {col}: {row[col]}")
-            output.append("\n".join(lines))
+        rows_text = format_table(df, self.row_format)
+        if rows_text:
+            output.append(rows_text)
 
         return "\n\n".join(output)
@@ -0,0 +1,108 @@
+import threading
+import time
+from enum import Enum
+from typing import Dict
+
+from utils.constants import DEFAULT_CIRCUIT_FAILURE_THRESHOLD, DEFAULT_CIRCUIT_RECOVERY_SECONDS
+from utils.exceptions import CircuitOpenError
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    """
+    Stops calling a model after ``failure_threshold`` consecutive upstream failures.
+
+    While OPEN every call is rejected with `CircuitOpenError`. After
+    ``recovery_seconds`` the breaker turns HALF_OPEN and lets a single probe call
+    through: success closes it, another failure opens it again. Only outage errors
+    count as failures (the runner decides which); any response from the service,
+    even an error, counts as success. Shared by every request of a processor.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_CIRCUIT_FAILURE_THRESHOLD,
+        recovery_seconds: float = DEFAULT_CIRCUIT_RECOVERY_SECONDS,
+    ):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.recovery_seconds = recovery_seconds
+        self.failures = 0
+        self.times_opened = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now: float) -> CircuitState:
+        if self._opened_at is None:
+            return CircuitState.CLOSED
+        if now - self._opened_at < self.recovery_seconds:
+            return CircuitState.OPEN
+        return CircuitState.HALF_OPEN
+
+    def retry_in(self) -> float:
+        """Seconds until the next probe may be sent; 0 when calls are allowed now."""
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self._opened_at + self.recovery_seconds - time.monotonic())
+
+    def before_call(self):
+        """Admits a call, or raises CircuitOpenError while open or while a probe is running."""
+        with self._lock:
+            now = time.monotonic()
+            state = self._state(now)
+            if state == CircuitState.CLOSED:
+                return
+            if state == CircuitState.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            raise CircuitOpenError(max(0.0, self._opened_at + self.recovery_seconds - now))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def record_ignored(self):
+        """Ends a call whose outcome says nothing about the service, freeing the probe slot."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            now = time.monotonic()
+            self.failures += 1
+            if self._probe_in_flight or (
+                self._opened_at is None and self.failures >= self.failure_threshold
+            ):
+                self.times_opened += 1
+                self._opened_at = now
+            self._probe_in_flight = False
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(model_name: str) -> CircuitBreaker:
+    """
+    Returns the process-wide circuit breaker for a model.
+
+    An outage seen by one session keeps the others from hammering the same endpoint.
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(model_name)
+        if breaker is None:
+            breaker = _breakers[model_name] = CircuitBreaker()
+        return breaker
@@ -1,3 +1,4 @@
+import asyncio
 from typing import Any, Tuple
 import logging
 import pandas as pd
@@ -5,6 +6,8 @@ import google.generativeai as genai
 from google.api_core import exceptions as api_exceptions
 
 from model.core.llms.base_llm_client import BaseLLMClient
+from model.core.llms.token_estimator import estimate_tokens
+from utils.token_usage import TokenUsage
 
 # Set up logger
 logger = logging.getLogger(__name__)
@@ -24,40 +27,31 @@ class GeminiClient(BaseLLMClient):
         except Exception as e:
             raise RuntimeError(f"Failed to initialize Gemini client: {str(e)}")
 
-    def call(self, prompt: str, df: pd.DataFrame) -> Tuple[str, int]:
+    def call(self, prompt: str, df: pd.DataFrame) -> Tuple[str, TokenUsage]:
         """
-        Call Gemini LLM and return the response along with total token count (input + output).
+        Call Gemini LLM and return the response along with its token usage.
+
+        Token counts come from the response's usage_metadata, so a call is a single
+        request; they are estimated locally when the metadata is missing. A request
+        still running after ``request_timeout`` seconds raises TimeoutError.
 
         Args:
             prompt: The prompt string to provide to the LLM.
             df: A pandas DataFrame to be formatted and passed with the prompt.
 
         Returns:
-            Tuple of (generated text, total token usage).
+            Tuple of (generated text, token usage).
         """
         formatted_input = self._format_input(prompt, df)
 
         try:
-            # Count input tokens
-            input_tokens = self.llm.count_tokens(contents=formatted_input).total_tokens
-
-            # Generate content
-            response = self.llm.generate_content(formatted_input)
+            response = self._with_deadline(self.llm.generate_content, formatted_input)
             text = response.text or ""
 
-            # Count output tokens
-            output_tokens = self.llm.count_tokens(contents=text).total_tokens
+            usage = self._token_usage(response, formatted_input, text)
+            self._log_usage(usage)
 
-            total_tokens = input_tokens + output_tokens
-
-            logger.info(
-                f"Gemini token usage — "
-                f"Input: {input_tokens}, "
-                f"Output: {output_tokens}, "
-                f"Total: {total_tokens}"
-            )
-
-            return text, total_tokens
+            return text, usage
 
         except Exception as e:
             logger.error(f"Gemini call failed: {e}")
@@ -78,3 +72,61 @@ class GeminiClient(BaseLLMClient):
 
             # Let unknown custom exceptions propagate
             raise
+
+    async def acall(self, prompt: str, df: pd.DataFrame) -> Tuple[str, TokenUsage]:
+        """
+        Async version of `call` built on the SDK's async generation method.
+
+        Args:
+            prompt: The prompt string to provide to the LLM.
+            df: A pandas DataFrame to be formatted and passed with the prompt.
+
+        Returns:
+            Tuple of (generated text, token usage).
+        """
+        formatted_input = self._format_input(prompt, df)
+
+        try:
+            request = self.llm.generate_content_async(formatted_input)
+            if self.request_timeout:
+                # wait_for cancels the request and raises TimeoutError once the deadline passes
+                response = await asyncio.wait_for(request, self.request_timeout)
+            else:
+                response = await request
+            text = response.text or ""
+
+            usage = self._token_usage(response, formatted_input, text)
+            self._log_usage(usage)
+
+            return text, usage
+
+        except Exception as e:
+            logger.error(f"Gemini async call failed: {e}")
+            # Errors propagate unwrapped so the retry logic sees the original exception
+            raise
+
+    def _token_usage(self, response: Any, formatted_input: str, text: str) -> TokenUsage:
+        """
+        Build the token breakdown from the response's usage_metadata, falling back to a
+        local tiktoken estimate when the API did not report usage.
+        """
+        metadata = getattr(response, "usage_metadata", None)
+        total_tokens = getattr(metadata, "total_token_count", None)
+
+        if isinstance(total_tokens, int) and total_tokens > 0:
+            input_tokens = getattr(metadata, "prompt_token_count", 0) or 0
+            output_tokens = getattr(metadata, "candidates_token_count", 0) or 0
+            return TokenUsage(input_tokens, output_tokens, total_tokens)
+
+        input_tokens = estimate_tokens(formatted_input, self.model)
+        output_tokens = estimate_tokens(text, self.model)
+        return TokenUsage(input_tokens, output_tokens, input_tokens + output_tokens, estimated=True)
+
+    @staticmethod
+    def _log_usage(usage: TokenUsage) -> None:
+        logger.info(
+            f"Gemini token usage{' (estimated)' if usage.estimated else ''} — "
+            f"Input: {usage.input_tokens}, "
+            f"Output: {usage.output_tokens}, "
+            f"Total: {usage.total_tokens}"
+        )
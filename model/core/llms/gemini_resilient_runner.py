@@ -14,6 +14,7 @@ class GeminiResilientRunner(ResilientLLMRunner):
             api_exceptions.ServiceUnavailable,
             api_exceptions.InternalServerError,
             api_exceptions.Aborted,
+            api_exceptions.ResourceExhausted,
             ConnectionError,
             TimeoutError,
         )
@@ -21,10 +22,22 @@ class GeminiResilientRunner(ResilientLLMRunner):
     @property
     def fatal_errors(self):
         return (
-            api_exceptions.ResourceExhausted,
             api_exceptions.PermissionDenied,
             api_exceptions.Unauthenticated,
             api_exceptions.InvalidArgument,
             api_exceptions.NotFound,
             auth_exceptions.DefaultCredentialsError,
         )
+
+    @property
+    def quota_errors(self):
+        # 429s clear once the quota window rolls over, so they are waited out up to a deadline
+        return (api_exceptions.ResourceExhausted,)
+
+    @property
+    def overload_errors(self):
+        return (
+            api_exceptions.DeadlineExceeded,
+            api_exceptions.ServiceUnavailable,
+            api_exceptions.ResourceExhausted,
+        )
@@ -1,7 +1,83 @@
-import tiktoken
+import hashlib
+import threading
+from collections import OrderedDict
+from statistics import NormalDist
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
 import pandas as pd
 
-from utils.constants import SAFE_PROMPT_LIMITS
+from model.core.llms.row_formats import format_table
+from model.core.llms.token_estimator import get_encoding
+from utils.constants import (
+    SAFE_PROMPT_LIMITS,
+    DEFAULT_ROW_FORMAT,
+    TOKEN_COUNT_CACHE_SIZE,
+    DEFAULT_TOKEN_SAMPLE_SIZE,
+    DEFAULT_OVERFLOW_PROBABILITY,
+)
+
+
+class TokenCountCache:
+    """
+    Thread-safe LRU memo of token counts keyed by model name and a digest of the
+    text, so long prompts are not held in memory just to be looked up again.
+    """
+
+    def __init__(self, maxsize: int = TOKEN_COUNT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, model_name: str, encoding, text: str) -> int:
+        """Returns the number of tokens in ``text``, encoding it only on a cache miss."""
+        key = (model_name, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest())
+        with self._lock:
+            if key in self._counts:
+                self._counts.move_to_end(key)
+                self.hits += 1
+                return self._counts[key]
+
+        tokens = len(encoding.encode(text))
+        with self._lock:
+            self.misses += 1
+            self._counts[key] = tokens
+            self._counts.move_to_end(key)
+            while len(self._counts) > self.maxsize:
+                self._counts.popitem(last=False)
+        return tokens
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+token_counts = TokenCountCache()
+
+
+class RowTokenStats(NamedTuple):
+    """Distribution of the per-row token cost (input plus expected output) over sampled rows."""
+    sample_size: int
+    mean: float
+    std: float
+    p95: float
+    max: int
+
+
+class ChunkSizeEstimate(NamedTuple):
+    """Chunk size recommended from sampled rows, with the statistics it was based on."""
+    chunk_size: int
+    fixed_tokens: int  # Prompt and layout tokens paid once per chunk
+    row_stats: RowTokenStats
+    overflow_probability: float
+
+    def expected_tokens(self, num_rows: int) -> int:
+        """Expected token usage of a chunk with ``num_rows`` rows."""
+        return self.fixed_tokens + round(self.row_stats.mean * num_rows)
 
 
 class PromptOptimizer:
@@ -18,7 +94,14 @@ class PromptOptimizer:
         """
         self.model_name = model_name.lower()
 
-    def find_optimal_row_number(self, prompt: str, row_df: pd.DataFrame, example_response: str, usage_ratio: float = 0.8) -> int:
+    def find_optimal_row_number(
+        self,
+        prompt: str,
+        row_df: pd.DataFrame,
+        example_response: str,
+        usage_ratio: float = 0.8,
+        row_format: str = DEFAULT_ROW_FORMAT
+    ) -> int:
         """
         Calculate the optimal number of rows that can be processed within the model's token limit.
         Uses SAFE_PROMPT_LIMITS for more conservative chunking.
@@ -28,6 +111,7 @@ class PromptOptimizer:
             row_df: A DataFrame containing example row(s) to calculate token usage
             example_response: Example response from the model for a single row
             usage_ratio: Fraction of the safe token limit to use (default: 0.8)
+            row_format: Layout the rows are serialized with
 
         Returns:
             int: Maximum number of rows that can be processed within the safe token limit
@@ -39,19 +123,15 @@ class PromptOptimizer:
             # Calculate usable tokens
             usable_tokens = int(max_tokens * usage_ratio)
 
-            # Get encoding (fall back to cl100k_base if model not found)
-            try:
-                encoding = tiktoken.encoding_for_model(self.model_name)
-            except KeyError:
-                encoding = tiktoken.get_encoding("cl100k_base")
+            # Shared cached encoding (cl100k_base for unknown models, a character estimate offline)
+            encoding = get_encoding(self.model_name)
 
             # Calculate prompt tokens
-            prompt_tokens = len(encoding.encode(prompt.strip()))
+            prompt_tokens = self._count_tokens(encoding, prompt.strip())
 
             # Calculate tokens for a single row
-            example_row_text = self._format_row(row_df.iloc[0])
-            row_input_tokens = len(encoding.encode(example_row_text))
-            row_output_tokens = len(encoding.encode(example_response))
+            layout_tokens, row_input_tokens = self._row_input_tokens(encoding, row_df, row_format)
+            row_output_tokens = self._count_tokens(encoding, example_response)
             tokens_per_row = row_input_tokens + row_output_tokens
 
             # Ensure we have at least some tokens per row
@@ -59,7 +139,7 @@ class PromptOptimizer:
                 return 10  # Safe default if we can't calculate
 
             # Calculate rows that fit, with a reasonable maximum
-            available_for_rows = (usable_tokens - prompt_tokens) // tokens_per_row
+            available_for_rows = (usable_tokens - prompt_tokens - layout_tokens) // tokens_per_row
             return min(max(1, available_for_rows), 100)  # Cap at 100 rows
 
         except Exception as e:
@@ -97,7 +177,226 @@ class PromptOptimizer:
             lines.append(f"- {col}: {row[col]}")
         return "\n".join(lines)
 
-    def calculate_used_tokens(self, prompt: str, row_df: pd.DataFrame, example_response: str, num_rows: int) -> int:
+    def _count_tokens(self, encoding, text: str) -> int:
+        """Token count of ``text``, memoized across optimizers and Streamlit reruns."""
+        return token_counts.count(self.model_name, encoding, text)
+
+    def _row_input_tokens(self, encoding, row_df: pd.DataFrame, row_format: str) -> Tuple[int, int]:
+        """
+        Token cost of serializing rows with ``row_format``, as (fixed, per_row).
+
+        Header-once layouts pay for column names once per chunk, so their cost is
+        measured from the difference between one and two copies of the example row.
+        """
+        if row_format == DEFAULT_ROW_FORMAT:
+            return 0, self._count_tokens(encoding, self._format_row(row_df.iloc[0]))
+
+        sample = row_df.iloc[[0]]
+        one_row = self._count_tokens(encoding, format_table(sample, row_format))
+        two_rows = self._count_tokens(
+            encoding, format_table(pd.concat([sample, sample], ignore_index=True), row_format)
+        )
+        per_row = max(two_rows - one_row, 0)
+        return max(one_row - per_row, 0), per_row
+
+    @staticmethod
+    def sample_rows(df: pd.DataFrame, sample_size: int = DEFAULT_TOKEN_SAMPLE_SIZE, seed: int = 0) -> pd.DataFrame:
+        """
+        Stratified sample by position: the frame is split into ``sample_size`` equal
+        slices and one random row is taken from each, so sorted or grouped datasets
+        are covered end to end. Only the sampled rows are touched.
+        """
+        total = len(df)
+        if total <= sample_size:
+            return df
+
+        bounds = np.linspace(0, total, sample_size + 1).astype(np.int64)
+        rng = np.random.default_rng(seed)
+        offsets = (rng.random(sample_size) * np.diff(bounds)).astype(np.int64)
+        return df.iloc[bounds[:-1] + offsets]
+
+    @staticmethod
+    def _encode_lengths(encoding, texts: List[str]) -> np.ndarray:
+        """Token counts of many texts, batched through ``encode_batch`` when the encoding has it."""
+        encode_batch = getattr(encoding, "encode_batch", None)
+        if encode_batch is not None:
+            return np.array([len(tokens) for tokens in encode_batch(texts)], dtype=np.int64)
+        return np.array([len(encoding.encode(text)) for text in texts], dtype=np.int64)
+
+    @staticmethod
+    def _row_content_texts(df: pd.DataFrame) -> List[str]:
+        """Each row's cell values joined by spaces, with missing values left empty."""
+        if len(df.columns) == 0:
+            return [""] * len(df)
+        strings = df.astype(object).where(df.notna(), "").astype(str)
+        first, rest = strings.iloc[:, 0], strings.iloc[:, 1:]
+        return first.str.cat(rest, sep=" ").tolist() if len(rest.columns) else first.tolist()
+
+    def row_token_counts(
+        self,
+        df: pd.DataFrame,
+        example_response: str,
+        row_format: str = DEFAULT_ROW_FORMAT
+    ) -> np.ndarray:
+        """
+        Estimate the token cost (input plus expected output) of every row of ``df``.
+
+        All rows' cell values are tokenized in one batch. The layout's own per-row
+        overhead (column names, delimiters, row numbers) is measured once on the
+        first row and added to each row's content tokens.
+
+        Args:
+            df: Rows to estimate
+            example_response: Example response from the model for a single row
+            row_format: Layout the rows are serialized with
+
+        Returns:
+            np.ndarray: Estimated tokens per row, in row order
+
+        Raises:
+            ValueError: If ``df`` has no rows.
+        """
+        if len(df) == 0:
+            raise ValueError("Cannot estimate token usage of an empty DataFrame.")
+
+        encoding = get_encoding(self.model_name)
+        content_tokens = self._encode_lengths(encoding, self._row_content_texts(df))
+
+        _, first_row_tokens = self._row_input_tokens(encoding, df, row_format)
+        overhead = first_row_tokens - int(content_tokens[0])
+        output_tokens = self._count_tokens(encoding, example_response)
+
+        return np.maximum(content_tokens + overhead, 0) + output_tokens
+
+    def available_row_tokens(
+        self,
+        prompt: str,
+        row_df: pd.DataFrame,
+        usage_ratio: float = 0.8,
+        row_format: str = DEFAULT_ROW_FORMAT
+    ) -> int:
+        """
+        Tokens left for rows in one chunk once the prompt and the layout's header are paid for.
+
+        Args:
+            prompt: The prompt template to be used for processing
+            row_df: A DataFrame containing example row(s) to calculate token usage
+            usage_ratio: Fraction of the safe token limit to use (default: 0.8)
+            row_format: Layout the rows are serialized with
+
+        Returns:
+            int: Usable tokens per chunk minus the fixed per-chunk tokens (may be negative)
+        """
+        return int(self._get_safe_token_limit() * usage_ratio) - self._fixed_tokens(prompt, row_df, row_format)
+
+    def _fixed_tokens(self, prompt: str, row_df: pd.DataFrame, row_format: str) -> int:
+        """Prompt and layout header tokens paid once per chunk."""
+        encoding = get_encoding(self.model_name)
+        layout_tokens, _ = self._row_input_tokens(encoding, row_df.iloc[[0]], row_format)
+        return self._count_tokens(encoding, prompt.strip()) + layout_tokens
+
+    def estimate_row_token_stats(
+        self,
+        df: pd.DataFrame,
+        example_response: str,
+        row_format: str = DEFAULT_ROW_FORMAT,
+        sample_size: int = DEFAULT_TOKEN_SAMPLE_SIZE
+    ) -> RowTokenStats:
+        """
+        Estimate the distribution of per-row token usage from a stratified sample of rows.
+
+        Sampled rows are costed with `row_token_counts`.
+
+        Args:
+            df: Dataset to be chunked
+            example_response: Example response from the model for a single row
+            row_format: Layout the rows are serialized with
+            sample_size: Maximum number of rows to tokenize
+
+        Returns:
+            RowTokenStats: Mean, standard deviation, 95th percentile and maximum tokens per row
+
+        Raises:
+            ValueError: If ``df`` has no rows.
+        """
+        if len(df) == 0:
+            raise ValueError("Cannot estimate token usage of an empty DataFrame.")
+
+        sample = self.sample_rows(df, sample_size)
+        costs = self.row_token_counts(sample, example_response, row_format)
+        return RowTokenStats(
+            sample_size=len(costs),
+            mean=float(costs.mean()),
+            std=float(costs.std(ddof=1)) if len(costs) > 1 else 0.0,
+            p95=float(np.percentile(costs, 95)),
+            max=int(costs.max()),
+        )
+
+    def recommend_chunk_size(
+        self,
+        prompt: str,
+        df: pd.DataFrame,
+        example_response: str,
+        usage_ratio: float = 0.8,
+        overflow_probability: float = DEFAULT_OVERFLOW_PROBABILITY,
+        row_format: str = DEFAULT_ROW_FORMAT,
+        sample_size: int = DEFAULT_TOKEN_SAMPLE_SIZE
+    ) -> ChunkSizeEstimate:
+        """
+        Choose the largest chunk size whose token usage exceeds the usable limit with
+        at most ``overflow_probability``, based on sampled rows rather than row 0 only.
+
+        A chunk of n rows is modelled as a sum of n independent row costs, so its
+        usage is approximately normal with mean ``n * mean`` and standard deviation
+        ``sqrt(n) * std``.
+
+        Args:
+            prompt: The prompt template to be used for processing
+            df: Dataset to be chunked
+            example_response: Example response from the model for a single row
+            usage_ratio: Fraction of the safe token limit to use (default: 0.8)
+            overflow_probability: Accepted probability that a chunk overflows the usable tokens
+            row_format: Layout the rows are serialized with
+            sample_size: Maximum number of rows to tokenize
+
+        Returns:
+            ChunkSizeEstimate: Recommended chunk size and the statistics behind it
+
+        Raises:
+            ValueError: If ``overflow_probability`` is not between 0 and 1, or ``df`` has no rows.
+        """
+        if not 0 < overflow_probability < 1:
+            raise ValueError("overflow_probability must be between 0 and 1.")
+
+        stats = self.estimate_row_token_stats(df, example_response, row_format, sample_size)
+        fixed_tokens = self._fixed_tokens(prompt, df, row_format)
+        available = int(self._get_safe_token_limit() * usage_ratio) - fixed_tokens
+        if stats.mean <= 0:
+            chunk_size = 10  # Safe default if we can't calculate
+        elif available <= 0:
+            chunk_size = 1
+        else:
+            # Largest n with n * mean + z * sqrt(n) * std <= available, solved for sqrt(n)
+            z = NormalDist().inv_cdf(1 - overflow_probability)
+            spread = z * stats.std
+            root = (-spread + np.sqrt(spread ** 2 + 4 * stats.mean * available)) / (2 * stats.mean)
+            chunk_size = min(max(1, int(root ** 2)), 100)  # Cap at 100 rows
+
+        return ChunkSizeEstimate(
+            chunk_size=chunk_size,
+            fixed_tokens=fixed_tokens,
+            row_stats=stats,
+            overflow_probability=overflow_probability,
+        )
+
+    def calculate_used_tokens(
+        self,
+        prompt: str,
+        row_df: pd.DataFrame,
+        example_response: str,
+        num_rows: int,
+        row_format: str = DEFAULT_ROW_FORMAT
+    ) -> int:
         """
         Calculate the total number of tokens used for a given prompt, number of rows, and example response.
         
@@ -106,27 +405,24 @@ class PromptOptimizer:
             row_df: A DataFrame containing example row(s) to calculate token usage
             example_response: Example response from the model for a single row
             num_rows: Number of rows being processed
+            row_format: Layout the rows are serialized with
             
         Returns:
             int: Total number of tokens used
         """
         try:
-            # Get encoding (fall back to cl100k_base if model not found)
-            try:
-                encoding = tiktoken.encoding_for_model(self.model_name)
-            except KeyError:
-                encoding = tiktoken.get_encoding("cl100k_base")
+            # Shared cached encoding (cl100k_base for unknown models, a character estimate offline)
+            encoding = get_encoding(self.model_name)
 
             # Calculate prompt tokens
-            prompt_tokens = len(encoding.encode(prompt.strip()))
+            prompt_tokens = self._count_tokens(encoding, prompt.strip())
 
             # Calculate tokens for a single row input and output
-            example_row_text = self._format_row(row_df.iloc[0])
-            row_input_tokens = len(encoding.encode(example_row_text))
-            row_output_tokens = len(encoding.encode(example_response))
+            layout_tokens, row_input_tokens = self._row_input_tokens(encoding, row_df, row_format)
+            row_output_tokens = self._count_tokens(encoding, example_response)
             
-            # Calculate total tokens: prompt + (input + output) * number of rows
-            total_tokens = prompt_tokens + (row_input_tokens + row_output_tokens) * num_rows
+            # Calculate total tokens: prompt + layout header + (input + output) * number of rows
+            total_tokens = prompt_tokens + layout_tokens + (row_input_tokens + row_output_tokens) * num_rows
             
             return total_tokens
             
@@ -141,7 +437,8 @@ class PromptOptimizer:
         row_df: pd.DataFrame,
         example_response: str,
         rows_per_chunk: int,
-        token_quota: int
+        token_quota: int,
+        row_format: str = DEFAULT_ROW_FORMAT
     ) -> int:
         """
         Calculate how many chunks can fit within a given token quota.
@@ -152,6 +449,7 @@ class PromptOptimizer:
             example_response: Sample response used to estimate output tokens
             rows_per_chunk: Number of rows per chunk
             token_quota: Total tokens available (e.g., daily quota)
+            row_format: Layout the rows are serialized with
 
         Returns:
             int: Maximum number of chunks that can be processed within the quota
@@ -161,7 +459,8 @@ class PromptOptimizer:
                 prompt=prompt,
                 row_df=row_df,
                 example_response=example_response,
-                num_rows=rows_per_chunk
+                num_rows=rows_per_chunk,
+                row_format=row_format
             )
 
             if tokens_per_chunk == 0:
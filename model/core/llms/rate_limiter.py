@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at ``per_minute`` units per minute, holding at most one
+    minute's worth.
+
+    Callers reserve units up front and sleep for the returned delay. A reservation
+    larger than what is available drives the bucket negative, so later callers
+    queue behind it instead of racing for the next refill.
+    """
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.capacity = per_minute
+        self._available = per_minute
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = max(0.0, now - self._updated)
+        self._available = min(self.capacity, self._available + elapsed * self.per_minute / 60)
+        self._updated = max(self._updated, now)
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Takes ``amount`` units and returns the seconds to wait before using them."""
+        self._refill(now)
+        self._available -= amount
+        if self._available >= 0:
+            return 0.0
+        return -self._available * 60 / self.per_minute
+
+    def adjust(self, amount: float, now: float):
+        """Charges (positive) or refunds (negative) units after the fact."""
+        self._refill(now)
+        self._available = min(self.capacity, self._available - amount)
+
+
+class RateLimiter:
+    """
+    Client-side requests-per-minute and tokens-per-minute budget for one model.
+
+    Every request reserves one request and its estimated tokens before it is
+    sent; `settle` then corrects the token bucket with the usage the API
+    reported. A limit of 0 disables that budget. One limiter is shared by all
+    threads and event loops of the process through `get_rate_limiter`.
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self._lock = threading.Lock()
+        self.requests: Optional[TokenBucket] = None
+        self.tokens: Optional[TokenBucket] = None
+        self.configure(requests_per_minute, tokens_per_minute)
+
+    def configure(self, requests_per_minute: int, tokens_per_minute: int):
+        """Applies new limits, keeping the current fill level of unchanged budgets."""
+        with self._lock:
+            self.requests = self._bucket(self.requests, requests_per_minute)
+            self.tokens = self._bucket(self.tokens, tokens_per_minute)
+
+    @staticmethod
+    def _bucket(current: Optional[TokenBucket], per_minute: int) -> Optional[TokenBucket]:
+        if not per_minute or per_minute <= 0:
+            return None
+        if current is not None and current.per_minute == per_minute:
+            return current
+        return TokenBucket(per_minute)
+
+    @property
+    def enabled(self) -> bool:
+        return self.requests is not None or self.tokens is not None
+
+    def reserve(self, estimated_tokens: int) -> float:
+        """Reserves one request and ``estimated_tokens``; returns the seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            delay = 0.0
+            if self.requests is not None:
+                delay = max(delay, self.requests.reserve(1, now))
+            if self.tokens is not None:
+                delay = max(delay, self.tokens.reserve(estimated_tokens, now))
+            return delay
+
+    def acquire(self, estimated_tokens: int):
+        """Blocks until a request of ``estimated_tokens`` fits the budgets."""
+        delay = self.reserve(estimated_tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self, estimated_tokens: int):
+        """Async counterpart of `acquire`; the wait is awaited instead of blocking the loop."""
+        delay = self.reserve(estimated_tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def settle(self, estimated_tokens: int, actual_tokens: int):
+        """Corrects a reservation once the request's real token usage is known."""
+        with self._lock:
+            if self.tokens is not None:
+                self.tokens.adjust(actual_tokens - estimated_tokens, time.monotonic())
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(model_name: str, requests_per_minute: int = 0, tokens_per_minute: int = 0) -> RateLimiter:
+    """
+    Returns the process-wide limiter for a model, updated to the given limits.
+
+    Every processor working with the same model draws from the same budgets.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(model_name)
+        if limiter is None:
+            limiter = _limiters[model_name] = RateLimiter(requests_per_minute, tokens_per_minute)
+            return limiter
+    limiter.configure(requests_per_minute, tokens_per_minute)
+    return limiter
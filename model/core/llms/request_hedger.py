@@ -0,0 +1,88 @@
+import threading
+from collections import deque
+from typing import Optional
+
+import numpy as np
+
+from utils.constants import (
+    DEFAULT_HEDGE_PERCENTILE,
+    HEDGE_LATENCY_WINDOW,
+    HEDGE_MIN_SAMPLES,
+)
+
+
+class LatencyTracker:
+    """Sliding window of recent request latencies, in seconds."""
+
+    def __init__(self, window: int = HEDGE_LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """The ``q`` quantile (0-1) of the window, or None while it is empty."""
+        with self._lock:
+            if not self._samples:
+                return None
+            return float(np.quantile(np.fromiter(self._samples, dtype=float), q))
+
+
+class RequestHedger:
+    """
+    Decides when a slow request gets a duplicate and keeps the books on it.
+
+    Once ``min_samples`` latencies are known, a request still running after the
+    ``percentile`` latency is hedged with a second, identical request, as long as
+    the tokens spent on hedges stay within ``max_extra_tokens``. Whichever request
+    returns first wins.
+
+    ``hedges`` counts duplicates sent, ``hedge_wins`` those that beat the original
+    request, and ``extra_tokens`` the tokens charged for them.
+    """
+
+    def __init__(
+        self,
+        max_extra_tokens: int,
+        percentile: float = DEFAULT_HEDGE_PERCENTILE,
+        min_samples: int = HEDGE_MIN_SAMPLES,
+        window: int = HEDGE_LATENCY_WINDOW,
+    ):
+        if not 0 < percentile < 1:
+            raise ValueError("percentile must be between 0 and 1.")
+        self.max_extra_tokens = max(0, int(max_extra_tokens))
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.latencies = LatencyTracker(window)
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.extra_tokens = 0
+        self._lock = threading.Lock()
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait for a request before hedging it, or None while there is too little history."""
+        if len(self.latencies) < self.min_samples:
+            return None
+        return self.latencies.percentile(self.percentile)
+
+    def try_reserve(self, tokens: int) -> bool:
+        """Counts a hedge of about ``tokens`` input tokens if the extra token cap allows it."""
+        with self._lock:
+            if self.extra_tokens + tokens > self.max_extra_tokens:
+                return False
+            self.hedges += 1
+            self.extra_tokens += tokens
+            return True
+
+    def record_outcome(self, hedge_won: bool, output_tokens: int):
+        """Books the result of a hedged request; the loser's output is assumed as long as the winner's."""
+        with self._lock:
+            self.extra_tokens += output_tokens
+            if hedge_won:
+                self.hedge_wins += 1
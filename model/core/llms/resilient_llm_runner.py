@@ -1,15 +1,94 @@
 # model/core/runners/resilient_llm_runner.py
 
+import asyncio
+import threading
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, NamedTuple, Optional
 
-from tenacity import retry, stop_after_attempt, retry_if_exception_type, wait_exponential
+import pandas as pd
+
+from model.core.llms.circuit_breaker import CircuitBreaker
+from model.core.llms.rate_limiter import RateLimiter
+from model.core.llms.request_hedger import RequestHedger
+from model.core.llms.retry_policy import RetryPolicy
+from model.core.llms.token_estimator import estimate_tokens
+from model.io.response_cache import ResponseCache, row_cache_keys
+from utils.cancellation_token import CancellationToken
+from utils.constants import (
+    DEFAULT_RETRY_ATTEMPTS, DEFAULT_RETRY_BASE_DELAY, DEFAULT_RESPONSE_REPAIR_DEPTH, DEFAULT_RESPONSE_REPAIR_CALLS,
+    MAX_WORKERS_LIMIT
+)
+from utils.exceptions import IncompleteResponseError
+from utils.response_parser import format_indexed_responses, parse_row_responses
+from utils.retry_stats import RetryStats
+from utils.token_usage import TokenUsage
+
+
+class CacheLookup(NamedTuple):
+    """Rows of a chunk split into responses served from the cache and rows still to send."""
+    keys: List[str]
+    cached: Dict[str, str]
+    miss_positions: List[int]
+
+
+# Hedged sync requests from every runner share one bounded pool: a primary and its hedge per worker
+_HEDGE_POOL = None
+_HEDGE_POOL_LOCK = threading.Lock()
+
+
+def _hedge_pool() -> ThreadPoolExecutor:
+    global _HEDGE_POOL
+    with _HEDGE_POOL_LOCK:
+        if _HEDGE_POOL is None:
+            _HEDGE_POOL = ThreadPoolExecutor(
+                max_workers=2 * MAX_WORKERS_LIMIT, thread_name_prefix="hedged-request"
+            )
+        return _HEDGE_POOL
+
+
+class _RepairBudget:
+    """Re-requests left for one chunk, shared by every level of its repair."""
+
+    def __init__(self, calls: int):
+        self.calls = calls
+
+    def take(self) -> bool:
+        if self.calls <= 0:
+            return False
+        self.calls -= 1
+        return True
 
 
 class ResilientLLMRunner(ABC):
-    def __init__(self, client, max_attempts=3, wait_seconds=12):
+    def __init__(
+        self,
+        client,
+        max_attempts=DEFAULT_RETRY_ATTEMPTS,
+        wait_seconds=DEFAULT_RETRY_BASE_DELAY,
+        response_cache: ResponseCache = None,
+        rate_limiter: RateLimiter = None,
+        retry_policy: RetryPolicy = None,
+        circuit_breaker: CircuitBreaker = None,
+        hedger: RequestHedger = None,
+        repair_depth: int = DEFAULT_RESPONSE_REPAIR_DEPTH,
+        max_repair_calls: int = DEFAULT_RESPONSE_REPAIR_CALLS
+    ):
         self.client = client
         self.max_attempts = max_attempts
         self.wait_seconds = wait_seconds
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=max_attempts, base_delay=wait_seconds)
+        self.response_cache = response_cache
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = circuit_breaker
+        self.hedger = hedger
+        self.repair_depth = repair_depth
+        self.max_repair_calls = max_repair_calls
+        # Called with the exception whenever an attempt fails with one of `overload_errors`
+        self.overload_listener = None
+        # Called with the seconds each successful request took once the rate limiter admitted it
+        self.latency_listener = None
 
     @property
     @abstractmethod
@@ -23,27 +102,375 @@ class ResilientLLMRunner(ABC):
         """Define which exceptions must be shown to user immediately."""
         pass
 
+    @property
+    def quota_errors(self):
+        """Retryable errors bounded by the policy's quota deadline rather than its attempt count."""
+        return ()
+
+    @property
+    def overload_errors(self):
+        """Errors signalling that the service is saturated and callers should send less."""
+        return ()
+
+    def _is_outage(self, exception) -> bool:
+        """Retryable errors other than quota errors: the service is failing, not throttling."""
+        return isinstance(exception, self.retryable_errors) and not isinstance(exception, self.quota_errors)
+
+    def _admit(self):
+        """Raises CircuitOpenError instead of calling the client while the breaker is open."""
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.before_call()
+
+    def _record_attempt_success(self):
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_success()
+
+    def _record_attempt_error(self, exception):
+        if self.overload_listener is not None and isinstance(exception, self.overload_errors):
+            self.overload_listener(exception)
+        if self.circuit_breaker is None:
+            return
+        if self._is_outage(exception):
+            self.circuit_breaker.record_failure()
+        elif isinstance(exception, self.fatal_errors + self.quota_errors):
+            # The service answered, it just refused this request
+            self.circuit_breaker.record_success()
+        else:
+            self.circuit_breaker.record_ignored()
+
     def _should_retry(self, exception):
         return isinstance(exception, self.retryable_errors)
 
     def _should_fail_fast(self, exception):
         return isinstance(exception, self.fatal_errors)
 
-    def run(self, prompt, df=None):
-        @retry(
-            wait=wait_exponential(multiplier=1, min=2, max=60),
-            stop=stop_after_attempt(self.max_attempts),
-            retry=retry_if_exception_type(self.retryable_errors),
-            reraise=True
+    def run(self, prompt, df=None, retry_stats: RetryStats = None, cancel_token: CancellationToken = None):
+        """
+        Calls the client with retries. With a response cache, rows answered before are
+        served from it and only the remaining rows are sent.
+
+        Attempts and backoff time are added to ``retry_stats`` when given. Raises
+        RetriesExhaustedError once the retry policy gives up on a retryable error, and
+        OperationCancelledError when ``cancel_token`` is cancelled before or between attempts.
+
+        Rows the model left unanswered are re-requested on their own, split in half
+        when none of them came back, up to ``repair_depth`` levels deep and at most
+        ``max_repair_calls`` extra requests per chunk; the response is returned as one
+        numbered line per row. IncompleteResponseError is raised when rows are still
+        missing after that.
+        """
+        if not self._uses_cache(df):
+            return self._call_complete(prompt, df, retry_stats, cancel_token)
+
+        lookup = self._lookup_rows(prompt, df)
+        if not lookup.miss_positions:
+            return self._merge_rows(lookup, ""), TokenUsage(0, 0, 0)
+
+        text, usage = self._call_complete(prompt, self._miss_rows(df, lookup), retry_stats, cancel_token)
+        return self._merge_rows(lookup, text), usage
+
+    async def arun(self, prompt, df=None, retry_stats: RetryStats = None, cancel_token: CancellationToken = None):
+        """
+        Async counterpart of `run`. Backoff sleeps are awaited, so many chunk
+        requests can share one event loop without a thread per request.
+        """
+        if not self._uses_cache(df):
+            return await self._acall_complete(prompt, df, retry_stats, cancel_token)
+
+        lookup = self._lookup_rows(prompt, df)
+        if not lookup.miss_positions:
+            return self._merge_rows(lookup, ""), TokenUsage(0, 0, 0)
+
+        text, usage = await self._acall_complete(
+            prompt, self._miss_rows(df, lookup), retry_stats, cancel_token
         )
+        return self._merge_rows(lookup, text), usage
+
+    def _call_complete(
+        self, prompt, df=None, retry_stats: RetryStats = None, cancel_token: CancellationToken = None,
+        depth: int = 0, budget: "_RepairBudget" = None
+    ):
+        """Calls the client and re-requests the rows missing from its response until every row is answered."""
+        text, usage = self._call_with_retry(prompt, df, retry_stats, cancel_token)
+        if df is None or len(df) == 0 or self.repair_depth <= 0:
+            return text, usage
+
+        responses = parse_row_responses(text, len(df))
+        missing = self._missing_positions(responses, len(df))
+        if missing and depth >= self.repair_depth:
+            raise IncompleteResponseError(missing, usage)
+
+        budget = budget or _RepairBudget(self.max_repair_calls)
+        still_missing = []
+        for part in self._repair_parts(missing, len(df)):
+            if not budget.take():
+                still_missing.extend(part)
+                continue
+            try:
+                part_text, part_usage = self._call_complete(
+                    prompt, df.iloc[part].reset_index(drop=True), retry_stats, cancel_token, depth + 1, budget
+                )
+            except IncompleteResponseError as e:
+                usage = usage.combined(e.usage)
+                still_missing.extend(part[position] for position in e.missing_rows)
+                continue
+            usage = usage.combined(part_usage)
+            self._merge_part(responses, part, part_text)
+        return self._complete_response(responses, len(df), still_missing, usage), usage
+
+    async def _acall_complete(
+        self, prompt, df=None, retry_stats: RetryStats = None, cancel_token: CancellationToken = None,
+        depth: int = 0, budget: "_RepairBudget" = None
+    ):
+        """Async counterpart of `_call_complete`."""
+        text, usage = await self._acall_with_retry(prompt, df, retry_stats, cancel_token)
+        if df is None or len(df) == 0 or self.repair_depth <= 0:
+            return text, usage
+
+        responses = parse_row_responses(text, len(df))
+        missing = self._missing_positions(responses, len(df))
+        if missing and depth >= self.repair_depth:
+            raise IncompleteResponseError(missing, usage)
+
+        budget = budget or _RepairBudget(self.max_repair_calls)
+        still_missing = []
+        for part in self._repair_parts(missing, len(df)):
+            if not budget.take():
+                still_missing.extend(part)
+                continue
+            try:
+                part_text, part_usage = await self._acall_complete(
+                    prompt, df.iloc[part].reset_index(drop=True), retry_stats, cancel_token, depth + 1, budget
+                )
+            except IncompleteResponseError as e:
+                usage = usage.combined(e.usage)
+                still_missing.extend(part[position] for position in e.missing_rows)
+                continue
+            usage = usage.combined(part_usage)
+            self._merge_part(responses, part, part_text)
+        return self._complete_response(responses, len(df), still_missing, usage), usage
+
+    @staticmethod
+    def _missing_positions(responses: Dict[int, str], row_count: int) -> List[int]:
+        return [position for position in range(row_count) if position + 1 not in responses]
+
+    @staticmethod
+    def _repair_parts(missing: List[int], row_count: int) -> List[List[int]]:
+        """
+        Positions to request again. Only the missing rows are re-sent; when the model
+        answered none of the rows, they are split in half, since the same request is
+        likely to fail the same way.
+        """
+        if not missing:
+            return []
+        if len(missing) < row_count or len(missing) == 1:
+            return [missing]
+        half = len(missing) // 2
+        return [missing[:half], missing[half:]]
+
+    @staticmethod
+    def _merge_part(responses: Dict[int, str], part: List[int], part_text: str):
+        for number, response in parse_row_responses(part_text, len(part)).items():
+            if 1 <= number <= len(part):
+                responses[part[number - 1] + 1] = response
+
+    @staticmethod
+    def _complete_response(
+        responses: Dict[int, str], row_count: int, still_missing: List[int], usage: TokenUsage
+    ) -> str:
+        if still_missing:
+            raise IncompleteResponseError(sorted(still_missing), usage)
+        return format_indexed_responses([responses[number] for number in range(1, row_count + 1)])
+
+    def _call_with_retry(self, prompt, df=None, retry_stats: RetryStats = None, cancel_token: CancellationToken = None):
         def _call():
+            self._admit()
             try:
-                return self.client.call(prompt, df)
-            except self.fatal_errors:
-                raise
-            except self.retryable_errors:
+                result = self._send(prompt, df) if self.hedger is None else self._send_hedged(prompt, df)
+            except BaseException as e:
+                # Includes cancellation, which must still free a half-open probe slot
+                self._record_attempt_error(e)
                 raise
-            except Exception:
+            self._record_attempt_success()
+            return result
+
+        return self.retry_policy.call(_call, self.retryable_errors, self.quota_errors, retry_stats, cancel_token)
+
+    async def _acall_with_retry(
+        self, prompt, df=None, retry_stats: RetryStats = None, cancel_token: CancellationToken = None
+    ):
+        async def _call():
+            self._admit()
+            try:
+                if self.hedger is None:
+                    result = await self._asend(prompt, df)
+                else:
+                    result = await self._asend_hedged(prompt, df)
+            except BaseException as e:
+                # Includes cancellation, which must still free a half-open probe slot
+                self._record_attempt_error(e)
                 raise
+            self._record_attempt_success()
+            return result
+
+        return await self.retry_policy.acall(
+            _call, self.retryable_errors, self.quota_errors, retry_stats, cancel_token
+        )
+
+    def _send(self, prompt, df=None):
+        """One client request, paced by the rate limiter when there is one."""
+        return self._send_admitted(prompt, df, self._acquire_slot(prompt, df))
+
+    async def _asend(self, prompt, df=None):
+        return await self._asend_admitted(prompt, df, await self._aacquire_slot(prompt, df))
+
+    def _acquire_slot(self, prompt, df=None) -> Optional[int]:
+        """Waits for the rate limiter to admit the request; returns the tokens reserved, if any."""
+        if self.rate_limiter is None:
+            return None
+        estimated = self._estimate_request_tokens(prompt, df)
+        self.rate_limiter.acquire(estimated)
+        return estimated
+
+    async def _aacquire_slot(self, prompt, df=None) -> Optional[int]:
+        if self.rate_limiter is None:
+            return None
+        estimated = self._estimate_request_tokens(prompt, df)
+        await self.rate_limiter.aacquire(estimated)
+        return estimated
+
+    def _send_admitted(self, prompt, df, reserved_tokens: Optional[int]):
+        """Sends a request the limiter has admitted; its latency excludes the wait for admission."""
+        started = time.monotonic()
+        result = self.client.call(prompt, df)
+        self._record_request(started, result, reserved_tokens)
+        return result
+
+    async def _asend_admitted(self, prompt, df, reserved_tokens: Optional[int]):
+        started = time.monotonic()
+        result = await self.client.acall(prompt, df)
+        self._record_request(started, result, reserved_tokens)
+        return result
+
+    def _record_request(self, started: float, result, reserved_tokens: Optional[int]):
+        if reserved_tokens is not None:
+            self.rate_limiter.settle(reserved_tokens, result[1].total_tokens)
+        latency = time.monotonic() - started
+        if self.hedger is not None:
+            self.hedger.latencies.record(latency)
+        if self.latency_listener is not None:
+            self.latency_listener(latency)
+
+    def _send_hedged(self, prompt, df=None):
+        """
+        Sends the request and, if it outlasts the hedger's latency percentile, a duplicate;
+        the first successful response wins and the hedge's tokens are added to its usage.
+        The hedge timer starts once the rate limiter has admitted the primary request.
+        """
+        delay = self.hedger.hedge_delay()
+        if delay is None:
+            return self._send(prompt, df)
+
+        pool = _hedge_pool()
+        primary = pool.submit(self._send_admitted, prompt, df, self._acquire_slot(prompt, df))
+        done, _ = wait([primary], timeout=delay)
+        estimated = self._estimate_request_tokens(prompt, df)
+        if done or not self.hedger.try_reserve(estimated):
+            return primary.result()
+
+        hedge = pool.submit(self._send, prompt, df)
+        pending = {primary, hedge}
+        errors = {}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return self._hedged_result(future.result(), estimated, hedge_won=future is hedge)
+                errors[future] = future.exception()
+        raise errors[primary]
+
+    async def _asend_hedged(self, prompt, df=None):
+        """Async counterpart of `_send_hedged`; the losing request is cancelled."""
+        delay = self.hedger.hedge_delay()
+        if delay is None:
+            return await self._asend(prompt, df)
+
+        reserved_tokens = await self._aacquire_slot(prompt, df)
+        primary = asyncio.ensure_future(self._asend_admitted(prompt, df, reserved_tokens))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        estimated = self._estimate_request_tokens(prompt, df)
+        if done or not self.hedger.try_reserve(estimated):
+            return await primary
+
+        hedge = asyncio.ensure_future(self._asend(prompt, df))
+        pending = {primary, hedge}
+        errors = {}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return self._hedged_result(task.result(), estimated, hedge_won=task is hedge)
+                    errors[task] = task.exception()
+            raise errors[primary]
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _hedged_result(self, result, estimated_input_tokens: int, hedge_won: bool):
+        """Charges the duplicate request to the returned usage so it counts against the token budget."""
+        text, usage = result
+        self.hedger.record_outcome(hedge_won, usage.output_tokens)
+        extra = estimated_input_tokens + usage.output_tokens
+        return text, TokenUsage(
+            usage.input_tokens + estimated_input_tokens,
+            usage.output_tokens * 2,
+            usage.total_tokens + extra,
+            estimated=True,
+        )
+
+    def _estimate_request_tokens(self, prompt, df=None) -> int:
+        """Input tokens reserved before a request; the limiter is corrected with the reported usage."""
+        text = self.client._format_input(prompt, df) if df is not None else prompt
+        return estimate_tokens(text, self.client.model_name)
+
+    def _uses_cache(self, df) -> bool:
+        return self.response_cache is not None and df is not None and len(df) > 0
+
+    def _lookup_rows(self, prompt: str, df: pd.DataFrame) -> CacheLookup:
+        keys = row_cache_keys(
+            prompt,
+            df,
+            model_name=self.client.model_name,
+            generation_config=self.client.generation_config,
+            row_format=self.client.row_format,
+        )
+        cached = self.response_cache.get_many(keys)
+        miss_positions = [position for position, key in enumerate(keys) if key not in cached]
+        return CacheLookup(keys, cached, miss_positions)
+
+    @staticmethod
+    def _miss_rows(df: pd.DataFrame, lookup: CacheLookup) -> pd.DataFrame:
+        # Renumbered from zero so the model sees rows 1..n, matching the response lines
+        return df.iloc[lookup.miss_positions].reset_index(drop=True)
+
+    def _merge_rows(self, lookup: CacheLookup, text: str) -> str:
+        """
+        Stores the responses of the sent rows and rebuilds the chunk's full response
+        in row order. Rows whose response line is missing are left out, so the caller
+        sees the same row count mismatch it would for an uncached call.
+        """
+        sent = parse_row_responses(text, len(lookup.miss_positions))
+        fresh = {
+            lookup.keys[position]: sent[number]
+            for number, position in enumerate(lookup.miss_positions, start=1)
+            if number in sent
+        }
+        self.response_cache.put_many(fresh.items())
 
-        return _call()
+        responses = {**lookup.cached, **fresh}
+        incomplete = any(key not in responses for key in lookup.keys)
+        if incomplete and not lookup.cached:
+            # Nothing came from the cache, so the model's own response is returned untouched
+            return text
+        return format_indexed_responses([responses[key] for key in lookup.keys if key in responses])
@@ -0,0 +1,159 @@
+import asyncio
+import random
+import re
+import time
+from typing import Awaitable, Callable, Optional, Tuple, Type, TypeVar
+
+from utils.constants import (
+    DEFAULT_RETRY_ATTEMPTS,
+    DEFAULT_RETRY_BASE_DELAY,
+    DEFAULT_RETRY_MAX_DELAY,
+    DEFAULT_QUOTA_RETRY_DEADLINE,
+)
+from utils.cancellation_token import CancellationToken
+from utils.exceptions import OperationCancelledError, RetriesExhaustedError
+from utils.retry_stats import RetryStats
+
+T = TypeVar("T")
+
+_RETRY_IN_PATTERN = re.compile(r"retry in\s+([0-9]+(?:\.[0-9]+)?)\s*s", re.IGNORECASE)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """
+    Server-suggested wait before retrying, if the error carries one.
+
+    Looks at a ``Retry-After`` header of an HTTP response, a ``google.rpc.RetryInfo``
+    entry in the error details and, last, a "retry in 12.5s" hint in the message.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except (TypeError, ValueError):
+            pass
+
+    for detail in getattr(error, "details", None) or ():
+        retry_delay = getattr(detail, "retry_delay", None)
+        if retry_delay is not None:
+            return max(0.0, getattr(retry_delay, "seconds", 0) + getattr(retry_delay, "nanos", 0) / 1e9)
+
+    match = _RETRY_IN_PATTERN.search(str(error))
+    if match:
+        return float(match.group(1))
+    return None
+
+
+class RetryPolicy:
+    """
+    Retries a call on the given errors with decorrelated jitter backoff.
+
+    Each wait is drawn uniformly between ``base_delay`` and three times the previous
+    wait, capped at ``max_delay``. A server hint (see `retry_after_seconds`) is used
+    as the lower bound of the wait and may exceed the cap.
+
+    Ordinary errors are retried until ``max_attempts`` calls were made. Quota errors
+    are not bounded by attempts but by ``quota_deadline`` seconds since the first
+    call, so a run waits out a throttling window instead of giving up on it.
+    When retries stop, `RetriesExhaustedError` is raised from the last error. With a
+    cancellation token, no attempt starts after cancellation and backoff waits end
+    early, raising `OperationCancelledError`.
+
+    A policy holds no per-call state and can be shared by concurrent calls.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = DEFAULT_RETRY_ATTEMPTS,
+        base_delay: float = DEFAULT_RETRY_BASE_DELAY,
+        max_delay: float = DEFAULT_RETRY_MAX_DELAY,
+        quota_deadline: float = DEFAULT_QUOTA_RETRY_DEADLINE,
+        rng: Optional[random.Random] = None,
+    ):
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = max(0.0, base_delay)
+        self.max_delay = max(self.base_delay, max_delay)
+        self.quota_deadline = quota_deadline
+        self._rng = rng or random.Random()
+
+    def next_delay(self, previous_delay: Optional[float], error: Optional[Exception] = None) -> float:
+        """Decorrelated jitter wait after ``previous_delay``, raised to the error's retry hint."""
+        upper = self.base_delay if previous_delay is None else max(self.base_delay, previous_delay * 3)
+        delay = min(self.max_delay, self._rng.uniform(self.base_delay, upper))
+        hint = retry_after_seconds(error) if error is not None else None
+        return delay if hint is None else max(delay, hint)
+
+    def _backoff(
+        self,
+        error: Exception,
+        attempt: int,
+        started: float,
+        previous_delay: Optional[float],
+        quota_errors: Tuple[Type[BaseException], ...],
+    ) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None when retries are used up."""
+        delay = self.next_delay(previous_delay, error)
+        if isinstance(error, quota_errors):
+            if time.monotonic() - started + delay > self.quota_deadline:
+                return None
+        elif attempt >= self.max_attempts:
+            return None
+        return delay
+
+    def call(
+        self,
+        func: Callable[[], T],
+        retryable_errors: Tuple[Type[BaseException], ...],
+        quota_errors: Tuple[Type[BaseException], ...] = (),
+        stats: Optional[RetryStats] = None,
+        cancel_token: Optional[CancellationToken] = None,
+    ) -> T:
+        """Calls ``func`` until it succeeds, fails with a non-retryable error or retries run out."""
+        stats = stats if stats is not None else RetryStats()
+        started = time.monotonic()
+        delay = None
+        while True:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            stats.attempts += 1
+            try:
+                return func()
+            except retryable_errors as e:
+                delay = self._backoff(e, stats.attempts, started, delay, quota_errors)
+                if delay is None:
+                    raise RetriesExhaustedError(e, stats.attempts) from e
+                stats.sleep_seconds += delay
+                if cancel_token is None:
+                    time.sleep(delay)
+                elif cancel_token.wait(delay):
+                    raise OperationCancelledError() from e
+
+    async def acall(
+        self,
+        func: Callable[[], Awaitable[T]],
+        retryable_errors: Tuple[Type[BaseException], ...],
+        quota_errors: Tuple[Type[BaseException], ...] = (),
+        stats: Optional[RetryStats] = None,
+        cancel_token: Optional[CancellationToken] = None,
+    ) -> T:
+        """Async counterpart of `call`; ``func`` returns a fresh awaitable per attempt."""
+        stats = stats if stats is not None else RetryStats()
+        started = time.monotonic()
+        delay = None
+        while True:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            stats.attempts += 1
+            try:
+                return await func()
+            except retryable_errors as e:
+                delay = self._backoff(e, stats.attempts, started, delay, quota_errors)
+                if delay is None:
+                    raise RetriesExhaustedError(e, stats.attempts) from e
+                stats.sleep_seconds += delay
+                if cancel_token is None:
+                    await asyncio.sleep(delay)
+                elif await cancel_token.async_wait(delay):
+                    raise OperationCancelledError() from e
@@ -0,0 +1,164 @@
+from typing import Callable, Dict, List
+
+import pandas as pd
+
+from utils.constants import DEFAULT_ROW_FORMAT
+
+# Name of the 1-based row number column the compact layouts prepend
+ROW_NUMBER_COLUMN = "row"
+# Row number key used by the key-abbreviated JSON layout
+SHORT_ROW_NUMBER_KEY = "r"
+
+
+def format_rows(df: pd.DataFrame) -> str:
+    """
+    Default layout, one block per row with every column on its own line:
+
+        Row 1:
+        - name: Alice
+        - age: 30
+
+    Built column by column, the output is identical to formatting each row
+    from ``df.fillna("").iterrows()`` without constructing a Series per row.
+    """
+    df = df.fillna("")
+    # iterrows reads rows from the interleaved .values array, so cells are upcast the same way here
+    values = df.values
+
+    column_lines = []
+    for position, col in enumerate(df.columns):
+        cells = values[:, position]
+        if cells.dtype.kind in "mM":
+            # A row Series boxes datetime64/timedelta64 values into Timestamp/Timedelta
+            cells = pd.Series(cells)
+        prefix = f"- {col}: "
+        column_lines.append([f"{prefix}{cell}" for cell in cells])
+
+    headers = [f"Row {idx + 1}:" for idx in df.index]
+    return "\n\n".join("\n".join(lines) for lines in zip(headers, *column_lines))
+
+
+def _with_row_numbers(df: pd.DataFrame) -> pd.DataFrame:
+    numbered = df.copy(deep=False)
+    numbered.insert(0, ROW_NUMBER_COLUMN, range(1, len(df) + 1), allow_duplicates=True)
+    return numbered
+
+
+def format_csv(df: pd.DataFrame) -> str:
+    """Header line once, then one comma-separated line per row, prefixed by its row number."""
+    return _with_row_numbers(df).to_csv(index=False, lineterminator="\n").rstrip("\n")
+
+
+def format_tsv(df: pd.DataFrame) -> str:
+    """Tab-separated variant of `format_csv`."""
+    return _with_row_numbers(df).to_csv(sep="\t", index=False, lineterminator="\n").rstrip("\n")
+
+
+def _cell_strings(df: pd.DataFrame) -> Dict[str, List[str]]:
+    """Cell text per column for the delimiter-based layouts, with missing values left empty."""
+    strings = df.fillna("").astype(str)
+    return {
+        col: strings.iloc[:, position].str.replace("|", "\\|", regex=False)
+                                      .str.replace("\n", " ", regex=False).tolist()
+        for position, col in enumerate(df.columns)
+    }
+
+
+def format_markdown_table(df: pd.DataFrame) -> str:
+    """
+    Header-once pipe table:
+
+        | row | name | age |
+        | --- | --- | --- |
+        | 1 | Alice | 30 |
+    """
+    columns = [ROW_NUMBER_COLUMN, *map(str, df.columns)]
+    cells = [[str(number) for number in range(1, len(df) + 1)], *_cell_strings(df).values()]
+    lines = [
+        "| " + " | ".join(columns) + " |",
+        "| " + " | ".join("---" for _ in columns) + " |",
+    ]
+    lines.extend("| " + " | ".join(row) + " |" for row in zip(*cells))
+    return "\n".join(lines)
+
+
+def format_columns(df: pd.DataFrame) -> str:
+    """
+    Column-dictionary layout, one line per column listing its values in row order:
+
+        row: 1 | 2
+        name: Alice | Bob
+    """
+    if len(df) == 0:
+        return ""
+    lines = [f"{ROW_NUMBER_COLUMN}: " + " | ".join(str(number) for number in range(1, len(df) + 1))]
+    lines.extend(f"{col}: " + " | ".join(values) for col, values in _cell_strings(df).items())
+    return "\n".join(lines)
+
+
+def _json_lines(df: pd.DataFrame, row_key: str) -> str:
+    if len(df.columns) == 0:
+        return "\n".join(f'{{"{row_key}":{number}}}' for number in range(1, len(df) + 1))
+    if len(df) == 0:
+        return ""
+    lines = df.to_json(orient="records", lines=True, force_ascii=False, date_format="iso").splitlines()
+    return "\n".join(
+        f'{{"{row_key}":{number},{line[1:]}'
+        for number, line in enumerate(lines, start=1)
+    )
+
+
+def format_jsonl(df: pd.DataFrame) -> str:
+    """One JSON object per line, each starting with its row number."""
+    return _json_lines(df, ROW_NUMBER_COLUMN)
+
+
+def format_jsonl_short(df: pd.DataFrame) -> str:
+    """
+    JSON lines with column names replaced by short keys, defined once in a legend:
+
+        Keys: c1=name, c2=age
+        {"r":1,"c1":"Alice","c2":30}
+    """
+    keys = [f"c{position}" for position in range(1, len(df.columns) + 1)]
+    legend = "Keys: " + ", ".join(f"{key}={col}" for key, col in zip(keys, df.columns))
+    body = _json_lines(df.set_axis(keys, axis=1), SHORT_ROW_NUMBER_KEY)
+    return f"{legend}\n{body}" if body else ""
+
+
+ROW_FORMATTERS: Dict[str, Callable[[pd.DataFrame], str]] = {
+    "rows": format_rows,
+    "table": format_markdown_table,
+    "columns": format_columns,
+    "csv": format_csv,
+    "tsv": format_tsv,
+    "jsonl": format_jsonl,
+    "jsonl_short": format_jsonl_short,
+}
+
+# Short descriptions shown when choosing a layout
+ROW_FORMAT_LABELS: Dict[str, str] = {
+    "rows": "Row blocks (column names on every row)",
+    "table": "Table (header once)",
+    "columns": "Column dictionary (one line per column)",
+    "csv": "CSV",
+    "tsv": "TSV",
+    "jsonl": "JSON lines",
+    "jsonl_short": "JSON lines with abbreviated keys",
+}
+
+
+def format_table(df: pd.DataFrame, row_format: str = DEFAULT_ROW_FORMAT) -> str:
+    """
+    Serializes a chunk's rows using the named layout.
+
+    Raises:
+        ValueError: If ``row_format`` is not a known layout.
+    """
+    try:
+        formatter = ROW_FORMATTERS[row_format]
+    except KeyError:
+        raise ValueError(
+            f"Unknown row format: {row_format}. Choose one of: {', '.join(ROW_FORMATTERS)}"
+        ) from None
+    return formatter(df)
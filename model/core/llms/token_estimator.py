@@ -0,0 +1,75 @@
+import logging
+import math
+from functools import lru_cache
+from typing import Optional
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio used when no tiktoken encoding can be loaded
+CHARS_PER_TOKEN = 4
+FALLBACK_ENCODING = "cl100k_base"
+
+
+@lru_cache(maxsize=None)
+def _load_encoding(model_name: str) -> Optional["tiktoken.Encoding"]:
+    """
+    Load the tiktoken encoding for a model, falling back to cl100k_base.
+
+    Returns None when no encoding is available (e.g. the BPE file cannot be
+    downloaded on an offline machine), so callers can use the character heuristic.
+    """
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        pass
+    except Exception as e:
+        logger.warning(f"Could not load tiktoken encoding for {model_name}: {e}")
+        return None
+
+    try:
+        return tiktoken.get_encoding(FALLBACK_ENCODING)
+    except Exception as e:
+        logger.warning(f"Could not load tiktoken encoding {FALLBACK_ENCODING}: {e}")
+        return None
+
+
+class ApproximateEncoding:
+    """Stand-in for a tiktoken encoding, counting about CHARS_PER_TOKEN characters per token."""
+
+    def encode(self, text: str) -> list:
+        return [0] * math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+APPROXIMATE_ENCODING = ApproximateEncoding()
+
+
+def get_encoding(model_name: str = ""):
+    """
+    The process-wide cached encoding for a model, or `APPROXIMATE_ENCODING` when no
+    tiktoken encoding can be loaded. Every local token count should go through this
+    loader so all of them fail over the same way.
+    """
+    encoding = _load_encoding(model_name.lower())
+    return APPROXIMATE_ENCODING if encoding is None else encoding
+
+
+def estimate_tokens(text: str, model_name: str = "") -> int:
+    """
+    Estimate the number of tokens in a text locally, without any API call.
+
+    Args:
+        text: Text to estimate.
+        model_name: Model whose tokenizer should be approximated.
+
+    Returns:
+        int: Estimated token count.
+    """
+    if not text:
+        return 0
+
+    encoding = _load_encoding(model_name.lower())
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text))
@@ -1,12 +1,14 @@
 # csv_exporter.py
 
-import json
 import pandas as pd
+from itertools import chain, groupby
+from operator import itemgetter
 from pathlib import Path
 from typing import List, Dict, Any
 
-from model.io.sqlite_result_saver import SQLiteResultSaver
-from utils.constants import JSON_CHUNK_FILE
+from model.core.chunk.chunk_store import open_chunk_store
+from model.io.sqlite_result_saver import SQLiteResultSaver, RESULT_COLUMNS
+from utils.constants import JSON_CHUNK_FILE, DEFAULT_EXPORT_BATCH_SIZE
 
 
 class CSVExporter:
@@ -27,13 +29,11 @@ class CSVExporter:
             print(f"Warning: Chunk JSON file not found at {self.json_path}. Exporting only data from the database.")
             merged_df = processed_df
         else:
-            with open(self.json_path, "r") as f:
-                data = json.load(f)
+            store = open_chunk_store(self.json_path)
 
             all_chunk_rows = []
-            for chunk in data["chunks"]:
-                df = pd.DataFrame(chunk["data"])
-                df["chunk_id"] = chunk["chunk_id"]
+            for chunk_id, df in store.iter_chunks():
+                df["chunk_id"] = chunk_id
                 all_chunk_rows.append(df)
 
             original_df = pd.concat(all_chunk_rows, ignore_index=True)
@@ -49,4 +49,68 @@ class CSVExporter:
 
         # Export the final, cleaned-up file
         merged_df.to_csv(csv_path, index=False)
-        print(f"✅ Exported {len(merged_df)} rows to: {csv_path}")
\ No newline at end of file
+        print(f"✅ Exported {len(merged_df)} rows to: {csv_path}")
+
+    def export_processed_streaming(self, csv_path: str, batch_size: int = DEFAULT_EXPORT_BATCH_SIZE) -> int:
+        """
+        Streaming variant of `export_processed_with_original_rows` producing the same columns.
+
+        Results are read from SQLite in batches, grouped by chunk. Each chunk's rows
+        are joined by source_id against only that chunk's original rows, located through
+        the chunk file's index, and appended to the CSV, so every chunk is read once.
+        For JSON Lines chunk files memory stays bounded by the batch size and a single
+        chunk, regardless of dataset size.
+
+        The header comes from the chunk file's column schema, so results of chunks that
+        are no longer in the chunk file are written with empty original columns instead
+        of deciding the layout of the whole file.
+
+        Returns:
+            Number of rows written.
+        """
+        store = open_chunk_store(self.json_path) if self.json_path.exists() else None
+        if store is None:
+            print(f"Warning: Chunk JSON file not found at {self.json_path}. Exporting only data from the database.")
+
+        columns = self._export_columns(store)
+        written = 0
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            pd.DataFrame(columns=columns).to_csv(f, index=False)
+            results = chain.from_iterable(self.db_saver.iter_results(batch_size=batch_size))
+            for chunk_id, rows in groupby(results, key=itemgetter("chunk_id")):
+                merged_df = self._join_chunk(store, chunk_id, pd.DataFrame(list(rows)))
+                merged_df.reindex(columns=columns).to_csv(f, index=False, header=False)
+                written += len(merged_df)
+
+        if not written:
+            Path(csv_path).unlink()
+            raise ValueError("No processed data found in the database to export.")
+
+        print(f"✅ Exported {written} rows to: {csv_path}")
+        return written
+
+    @staticmethod
+    def _export_columns(store) -> List[str]:
+        """Columns of a joined chunk: the original columns followed by the database columns."""
+        processed_df = pd.DataFrame(columns=list(RESULT_COLUMNS))
+        if store is None:
+            return list(processed_df.columns)
+        original_columns = [column for column in store.columns if column != "chunk_id"]
+        if "source_id" not in original_columns:
+            original_columns.insert(0, "source_id")
+        merged_df = pd.merge(pd.DataFrame(columns=original_columns), processed_df, on="source_id", how="right")
+        return list(merged_df.columns)
+
+    @staticmethod
+    def _join_chunk(store, chunk_id: str, processed_df: pd.DataFrame) -> pd.DataFrame:
+        """Joins one chunk's processed rows with that chunk's original rows."""
+        if store is None:
+            return processed_df
+        try:
+            original_df = store.read_chunk(chunk_id)
+        except KeyError:
+            # Results for chunks that are not in the current chunk file keep only database columns
+            return processed_df
+
+        original_df = original_df.drop(columns=["chunk_id"], errors="ignore")
+        return pd.merge(original_df, processed_df, on="source_id", how="right")
@@ -1,10 +1,11 @@
 import os
 import shelve
 from contextlib import contextmanager
-from typing import List, Dict
+from typing import List, Dict, Tuple
 
 from utils.constants import MODEL_PREFS_DB_PATH, MODEL_KEY, MODEL_LIST_KEY, MODEL_CONFIG_KEY, \
-    REMAINING_TOTAL_TOKENS_KEY, TOTAL_TOKENS_KEY, CHUNK_SIZE_KEY, DEFAULT_CHUNK_SIZE
+    REMAINING_TOTAL_TOKENS_KEY, TOTAL_TOKENS_KEY, CHUNK_SIZE_KEY, DEFAULT_CHUNK_SIZE, ROW_FORMAT_KEY, \
+    DEFAULT_ROW_FORMAT, RATE_LIMITS_KEY
 
 
 class ModelPreference:
@@ -21,6 +22,8 @@ class ModelPreference:
         self.remaining_tokens_key = REMAINING_TOTAL_TOKENS_KEY
         self.total_tokens_key = TOTAL_TOKENS_KEY
         self.chunk_size_key = CHUNK_SIZE_KEY
+        self.row_format_key = ROW_FORMAT_KEY
+        self.rate_limits_key = RATE_LIMITS_KEY
         self._ensure_db_dir()
 
     def _ensure_db_dir(self) -> None:
@@ -56,6 +59,35 @@ class ModelPreference:
         with self._shelve_operation() as db:
             db[self.chunk_size_key] = chunk_size
 
+    @property
+    def row_format(self) -> str:
+        """str: Get or set the layout used to serialize chunk rows into prompts."""
+        with self._shelve_operation() as db:
+            return db.get(self.row_format_key, DEFAULT_ROW_FORMAT)
+
+    @row_format.setter
+    def row_format(self, row_format: str) -> None:
+        with self._shelve_operation() as db:
+            db[self.row_format_key] = row_format
+
+    # === Rate limits per model ===
+    @property
+    def rate_limits(self) -> Dict[str, Dict[str, int]]:
+        """Dict[str, Dict[str, int]]: Requests and tokens per minute allowed for each model (0 = unlimited)."""
+        with self._shelve_operation() as db:
+            return db.get(self.rate_limits_key, {})
+
+    def get_rate_limits(self, model_name: str) -> Tuple[int, int]:
+        """Returns (requests_per_minute, tokens_per_minute) for a model, 0 meaning unlimited."""
+        limits = self.rate_limits.get(model_name, {})
+        return limits.get("rpm", 0), limits.get("tpm", 0)
+
+    def set_rate_limits(self, model_name: str, requests_per_minute: int, tokens_per_minute: int) -> None:
+        with self._shelve_operation() as db:
+            limits = db.get(self.rate_limits_key, {})
+            limits[model_name] = {"rpm": int(requests_per_minute), "tpm": int(tokens_per_minute)}
+            db[self.rate_limits_key] = limits
+
     # === Token count properties ===
     @property
     def remaining_total_tokens(self) -> int:
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from utils.constants import RESPONSE_CACHE_DB_PATH, DEFAULT_CACHE_TTL_SECONDS, DEFAULT_CACHE_MAX_ENTRIES
+
+# Keys bound per lookup query, well under SQLite's host parameter limit
+KEY_QUERY_BATCH_SIZE = 500
+
+
+def row_cache_keys(
+    prompt: str,
+    df: pd.DataFrame,
+    model_name: str,
+    generation_config: Optional[Dict[str, Any]] = None,
+    row_format: str = "",
+) -> List[str]:
+    """
+    Cache key of every row of a chunk: a SHA-256 over the model, generation config,
+    row layout, prompt and the row's values.
+
+    The 'source_id' column is left out, so identical rows in different files or
+    positions share a cached response.
+    """
+    context = json.dumps(
+        [model_name, generation_config or {}, row_format, prompt.strip()],
+        sort_keys=True, default=str,
+    ).encode("utf-8")
+    content = df.drop(columns=["source_id"], errors="ignore")
+    if len(content.columns) == 0:
+        lines = ["{}"] * len(content)
+    else:
+        lines = content.to_json(orient="records", lines=True, force_ascii=False, date_format="iso").splitlines()
+
+    keys = []
+    for line in lines:
+        digest = hashlib.sha256(context)
+        digest.update(b"\0")
+        digest.update(line.encode("utf-8"))
+        keys.append(digest.hexdigest())
+    return keys
+
+
+class ResponseCache:
+    """
+    Persistent per-row cache of LLM responses in SQLite.
+
+    Entries expire ``ttl_seconds`` after they were stored. When more than
+    ``max_entries`` remain, the least recently used ones are evicted. Lookups
+    update ``hits`` and ``misses``, counted per row.
+
+    The number of entries is counted once when the cache is opened and then kept
+    up to date in memory, so writes never scan the table to enforce ``max_entries``.
+
+    Like SQLiteResultSaver, a single WAL connection is shared by all threads;
+    call `close` when done.
+    """
+
+    def __init__(
+        self,
+        db_path: str = RESPONSE_CACHE_DB_PATH,
+        ttl_seconds: float = DEFAULT_CACHE_TTL_SECONDS,
+        max_entries: int = DEFAULT_CACHE_MAX_ENTRIES,
+    ):
+        self.db_path = Path(db_path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._init_db()
+        self._entries = len(self)
+
+    def _init_db(self):
+        with self._lock, self._conn as conn:
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute("PRAGMA synchronous=NORMAL;")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                );
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_last_used ON response_cache(last_used);")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_created_at ON response_cache(created_at);")
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        """
+        Looks up cached responses, ignoring expired entries.
+
+        Returns:
+            Response for every key found; keys without a live entry are absent.
+        """
+        now = time.time()
+        found: Dict[str, str] = {}
+        with self._lock, self._conn as conn:
+            for start in range(0, len(keys), KEY_QUERY_BATCH_SIZE):
+                batch = keys[start:start + KEY_QUERY_BATCH_SIZE]
+                placeholders = ",".join("?" for _ in batch)
+                found.update(conn.execute(
+                    f"SELECT cache_key, response FROM response_cache "
+                    f"WHERE cache_key IN ({placeholders}) AND created_at > ?;",
+                    (*batch, now - self.ttl_seconds),
+                ).fetchall())
+            conn.executemany(
+                "UPDATE response_cache SET last_used = ? WHERE cache_key = ?;",
+                [(now, key) for key in found],
+            )
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, str]]):
+        """Stores (key, response) pairs, then evicts expired and excess entries."""
+        now = time.time()
+        responses = dict(items)
+        rows = [(key, response, now, now) for key, response in responses.items()]
+        if not rows:
+            return
+        with self._lock, self._conn as conn:
+            keys = list(responses)
+            existing = 0
+            for start in range(0, len(keys), KEY_QUERY_BATCH_SIZE):
+                batch = keys[start:start + KEY_QUERY_BATCH_SIZE]
+                placeholders = ",".join("?" for _ in batch)
+                existing += conn.execute(
+                    f"SELECT COUNT(*) FROM response_cache WHERE cache_key IN ({placeholders});", batch
+                ).fetchone()[0]
+            conn.executemany("""
+                INSERT INTO response_cache (cache_key, response, created_at, last_used)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(cache_key) DO UPDATE SET
+                    response = excluded.response,
+                    created_at = excluded.created_at,
+                    last_used = excluded.last_used;
+            """, rows)
+            self._entries += len(rows) - existing
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        expired = conn.execute("DELETE FROM response_cache WHERE created_at <= ?;", (now - self.ttl_seconds,))
+        self._entries -= expired.rowcount
+        excess = self._entries - self.max_entries
+        if excess > 0:
+            evicted = conn.execute("""
+                DELETE FROM response_cache WHERE cache_key IN (
+                    SELECT cache_key FROM response_cache ORDER BY last_used LIMIT ?
+                );
+            """, (excess,))
+            self._entries -= evicted.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM response_cache;").fetchone()[0]
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def clear(self):
+        """Removes every cached response."""
+        with self._lock, self._conn as conn:
+            conn.execute("DELETE FROM response_cache;")
+            self._entries = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
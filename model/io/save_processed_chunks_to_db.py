@@ -1,5 +1,6 @@
 from model.io.sqlite_result_saver import SQLiteResultSaver
 from utils.chunk_process_result import ChunkProcessResult
+from utils.response_parser import parse_response_lines
 from utils.result_type import ResultType
 
 
@@ -17,8 +18,7 @@ def save_processed_chunk_to_db(
         raise ValueError("Missing chunk in result for saving.")
 
     # Parse per-row responses
-    response_lines = result.response.strip().splitlines()
-    responses = [line.split(":", 1)[1].strip() for line in response_lines if ":" in line]
+    responses = parse_response_lines(result.response)
 
     if len(responses) != len(result.chunk):
         raise ValueError("Mismatch between response lines and chunk rows.")
@@ -1,33 +1,157 @@
+import hashlib
 import sqlite3
+import threading
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Iterator, List, Dict, Any
 from datetime import datetime
 
-from utils.constants import RESULTS_DB_PATH
+from utils.constants import RESULTS_DB_PATH, DEFAULT_EXPORT_BATCH_SIZE
+
+# Bumped whenever the schema changes; stored in PRAGMA user_version
+RESULTS_SCHEMA_VERSION = 1
+
+SCHEMA_STATEMENTS = (
+    """
+    CREATE TABLE IF NOT EXISTS prompts (
+        prompt_hash TEXT PRIMARY KEY,
+        prompt TEXT NOT NULL
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS models (
+        model_hash TEXT PRIMARY KEY,
+        model_version TEXT NOT NULL
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        source_id TEXT NOT NULL,
+        chunk_id TEXT NOT NULL,
+        prompt_hash TEXT NOT NULL REFERENCES prompts(prompt_hash),
+        response TEXT NOT NULL,
+        used_tokens INTEGER,
+        model_hash TEXT NOT NULL REFERENCES models(model_hash),
+        timestamp TEXT NOT NULL,
+        UNIQUE(source_id, prompt_hash)  -- Prevent duplicates
+    );
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_results_chunk_id ON results(chunk_id);",
+    "CREATE INDEX IF NOT EXISTS idx_results_model_timestamp ON results(model_hash, timestamp);",
+    "CREATE INDEX IF NOT EXISTS idx_results_timestamp ON results(timestamp);",
+)
+
+# Statements are module constants so the connection's statement cache reuses them
+INSERT_PROMPT_SQL = "INSERT OR IGNORE INTO prompts (prompt_hash, prompt) VALUES (?, ?);"
+INSERT_MODEL_SQL = "INSERT OR IGNORE INTO models (model_hash, model_version) VALUES (?, ?);"
+INSERT_RESULT_SQL = """
+    INSERT OR IGNORE INTO results (
+        source_id,
+        chunk_id,
+        prompt_hash,
+        response,
+        used_tokens,
+        model_hash,
+        timestamp
+    ) VALUES (?, ?, ?, ?, ?, ?, ?);
+"""
+SELECT_ALL_SQL = """
+    SELECT r.id, r.source_id, r.chunk_id, p.prompt, r.response, r.used_tokens, m.model_version, r.timestamp
+    FROM results r
+    JOIN prompts p ON p.prompt_hash = r.prompt_hash
+    JOIN models m ON m.model_hash = r.model_hash
+    ORDER BY r.id
+"""
+# Groups each chunk's rows together, via the chunk_id index, for streaming exports
+SELECT_BY_CHUNK_SQL = SELECT_ALL_SQL.replace("ORDER BY r.id", "ORDER BY r.chunk_id, r.id")
+# Source ids bound per lookup query, well under SQLite's host parameter limit
+SOURCE_ID_QUERY_BATCH_SIZE = 500
+
+RESULT_COLUMNS = ("id", "source_id", "chunk_id", "prompt", "response", "used_tokens", "model_version", "timestamp")
+
+
+def text_hash(text: str) -> str:
+    """Stable 64-bit hex key used for the prompt and model lookup tables."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
 
 
 class SQLiteResultSaver:
+    """
+    Stores per-row LLM results in SQLite.
+
+    Prompts and model versions are stored once in lookup tables keyed by
+    `text_hash`; result rows only carry the hashes. Databases written with the
+    earlier single-table schema are migrated when opened.
+
+    A single connection in WAL mode is opened per saver and shared by its methods,
+    so one saver can be reused across chunks and threads; call `close` when done.
+    """
+
     def __init__(self, db_path: str = RESULTS_DB_PATH):
         self.db_path = Path(db_path)
+        self._lock = threading.RLock()
+        self._conn = self._connect()
         self._init_db()
 
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        conn.execute("PRAGMA temp_store=MEMORY;")
+        conn.execute("PRAGMA cache_size=-16000;")
+        conn.create_function("text_hash", 1, text_hash, deterministic=True)
+        return conn
+
     def _init_db(self):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS results (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    source_id TEXT NOT NULL,
-                    chunk_id TEXT NOT NULL,
-                    prompt TEXT NOT NULL,
-                    response TEXT NOT NULL,
-                    used_tokens INTEGER,
-                    model_version TEXT NOT NULL,
-                    timestamp TEXT NOT NULL,
-                    UNIQUE(source_id, prompt)  -- Prevent duplicates
-                );
-            """)
-            conn.commit()
+        with self._lock:
+            if self._schema_version() >= RESULTS_SCHEMA_VERSION:
+                return
+
+            with self._conn as conn:
+                # Schema changes and the migration commit or roll back together
+                conn.execute("BEGIN IMMEDIATE;")
+                if self._schema_version() >= RESULTS_SCHEMA_VERSION:
+                    return
+                migrated = self._has_legacy_results_table()
+                if migrated:
+                    conn.execute("ALTER TABLE results RENAME TO results_legacy;")
+                for statement in SCHEMA_STATEMENTS:
+                    conn.execute(statement)
+                if migrated:
+                    self._migrate_legacy_results(conn)
+                conn.execute(f"PRAGMA user_version = {RESULTS_SCHEMA_VERSION};")
+
+            if migrated:
+                # Reclaim the space held by the duplicated prompt and model strings
+                self._conn.execute("VACUUM;")
+
+    def _schema_version(self) -> int:
+        return self._conn.execute("PRAGMA user_version;").fetchone()[0]
+
+    def _has_legacy_results_table(self) -> bool:
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(results);")}
+        return "prompt" in columns
+
+    @staticmethod
+    def _migrate_legacy_results(conn: sqlite3.Connection):
+        """Copies rows from the single-table schema into the normalized tables."""
+        conn.execute("""
+            INSERT OR IGNORE INTO prompts (prompt_hash, prompt)
+            SELECT DISTINCT text_hash(prompt), prompt FROM results_legacy;
+        """)
+        conn.execute("""
+            INSERT OR IGNORE INTO models (model_hash, model_version)
+            SELECT DISTINCT text_hash(model_version), model_version FROM results_legacy;
+        """)
+        conn.execute("""
+            INSERT OR IGNORE INTO results (
+                id, source_id, chunk_id, prompt_hash, response, used_tokens, model_hash, timestamp
+            )
+            SELECT id, source_id, chunk_id, text_hash(prompt), response, used_tokens,
+                   text_hash(model_version), timestamp
+            FROM results_legacy;
+        """)
+        conn.execute("DROP TABLE results_legacy;")
 
     def has_results(self) -> bool:
         """
@@ -35,8 +159,8 @@ class SQLiteResultSaver:
         Returns True if at least one row exists, False otherwise.
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
+            with self._lock:
+                cursor = self._conn.cursor()
                 # Executes a fast query to see if at least one record exists.
                 cursor.execute("SELECT 1 FROM results LIMIT 1;")
                 return cursor.fetchone() is not None
@@ -59,87 +183,123 @@ class SQLiteResultSaver:
         if not results:
             raise ValueError("No results to save.")
 
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            for item in results:
-                cursor.execute("""
-                    INSERT OR IGNORE INTO results (
-                        source_id,
-                        chunk_id,
-                        prompt,
-                        response,
-                        used_tokens,
-                        model_version,
-                        timestamp
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?);
-                """, (
-                    item["source_id"],
-                    item["chunk_id"],
-                    item["prompt"],
-                    item["response"],
-                    item.get("used_tokens"),
-                    item["model_version"],
-                    datetime.utcnow().isoformat() + "Z"
-                ))
-            conn.commit()
-            print(f"Tried saving {len(results)} rows (duplicates ignored).")
+        timestamp = datetime.utcnow().isoformat() + "Z"
+        prompts = {}
+        models = {}
+        rows = []
+        for item in results:
+            prompt_hash = prompts.setdefault(item["prompt"], text_hash(item["prompt"]))
+            model_hash = models.setdefault(item["model_version"], text_hash(item["model_version"]))
+            rows.append((
+                item["source_id"],
+                item["chunk_id"],
+                prompt_hash,
+                item["response"],
+                item.get("used_tokens"),
+                model_hash,
+                timestamp
+            ))
+
+        # One transaction for the whole batch; rolled back if any row fails
+        with self._lock, self._conn as conn:
+            conn.executemany(INSERT_PROMPT_SQL, [(h, p) for p, h in prompts.items()])
+            conn.executemany(INSERT_MODEL_SQL, [(h, m) for m, h in models.items()])
+            conn.executemany(INSERT_RESULT_SQL, rows)
+        print(f"Tried saving {len(results)} rows (duplicates ignored).")
 
     def get_all(self) -> List[Dict[str, Any]]:
         """
         Retrieve all saved results.
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, source_id, chunk_id, prompt, response, used_tokens, model_version, timestamp
-                FROM results
-            """)
-            rows = cursor.fetchall()
-
-        return [
-            {
-                "id": row[0],
-                "source_id": row[1],
-                "chunk_id": row[2],
-                "prompt": row[3],
-                "response": row[4],
-                "used_tokens": row[5],
-                "model_version": row[6],
-                "timestamp": row[7],
-            }
-            for row in rows
-        ]
+        with self._lock:
+            rows = self._conn.execute(SELECT_ALL_SQL).fetchall()
+
+        return [dict(zip(RESULT_COLUMNS, row)) for row in rows]
+
+    def iter_results(self, batch_size: int = DEFAULT_EXPORT_BATCH_SIZE) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Streams all saved results in batches of at most ``batch_size`` rows, ordered by
+        chunk_id and then by the order they were saved. Every chunk's rows arrive as one
+        consecutive run, even when chunks were saved interleaved or reassigned later.
+
+        Rows are fetched incrementally on a separate read connection, which sees a
+        consistent snapshot and does not block saves while the caller consumes it.
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            cursor = conn.execute(SELECT_BY_CHUNK_SQL)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [dict(zip(RESULT_COLUMNS, row)) for row in rows]
+        finally:
+            conn.close()
 
     def has_source_ids(self, source_ids: List[str], prompt: str) -> List[str]:
         """
         Return source_ids that already exist in the DB for a given prompt.
+
+        Ids are looked up in batches of SOURCE_ID_QUERY_BATCH_SIZE, so any number of
+        ids can be checked without exceeding SQLite's bound parameter limit.
         """
         if not source_ids:
             return []
 
-        placeholders = ",".join("?" for _ in source_ids)
-        query = f"""
-            SELECT source_id FROM results
-            WHERE source_id IN ({placeholders}) AND prompt = ?
+        prompt_hash = text_hash(prompt)
+        existing = []
+        with self._lock:
+            for start in range(0, len(source_ids), SOURCE_ID_QUERY_BATCH_SIZE):
+                batch = source_ids[start:start + SOURCE_ID_QUERY_BATCH_SIZE]
+                placeholders = ",".join("?" for _ in batch)
+                query = f"""
+                    SELECT source_id FROM results
+                    WHERE source_id IN ({placeholders}) AND prompt_hash = ?
+                """
+                existing.extend(row[0] for row in self._conn.execute(query, (*batch, prompt_hash)))
+
+        return existing
+
+    def reassign_chunks(self, chunk_ids_by_source: Dict[str, str]):
         """
+        Points stored results at new chunk ids, e.g. after re-chunking a dataset.
 
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, (*source_ids, prompt))
-            existing = cursor.fetchall()
+        Chunk membership belongs to the row, so the results of every prompt for a
+        source_id are moved, keeping exports able to join them with their original rows.
+
+        Args:
+            chunk_ids_by_source: New chunk_id for each source_id
+        """
+        if not chunk_ids_by_source:
+            return
 
-        return [row[0] for row in existing]
+        with self._lock, self._conn as conn:
+            conn.executemany(
+                "UPDATE results SET chunk_id = ? WHERE source_id = ?;",
+                [(chunk_id, source_id) for source_id, chunk_id in chunk_ids_by_source.items()],
+            )
 
 
     def clear(self):
         """
-        Deletes all records from the 'results' table, resetting it.
+        Deletes all records from the 'results' table and its lookup tables, resetting it.
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM results;")
-                conn.commit()
+            with self._lock, self._conn as conn:
+                conn.execute("DELETE FROM results;")
+                conn.execute("DELETE FROM prompts;")
+                conn.execute("DELETE FROM models;")
                 print("✅ Database results cleared successfully.")
         except sqlite3.Error as e:
             print(f"❌ Database error while clearing results: {e}")
+
+    def close(self):
+        """Closes the shared connection."""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "SQLiteResultSaver":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
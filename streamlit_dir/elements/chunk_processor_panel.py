@@ -1,14 +1,23 @@
 import logging
+from typing import Optional
+
 import streamlit as st
 
+from model.core.chunk.adaptive_concurrency import AdaptiveConcurrencyLimit
+from model.core.chunk.chunk_lease_store import ChunkLeaseStore
 from model.core.chunk.chunk_manager import ChunkManager
 from model.core.chunk.chunk_processor import ChunkProcessor
 from model.core.llms.gemini_client import GeminiClient
+from model.core.llms.circuit_breaker import CircuitBreaker, CircuitState, get_circuit_breaker
+from model.core.llms.rate_limiter import get_rate_limiter
+from model.core.llms.request_hedger import RequestHedger
 from model.io.save_processed_chunks_to_db import save_processed_chunk_to_db
 from model.io.model_prefs import ModelPreference
-from model.io.sqlite_result_saver import SQLiteResultSaver
-from utils.providers import get_model_prefs
+from model.io.response_cache import ResponseCache
+from utils.cancellation_token import CancellationToken
+from utils.providers import get_model_prefs, get_result_saver, get_response_cache
 from streamlit_dir.elements.token_usage_gauge import render_token_usage_gauge
+from utils.constants import DEFAULT_MAX_WORKERS, DEFAULT_HEDGE_TOKEN_RATIO
 from utils.result_type import ResultType
 
 
@@ -34,9 +43,27 @@ def render_status_panel(
     model_prefs: ModelPreference,
     curr_processed_chunks: int,
     curr_total_chunks: int,
+    response_cache: Optional[ResponseCache] = None,
+    concurrency: Optional[AdaptiveConcurrencyLimit] = None,
+    retries: int = 0,
+    retry_wait_seconds: float = 0.0,
+    circuit_breaker: Optional[CircuitBreaker] = None,
+    hedger: Optional[RequestHedger] = None,
 ):
     """Unified display of chunk progress, token usage, and stats."""
 
+    # === Upstream health ===
+    if circuit_breaker is not None:
+        state = circuit_breaker.state
+        if state == CircuitState.OPEN:
+            st.warning(
+                f"⛔ The model keeps failing, so requests are paused. "
+                f"Next probe in {circuit_breaker.retry_in():.0f}s.",
+                icon="🔌"
+            )
+        elif state == CircuitState.HALF_OPEN:
+            st.info("🔌 Probing the model with a single chunk before resuming.")
+
     # === Chunks ===
     total_chunks = chunk_manager.total_chunks
     remaining_chunks = chunk_manager.remaining_chunks
@@ -66,6 +93,33 @@ def render_status_panel(
     )
     render_token_usage_gauge(processed_ratio)
 
+    # === Response cache ===
+    if response_cache is not None and (response_cache.hits or response_cache.misses):
+        lookups = response_cache.hits + response_cache.misses
+        st.caption(
+            f"🗃️ Cached rows: **{response_cache.hits}** hits, **{response_cache.misses}** misses "
+            f"({response_cache.hits / lookups:.0%} served from cache)"
+        )
+
+    # === Retries ===
+    if retries:
+        st.caption(f"🔁 Retries: **{retries}** ({retry_wait_seconds:.0f}s spent backing off)")
+
+    # === Adaptive concurrency ===
+    if concurrency is not None:
+        latency = f", ~{concurrency.latency:.1f}s per chunk" if concurrency.latency is not None else ""
+        st.caption(
+            f"🧵 Concurrency limit: **{concurrency.limit}** of {concurrency.max_limit} "
+            f"({concurrency.decreases} back-offs{latency})"
+        )
+
+    # === Hedged requests ===
+    if hedger is not None and hedger.hedges:
+        st.caption(
+            f"🏇 Hedged requests: **{hedger.hedges}** ({hedger.hedge_wins} won, "
+            f"~{hedger.extra_tokens} extra tokens of {hedger.max_extra_tokens} allowed)"
+        )
+
 
 # --- Main UI ---
 def process_chunks_ui(
@@ -73,17 +127,34 @@ def process_chunks_ui(
     prompt: str,
     chunk_file_path: str,
     chunk_count: int,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    use_cache: bool = True,
+    adaptive_concurrency: bool = False,
+    hedge_requests: bool = False,
     run_now: bool = False,
+    stop_requested: bool = False,
 ):
 
     if not all([client, prompt, chunk_file_path]):
         st.warning("⚠️ Please make sure client, prompt, and chunk file are all set.")
         return
 
-    # Load manager & processor
-    chunk_manager = ChunkManager(json_path=chunk_file_path)
+    # Load manager & processor; a run claims chunks through the shared lease store
+    # so other sessions working on the same chunk file skip them
+    lease_store = ChunkLeaseStore.for_chunk_file(chunk_file_path) if run_now else None
+    chunk_manager = ChunkManager(json_path=chunk_file_path, lease_store=lease_store)
     model_prefs = get_model_prefs()
-    processor = ChunkProcessor(client=client, prompt=prompt, chunk_manager=chunk_manager,model_preference=model_prefs)
+    response_cache = get_response_cache() if use_cache else None
+    rate_limiter = get_rate_limiter(client.model_name, *model_prefs.get_rate_limits(client.model_name))
+    circuit_breaker = get_circuit_breaker(client.model_name)
+    # Duplicates of slow requests may spend a share of the remaining token budget
+    hedger = RequestHedger(
+        max_extra_tokens=int(model_prefs.remaining_total_tokens * DEFAULT_HEDGE_TOKEN_RATIO)
+    ) if hedge_requests else None
+    processor = ChunkProcessor(client=client, prompt=prompt, chunk_manager=chunk_manager,model_preference=model_prefs,
+                               response_cache=response_cache,
+                               rate_limiter=rate_limiter if rate_limiter.enabled else None,
+                               circuit_breaker=circuit_breaker, hedger=hedger)
 
     # --- When not running: just show last known status once ---
     if not run_now:
@@ -96,14 +167,20 @@ def process_chunks_ui(
             chunk_manager,
             model_prefs,
             last_status["processed"],
-            st.session_state.get("num_chunks", chunk_count)
+            st.session_state.get("num_chunks", chunk_count),
+            circuit_breaker=circuit_breaker
         )
 
-        st.info("ℹ️ Click 'Start Processing' to begin.", icon="🟢")
+        if stop_requested:
+            st.info("⏹️ Processing stopped. Completed chunks were saved; the rest stay queued for the next run.")
+        else:
+            st.info("ℹ️ Click 'Start Processing' to begin.", icon="🟢")
         return
 
     # --- Running processing loop ---
     processed = 0
+    retries = 0
+    retry_wait_seconds = 0.0
     had_error = False
 
     # Containers for error messages
@@ -116,62 +193,105 @@ def process_chunks_ui(
     # Status placeholder for live updates
     status_placeholder = st.empty()
 
-    for _ in range(chunk_count):
-        try:
-            result = processor.process_next_chunk()
-        except Exception as e:
-            exception_area.error(f"❌ Exception: {e}", icon="🚨")
-            logger.exception("Unexpected exception during chunk processing")
-            had_error = True
-            break
-
-        if result.result_type == ResultType.SUCCESS:
-            save_processed_chunk_to_db(
-                result=result,
-                chunk_id=result.chunk_id,
-                prompt=prompt,
-                model_version=client.model_name,
-                saver=SQLiteResultSaver(),
-            )
-            # # After saving results
-            st.session_state["has_results"] = True
-            processed += 1
-
-        elif result.result_type == ResultType.FATAL_ERROR:
-            fatal_area.error(f"❌ Fatal Error: {result.error}", icon="🚨")
-            had_error = True
-            break
-
-        elif result.result_type == ResultType.RETRYABLE_ERROR:
-            retry_area.warning(f"⚠️ Retryable Error: {result.error}", icon="🔁")
-            had_error = True
-
-        elif result.result_type == ResultType.TOKENS_BUDGET_EXCEEDED:
-            token_area.error("❌ Not enough tokens left.", icon="🚨")
-            had_error = True
-            break
-
-        elif result.result_type == ResultType.NO_MORE_CHUNKS:
-            st.info("✅ No more chunks to process.", icon="📭")
-            had_error = True
-            break
-
-        elif result.result_type == ResultType.UNEXPECTED_ERROR:
-            unexpected_area.error(f"❓ Unexpected Error: {result.error}", icon="❓")
-            had_error = True
-            break
+    saver = get_result_saver()
+    if response_cache is not None:
+        response_cache.reset_stats()
+    concurrency = AdaptiveConcurrencyLimit(
+        initial_limit=min(DEFAULT_MAX_WORKERS, max_workers), max_limit=max_workers
+    ) if adaptive_concurrency else None
+    def save_success(result):
+        nonlocal processed
+        save_processed_chunk_to_db(
+            result=result,
+            chunk_id=result.chunk_id,
+            prompt=prompt,
+            model_version=client.model_name,
+            saver=saver,
+        )
+        # # After saving results
+        st.session_state["has_results"] = True
+        processed += 1
 
-        else:
-            unexpected_area.error(f"❓ Unknown result type: {result}", icon="❓")
-            had_error = True
+    cancel_token = CancellationToken()
+    results = processor.process_chunks(
+        max_chunks=chunk_count, max_workers=max_workers, concurrency=concurrency, cancel_token=cancel_token
+    )
 
-        # Update persistent last status and render live progress
+    try:
+        while True:
+            try:
+                result = next(results, None)
+            except Exception as e:
+                exception_area.error(f"❌ Exception: {e}", icon="🚨")
+                logger.exception("Unexpected exception during chunk processing")
+                had_error = True
+                break
+
+            if result is None:
+                break
+
+            if result.retry_stats is not None:
+                retries += result.retry_stats.retries
+                retry_wait_seconds += result.retry_stats.sleep_seconds
+
+            if result.result_type == ResultType.SUCCESS:
+                save_success(result)
+
+            elif result.result_type == ResultType.FATAL_ERROR:
+                fatal_area.error(f"❌ Fatal Error: {result.error}", icon="🚨")
+                had_error = True
+
+            elif result.result_type == ResultType.RETRYABLE_ERROR:
+                retry_area.warning(f"⚠️ Retryable Error: {result.error}", icon="🔁")
+                had_error = True
+
+            elif result.result_type == ResultType.TOKENS_BUDGET_EXCEEDED:
+                token_area.error("❌ Not enough tokens left.", icon="🚨")
+                had_error = True
+
+            elif result.result_type == ResultType.NO_MORE_CHUNKS:
+                st.info("✅ No more chunks to process.", icon="📭")
+                had_error = True
+
+            elif result.result_type == ResultType.CANCELLED:
+                had_error = True
+
+            elif result.result_type == ResultType.CIRCUIT_OPEN:
+                # The chunk was not sent; it stays available for a later probe or run
+                had_error = True
+
+            elif result.result_type == ResultType.UNEXPECTED_ERROR:
+                unexpected_area.error(f"❓ Unexpected Error: {result.error}", icon="❓")
+                had_error = True
+
+            else:
+                unexpected_area.error(f"❓ Unknown result type: {result}", icon="❓")
+                had_error = True
+
+            # Update persistent last status and render live progress
+            st.session_state["last_status"] = {
+                "processed": processed,
+                "chunk_count": chunk_count
+            }
+            with status_placeholder.container():
+                render_status_panel(
+                    chunk_manager, model_prefs, processed, chunk_count, response_cache, concurrency,
+                    retries, retry_wait_seconds, circuit_breaker, hedger
+                )
+
+    finally:
+        # A Stop click reruns the script, which interrupts this loop at its next Streamlit
+        # call. Stop dispatching, let in-flight chunks finish (bounded by the request
+        # deadline) and save the ones that completed before closing the chunk state.
+        cancel_token.cancel()
+        for result in results:
+            if result.result_type == ResultType.SUCCESS:
+                save_success(result)
         st.session_state["last_status"] = {
             "processed": processed,
             "chunk_count": chunk_count
         }
-        with status_placeholder.container():
-            render_status_panel(chunk_manager, model_prefs, processed, chunk_count)
+        chunk_manager.close()
 
     # --- Wrap-up ---
     if not had_error:
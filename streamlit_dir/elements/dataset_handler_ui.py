@@ -1,33 +1,70 @@
 import streamlit as st
 from pathlib import Path
 import os
-from typing import Optional, Dict, Tuple
+from typing import Callable, Optional, Dict, Tuple, Sequence
 import pandas as pd
 
 from model.core.chunk.chunk_json_inspector import ChunkJSONInspector
-from model.core.chunk.chunker import DataFrameChunker
-from model.io.sqlite_result_saver import SQLiteResultSaver
+from model.core.chunk.chunker import DataFrameChunker, content_source_ids
 from model.io.dataset_handler import DatasetHandler
 from model.core.llms.prompt_optimizer import PromptOptimizer
-from utils.providers import get_model_prefs
+from utils.providers import get_model_prefs, get_result_saver
 from streamlit_dir.elements.render_chunking_warning_dialog import show_chunking_warning_dialog
 from utils.constants import TEMP_DIR
 
 
-def chunk_and_save_dataframe(df: pd.DataFrame, chunk_size: int) -> dict:
+def chunk_and_save_dataframe(df: pd.DataFrame, chunk_size: int,
+                             row_token_counter: Optional[Callable[[pd.DataFrame], Sequence[int]]] = None,
+                             token_target: Optional[int] = None,
+                             skip_processed_prompt: Optional[str] = None) -> dict:
+    """
+    Chunks ``df`` into the temp chunk file.
+
+    With ``skip_processed_prompt``, rows whose results for that prompt are already stored
+    are not sent again: they are written to chunks marked as processed.
+
+    Stored results of every prompt are pointed at the new chunk ids of their rows, so
+    exports still join them with their original rows.
+    """
     os.makedirs(TEMP_DIR, exist_ok=True)
     save_path = os.path.join(TEMP_DIR, "chunks.json")
 
     chunker = DataFrameChunker(chunk_size)
-    chunks = chunker.chunk_dataframe(df)
-    chunker.save_chunks_to_json(chunks, file_path=save_path)
+    source_ids = content_source_ids(df)
+    metadata = {}
+
+    saver = get_result_saver()
+    processed_chunks = []
+    if skip_processed_prompt is not None:
+        done = pd.Index(source_ids).isin(saver.has_source_ids(source_ids.tolist(), skip_processed_prompt))
+        processed_chunks = chunker.chunk_dataframe(df[done], source_ids=source_ids[done])
+        df, source_ids = df[~done], source_ids[~done]
+        metadata["carried_over_rows"] = int(done.sum())
+
+    if row_token_counter is not None and token_target and len(df) > 0:
+        chunks = chunker.chunk_dataframe_by_tokens(df, row_token_counter(df), token_target, source_ids=source_ids)
+        metadata.update({"chunking": "tokens", "token_target": token_target})
+    else:
+        chunks = chunker.chunk_dataframe(df, source_ids=source_ids)
+    chunk_ids = chunker.save_chunks_to_jsonl(
+        chunks, file_path=save_path, metadata=metadata, processed_chunks=processed_chunks
+    )
+
+    saver.reassign_chunks(
+        {
+            source_id: chunk_id
+            for chunk, chunk_id in zip(chunks + processed_chunks, chunk_ids)
+            for source_id in chunk["source_id"]
+        }
+    )
 
     inspector = ChunkJSONInspector(directory_path=TEMP_DIR)
     summary = inspector.inspect_chunk_file(Path(save_path))
 
     return {
         "chunk_file_path": save_path,
-        "summary": summary
+        "summary": summary,
+        "carried_over_rows": metadata.get("carried_over_rows", 0)
     }
 
 
@@ -108,21 +145,30 @@ def configure_and_process_chunks(df: pd.DataFrame, prompt: str, response_example
     # --- SECTION 2: UI for settings and recommendations ---
     st.markdown("### Chunking Settings")
 
-    # Show optimal chunk size recommendation
+    prefs = get_model_prefs()
+
+    # Show optimal chunk size recommendation, estimated from a sample of the dataset's rows
+    estimate = None
     if optimizer is not None and len(df) > 0:
         try:
-            optimal_size = optimizer.find_optimal_row_number(
+            estimate = optimizer.recommend_chunk_size(
                 prompt=prompt,
-                row_df=df.head(1),
-                example_response=response_example
+                df=df,
+                example_response=response_example,
+                row_format=prefs.row_format
+            )
+            stats = estimate.row_stats
+            st.info(f"ℹ️ Recommended chunk size: **{estimate.chunk_size}** rows (based on model context window)")
+            st.caption(
+                f"Tokens per row over {stats.sample_size:,} sampled rows: "
+                f"mean {stats.mean:,.0f}, p95 {stats.p95:,.0f}, max {stats.max:,} "
+                f"(≤{estimate.overflow_probability:.0%} chance a chunk overflows)"
             )
-            st.info(f"ℹ️ Recommended chunk size: **{optimal_size}** rows (based on model context window)")
         except Exception as e:
             st.warning(f"⚠️ Could not calculate optimal chunk size: {str(e)}")
     else:
         st.info("ℹ️ Connect a model to see recommended chunk size")
 
-    prefs = get_model_prefs()
     # Sanitize defaults to respect Streamlit's min_value constraints
     try:
         default_token_budget = int(prefs.total_tokens)
@@ -153,15 +199,42 @@ def configure_and_process_chunks(df: pd.DataFrame, prompt: str, response_example
         "🔢 Set Chunk Size", min_value=1, value=default_chunk_size, help="Number of rows per chunk."
     )
 
+    # Optionally pack rows by estimated token weight instead of a fixed row count
+    token_target = None
+    if optimizer is not None and len(df) > 0:
+        pack_by_tokens = st.checkbox(
+            "🧮 Pack rows by token count",
+            help="Fill each chunk with as many rows as fit the token target; the chunk size above is ignored."
+        )
+        if pack_by_tokens:
+            try:
+                default_target = optimizer.available_row_tokens(
+                    prompt=prompt, row_df=df.head(1), row_format=prefs.row_format
+                )
+            except Exception as e:
+                st.warning(f"⚠️ Could not calculate available tokens per chunk: {e}")
+                default_target = 1
+            token_target = st.number_input(
+                "🎯 Row tokens per chunk", min_value=1, value=max(1, default_target),
+                help="Token target for the rows of each chunk, excluding the prompt."
+            )
+
     # Estimate and display token usage based on settings
     if optimizer is not None and len(df) > 0:
         try:
-            tokens_per_chunk = optimizer.calculate_used_tokens(
-                prompt=prompt,
-                row_df=df.head(1),
-                example_response=response_example,
-                num_rows=chunk_size
-            )
+            if token_target:
+                # Packed chunks fill up to the token target on top of the prompt
+                tokens_per_chunk = token_target + (estimate.fixed_tokens if estimate is not None else 0)
+            elif estimate is not None:
+                tokens_per_chunk = estimate.expected_tokens(chunk_size)
+            else:
+                tokens_per_chunk = optimizer.calculate_used_tokens(
+                    prompt=prompt,
+                    row_df=df.head(1),
+                    example_response=response_example,
+                    num_rows=chunk_size,
+                    row_format=prefs.row_format
+                )
             if tokens_per_chunk > 0:
                 max_chunks = token_budget // tokens_per_chunk
                 st.caption(f"📊 Estimated tokens per chunk: **{tokens_per_chunk:,}**")
@@ -171,27 +244,60 @@ def configure_and_process_chunks(df: pd.DataFrame, prompt: str, response_example
 
     # --- MODIFICATION START: Refined button, callback, and dialog logic ---
 
+    skip_processed = st.checkbox(
+        "♻️ Skip rows already processed with this prompt",
+        value=True,
+        help="Keep stored results and only send new or changed rows. Unchecking clears the database first."
+    )
+
+    def row_token_counter(rows: pd.DataFrame):
+        return optimizer.row_token_counts(rows, response_example, prefs.row_format)
+
     # 1. Define the action to be performed on confirmation. This is our callback.
     def chunking_action():
         """Clears the DB, chunks the dataframe, and saves results to session_state."""
         st.info("Clearing previous results from the database...")
-        db_saver = SQLiteResultSaver()
+        db_saver = get_result_saver()
         db_saver.clear()
 
         with st.spinner("Chunking new dataset..."):
-            result = chunk_and_save_dataframe(df, chunk_size)
+            result = chunk_and_save_dataframe(
+                df, chunk_size,
+                row_token_counter=row_token_counter if token_target else None,
+                token_target=token_target
+            )
 
         # Save results to session_state to survive the dialog's rerun
         st.session_state.chunk_file_path = result["chunk_file_path"]
         st.session_state.chunk_summary = result["summary"]
         st.success("✅ Database cleared and new dataset chunked successfully!")
 
+    def incremental_chunking_action():
+        """Chunks only rows without stored results for the prompt, keeping the DB."""
+        with st.spinner("Chunking new and changed rows..."):
+            result = chunk_and_save_dataframe(
+                df, chunk_size,
+                row_token_counter=row_token_counter if token_target else None,
+                token_target=token_target,
+                skip_processed_prompt=prompt
+            )
+
+        st.session_state.chunk_file_path = result["chunk_file_path"]
+        st.session_state.chunk_summary = result["summary"]
+        carried_over = result["carried_over_rows"]
+        st.success(
+            f"✅ Dataset chunked: {len(df) - carried_over:,} rows to process, "
+            f"{carried_over:,} already processed rows kept."
+        )
+
     # 2. Handle the "Chunk & Save" button click.
     if st.button("📦 Chunk & Save"):
         prefs.chunk_size = chunk_size
-        db_saver = SQLiteResultSaver()
+        db_saver = get_result_saver()
+        if skip_processed:
+            incremental_chunking_action()
         # If the database has results, set a flag to show the warning dialog.
-        if db_saver.has_results():
+        elif db_saver.has_results():
             st.session_state.show_chunking_warning = True
         # Otherwise, perform the chunking action immediately.
         else:
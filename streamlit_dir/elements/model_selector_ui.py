@@ -2,6 +2,7 @@ import streamlit as st
 
 from model.core.llms.gemini_client import GeminiClient
 from model.core.llms.gemini_model_provider import GeminiModelProvider
+from model.core.llms.row_formats import ROW_FORMATTERS, ROW_FORMAT_LABELS
 from utils.providers import get_model_prefs
 
 
@@ -27,7 +28,8 @@ def model_selector_ui(container, api_key: str):
         if use_saved:
             try:
                 client = GeminiClient(model=saved_selected_model, api_key=api_key, 
-                                   generation_config=model_pref.generation_config)
+                                   generation_config=model_pref.generation_config,
+                                   row_format=model_pref.row_format)
                 return saved_selected_model, client, model_pref.generation_config
             except Exception as e:
                 container.error(f"❌ Failed to create client: {e}")
@@ -81,6 +83,32 @@ def model_selector_ui(container, api_key: str):
         model_pref.generation_config = updated_config
         container.success("✅ Generation settings saved.")
 
+    # --- Row encoding used in prompts ---
+    row_formats = list(ROW_FORMATTERS)
+    saved_row_format = model_pref.row_format
+    row_format = container.selectbox(
+        "🧾 Row encoding",
+        row_formats,
+        index=row_formats.index(saved_row_format) if saved_row_format in row_formats else 0,
+        format_func=lambda name: ROW_FORMAT_LABELS.get(name, name),
+        help="How chunk rows are written into the prompt. Header-once layouts use fewer tokens per row."
+    )
+    if row_format != saved_row_format:
+        model_pref.row_format = row_format
+
+    # --- Client-side rate limits for the selected model ---
+    saved_rpm, saved_tpm = model_pref.get_rate_limits(selected_model)
+    rpm = container.number_input(
+        "🚦 Requests per minute", min_value=0, value=saved_rpm, step=1,
+        help="Requests sent to this model are paced to stay under this limit. 0 = no limit."
+    )
+    tpm = container.number_input(
+        "🚦 Tokens per minute", min_value=0, value=saved_tpm, step=1000,
+        help="Requests are paced so this model's token usage stays under this limit. 0 = no limit."
+    )
+    if (rpm, tpm) != (saved_rpm, saved_tpm):
+        model_pref.set_rate_limits(selected_model, rpm, tpm)
+
     # Save selected model if changed
     if selected_model != saved_selected_model:
         model_pref.model_name = selected_model
@@ -88,7 +116,8 @@ def model_selector_ui(container, api_key: str):
 
     # ✅ Create Client here
     try:
-        client = GeminiClient(model=selected_model, api_key=api_key, generation_config=updated_config)
+        client = GeminiClient(model=selected_model, api_key=api_key, generation_config=updated_config,
+                              row_format=row_format)
     except Exception as e:
         container.error(f"❌ Failed to create client: {e}")
         st.stop()
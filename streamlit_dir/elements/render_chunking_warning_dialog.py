@@ -5,13 +5,13 @@ from typing import Callable
 @st.dialog("⚠️ Warning: Existing Data Found!")
 def chunking_warning_dialog_body(on_confirm_callback: Callable[[], None]):
     st.error(
-        "Your database already contains processed results. Re-chunking will create new unique IDs, and you will lose the ability to link your existing results to the original data."
+        "Your database already contains processed results. Re-chunking without skipping processed rows clears them, and every row will be sent to the model again."
     )
     st.info("It is highly recommended that you export your current results first before proceeding.")
 
     col1, col2 = st.columns(2)
     with col1:
-        if st.button("Proceed and Discard Links", type="primary"):
+        if st.button("Proceed and Clear Results", type="primary"):
             on_confirm_callback()
             st.session_state.show_chunking_warning = False
             st.rerun()
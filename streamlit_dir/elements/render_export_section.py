@@ -2,6 +2,7 @@ import streamlit as st
 import logging
 
 from model.io.csv_exporter import CSVExporter
+from utils.providers import get_result_saver
 
 logger = logging.getLogger(__name__)
 
@@ -33,8 +34,8 @@ def render_export_section(chunk_file_path: str):
             # Use a spinner to show that work is being done
             with st.spinner(f"Exporting data to {file_name}..."):
                 # --- MODIFICATION 2: Pass the path to the exporter ---
-                exporter = CSVExporter(json_path=chunk_file_path)
-                exporter.export_processed_with_original_rows(file_name)
+                exporter = CSVExporter(json_path=chunk_file_path, db_saver=get_result_saver())
+                exporter.export_processed_streaming(file_name)
 
             # Provide a download button upon success
             with open(file_name, "rb") as f:
@@ -1,14 +1,14 @@
 import streamlit as st
 
 from model.core.llms.prompt_optimizer import PromptOptimizer
-from model.io.sqlite_result_saver import SQLiteResultSaver
 from streamlit_dir.elements.api_key_ui import load_api_key_ui
 from streamlit_dir.elements.dataset_handler_ui import handle_dataset_upload_or_load, configure_and_process_chunks
 from streamlit_dir.elements.llm_selector import llm_selector
 from streamlit_dir.elements.model_selector_ui import model_selector_ui
 from streamlit_dir.elements.prompt_input_ui import prompt_input_ui
 from streamlit_dir.elements.render_export_section import render_export_section
-from utils.constants import APP_NAME
+from utils.constants import APP_NAME, DEFAULT_MAX_WORKERS, MAX_WORKERS_LIMIT
+from utils.providers import get_result_saver
 
 
 def cwp_sidebar():
@@ -68,6 +68,37 @@ def cwp_sidebar():
                     step=1,
                     key="num_chunks_input"
                 )
+                st.session_state["max_workers"] = st.number_input(
+                    "🧵 Concurrent requests",
+                    min_value=1,
+                    max_value=MAX_WORKERS_LIMIT,
+                    value=st.session_state.get("max_workers", DEFAULT_MAX_WORKERS),
+                    step=1,
+                    help="Number of chunks sent to the model at the same time.",
+                    key="max_workers_input"
+                )
+                st.session_state["adaptive_concurrency"] = st.checkbox(
+                    "📈 Adapt concurrency to the service",
+                    value=st.session_state.get("adaptive_concurrency", False),
+                    help="Starts with fewer requests and adds more while latencies stay stable, "
+                         "backing off on timeouts, unavailability and quota errors. "
+                         "Concurrent requests becomes the upper bound.",
+                    key="adaptive_concurrency_input"
+                )
+                st.session_state["hedge_requests"] = st.checkbox(
+                    "🏇 Hedge slow requests",
+                    value=st.session_state.get("hedge_requests", False),
+                    help="Sends a duplicate of a chunk request that takes longer than 95% of recent ones "
+                         "and keeps whichever answer arrives first. Duplicates may use up to 10% of the "
+                         "remaining token budget.",
+                    key="hedge_requests_input"
+                )
+                st.session_state["use_response_cache"] = st.checkbox(
+                    "🗃️ Reuse cached responses",
+                    value=st.session_state.get("use_response_cache", True),
+                    help="Rows already answered with the same prompt, model and settings are not sent again.",
+                    key="use_response_cache_input"
+                )
 
                 if st.form_submit_button("⚙️ Set Processing Parameters"):
                     st.session_state["last_status"] = {
@@ -76,7 +107,7 @@ def cwp_sidebar():
                     }
                     st.session_state["processing_ready"] = True
 
-    db_saver = SQLiteResultSaver()
+    db_saver = get_result_saver()
 
     # The export section will now only appear if a chunk file exists AND the DB is not empty.
     if chunk_file_path and (st.session_state.get("has_results") or db_saver.has_results()):
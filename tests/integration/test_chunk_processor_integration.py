@@ -52,6 +52,13 @@ def temp_shelf():
 chunk_file_path = (Path(__file__).parent / "chunks.json").resolve()
 
 
+def numbered(text: str) -> str:
+    """A response answering every row of the largest chunk, as the prompt asks for."""
+    with open(chunk_file_path, "r", encoding="utf-8") as f:
+        rows = max(len(chunk["data"]) for chunk in json.load(f)["chunks"])
+    return "\n".join(f"{number}: {text}" for number in range(1, rows + 1))
+
+
 @pytest.fixture(autouse=True)
 def reset_processed_chunks():
     """Ensure integration chunks.json starts unprocessed before each test."""
@@ -67,7 +74,10 @@ def reset_processed_chunks():
     except FileNotFoundError:
         # Let the test_json_path assert handle missing file
         pass
+    journal_path = chunk_file_path.with_suffix(".journal")
+    journal_path.unlink(missing_ok=True)
     yield
+    journal_path.unlink(missing_ok=True)
 
 
 class DummyModel:
@@ -87,7 +97,12 @@ class DummyModel:
         if self.errors:
             raise self.errors.pop(0)
         if self.responses:
-            return type("Resp", (), {"text": self.responses.pop(0)})
+            usage = types.SimpleNamespace(
+                prompt_token_count=self.token_count,
+                candidates_token_count=self.token_count,
+                total_token_count=2 * self.token_count,
+            )
+            return type("Resp", (), {"text": self.responses.pop(0), "usage_metadata": usage})
         raise RuntimeError("No more responses configured")
 
 
@@ -108,10 +123,10 @@ def test_chunk_processor_end_to_end(monkeypatch, scenario):
 
     # Configure DummyModel behavior
     if scenario == "success":
-        model = DummyModel(responses=["OK-1"])
+        model = DummyModel(responses=[numbered("OK-1")])
     elif scenario == "retryable":
         model = DummyModel(errors=[api_exceptions.DeadlineExceeded("try again")],
-                           responses=["OK-after-retry"])
+                           responses=[numbered("OK-after-retry")])
     elif scenario == "fatal":
         model = DummyModel(errors=[api_exceptions.PermissionDenied("stop right there")])
     elif scenario == "unexpected":
@@ -120,7 +135,7 @@ def test_chunk_processor_end_to_end(monkeypatch, scenario):
         model = DummyModel(errors=[WeirdError("boom!")])
     elif scenario == "token_budget_exceeded":
         # Set token count higher than the default remaining_tokens (10000)
-        model = DummyModel(responses=["OK-1"], token_count=15000)
+        model = DummyModel(responses=[numbered("OK-1")], token_count=15000)
     else:
         raise ValueError(f"Unknown scenario {scenario}")
 
@@ -33,7 +33,7 @@ class DummyModel:
             err = self._errors[self.call_count]
             self.call_count += 1
             raise err
-        resp_text = self._responses[self.call_count] if self.call_count < len(self._responses) else "ok"
+        resp_text = self._responses[self.call_count] if self.call_count < len(self._responses) else "1: ok"
         self.call_count += 1
         return types.SimpleNamespace(text=resp_text)
 
@@ -55,13 +55,14 @@ def runner(fake_model, monkeypatch):
 
 
 def test_run_success(fake_model, runner):
-    fake_model._responses = ["hello world"]
+    fake_model._responses = ["1: hello world"]
     df = pd.DataFrame([{"col": "val"}])
-    resp, tokens = runner.run("prompt text", df)
-    assert resp == "hello world"
-    # Token count is sum of input length (formatted_input string) and output length
-    assert isinstance(tokens, int)
-    assert tokens > 0
+    resp, usage = runner.run("prompt text", df)
+    assert resp == "1: hello world"
+    # Without usage_metadata the token count is estimated locally from input and output
+    assert usage.estimated is True
+    assert isinstance(usage.total_tokens, int)
+    assert usage.total_tokens == usage.input_tokens + usage.output_tokens > 0
     assert fake_model.call_count == 1
 
 
@@ -77,7 +78,7 @@ def test_run_retryable_error_then_success(monkeypatch):
     runner = GeminiResilientRunner(client)
     df = pd.DataFrame([{"x": 1}])
     resp, tokens = runner.run("prompt", df)
-    assert resp == "ok"
+    assert resp == "1: ok"
     assert model_instance.call_count == 2
 
 
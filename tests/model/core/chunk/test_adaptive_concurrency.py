@@ -0,0 +1,66 @@
+import pytest
+import types
+import streamlit as st
+
+# Mock Streamlit secrets
+st.secrets = types.SimpleNamespace()
+st.secrets.is_local = True
+
+from model.core.chunk.adaptive_concurrency import AdaptiveConcurrencyLimit
+
+
+def test_initial_limit_is_clamped():
+    assert AdaptiveConcurrencyLimit(initial_limit=50, max_limit=8).limit == 8
+    assert AdaptiveConcurrencyLimit(initial_limit=0, min_limit=2, max_limit=8).limit == 2
+
+
+def test_invalid_settings_raise():
+    with pytest.raises(ValueError):
+        AdaptiveConcurrencyLimit(min_limit=4, max_limit=2)
+    with pytest.raises(ValueError):
+        AdaptiveConcurrencyLimit(backoff_ratio=1.5)
+
+
+def test_limit_grows_by_one_per_window_of_stable_successes():
+    concurrency = AdaptiveConcurrencyLimit(initial_limit=2, max_limit=4)
+    for _ in range(2):
+        concurrency.record_success(1.0)
+    assert concurrency.limit == 3
+    for _ in range(3):
+        concurrency.record_success(1.0)
+    assert concurrency.limit == 4
+    for _ in range(10):
+        concurrency.record_success(1.0)
+    assert concurrency.limit == 4
+
+
+def test_overload_halves_the_limit_once_per_window():
+    concurrency = AdaptiveConcurrencyLimit(initial_limit=8, max_limit=16)
+    concurrency.record_overload()
+    assert concurrency.limit == 4
+    # Requests sent under the old limit report overload too; they must not compound
+    concurrency.record_overload()
+    concurrency.record_overload()
+    assert concurrency.limit == 4
+    assert concurrency.decreases == 1
+
+    for _ in range(4):
+        concurrency.record_failure()
+    concurrency.record_overload()
+    assert concurrency.limit == 2
+
+
+def test_limit_never_drops_below_minimum():
+    concurrency = AdaptiveConcurrencyLimit(initial_limit=1, min_limit=1)
+    concurrency.record_overload()
+    assert concurrency.limit == 1
+
+
+def test_latency_spike_backs_off():
+    concurrency = AdaptiveConcurrencyLimit(initial_limit=6, max_limit=16, latency_tolerance=2.0)
+    concurrency.record_success(1.0)
+    concurrency.record_success(1.1)
+    assert concurrency.limit == 6
+    concurrency.record_success(5.0)
+    assert concurrency.limit == 3
+    assert concurrency.latency > 1.0
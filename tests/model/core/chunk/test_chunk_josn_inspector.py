@@ -1,5 +1,6 @@
 import json
 import tempfile
+import pandas as pd
 import pytest
 import types
 from pathlib import Path
@@ -10,6 +11,7 @@ st.secrets = types.SimpleNamespace()
 st.secrets.is_local = True
 
 from model.core.chunk.chunk_json_inspector import ChunkJSONInspector
+from model.core.chunk.chunk_store import ChunkStoreWriter
 
 
 @pytest.fixture
@@ -93,3 +95,24 @@ def test_is_valid_chunk_json_static_method():
     bad_data = {"summary": {}, "chunks": []}
     assert ChunkJSONInspector._is_valid_chunk_json(good_data) is True
     assert ChunkJSONInspector._is_valid_chunk_json(bad_data) is False
+
+
+def test_inspect_jsonl_manifest(temp_dir):
+    manifest_path = temp_dir / "chunks.json"
+    with ChunkStoreWriter(str(manifest_path), chunk_size=1) as writer:
+        first_id = writer.write_chunk(pd.DataFrame({"a": [1]}))
+        writer.write_chunk(pd.DataFrame({"a": [2]}))
+
+    data = json.loads(manifest_path.read_text())
+    data["summary"]["processed_ids"] = [first_id]
+    manifest_path.write_text(json.dumps(data))
+
+    inspector = ChunkJSONInspector(str(temp_dir))
+    assert inspector.find_valid_chunk_file() == manifest_path
+
+    summary = inspector.inspect_chunk_file(manifest_path)
+    assert summary["total_chunks"] == 2
+    assert summary["processed_chunks"] == 1
+    assert summary["unprocessed_chunks"] == 1
+    assert summary["can_resume"] is True
+    assert summary["chunk_size"] == 1
@@ -0,0 +1,99 @@
+import types
+import streamlit as st
+
+# Mock Streamlit secrets
+st.secrets = types.SimpleNamespace()
+st.secrets.is_local = True
+
+import model.core.chunk.chunk_lease_store as chunk_lease_store_module
+from model.core.chunk.chunk_lease_store import ChunkLeaseStore
+
+
+def test_for_chunk_file_uses_sidecar_path(tmp_path):
+    store = ChunkLeaseStore.for_chunk_file(str(tmp_path / "chunks.json"))
+    assert store.db_path == tmp_path / "chunks.leases.db"
+    store.close()
+
+
+def test_acquire_excludes_other_owners(tmp_path):
+    db_path = tmp_path / "leases.db"
+    first = ChunkLeaseStore(db_path, owner="a")
+    second = ChunkLeaseStore(db_path, owner="b")
+
+    assert first.acquire(["1", "2", "3"], limit=2) == ["1", "2"]
+    assert second.acquire(["1", "2", "3"], limit=3) == ["3"]
+
+    # Re-acquiring an own lease is allowed
+    assert first.acquire(["1"], limit=1) == ["1"]
+
+    first.close()
+    second.close()
+
+
+def test_expired_leases_return_to_pool(tmp_path):
+    db_path = tmp_path / "leases.db"
+    crashed = ChunkLeaseStore(db_path, owner="a", lease_seconds=-1)
+    other = ChunkLeaseStore(db_path, owner="b")
+
+    assert crashed.acquire(["1"], limit=1) == ["1"]
+    assert other.acquire(["1"], limit=1) == ["1"]
+
+    crashed.close()
+    other.close()
+
+
+def test_release_and_complete(tmp_path):
+    db_path = tmp_path / "leases.db"
+    first = ChunkLeaseStore(db_path, owner="a")
+    second = ChunkLeaseStore(db_path, owner="b")
+
+    first.acquire(["1", "2"], limit=2)
+    first.release(["1"])
+    first.complete(["2"])
+    second.complete(["3"])
+
+    assert second.acquire(["1", "2", "3"], limit=3) == ["1"]
+    assert sorted(first.completed_ids()) == ["2", "3"]
+
+    first.close()
+    second.close()
+
+
+def test_close_releases_outstanding_leases(tmp_path):
+    db_path = tmp_path / "leases.db"
+    first = ChunkLeaseStore(db_path, owner="a")
+    first.acquire(["1"], limit=1)
+    first.close()
+
+    second = ChunkLeaseStore(db_path, owner="b")
+    assert second.acquire(["1"], limit=1) == ["1"]
+    second.close()
+
+
+def test_renewed_lease_outlives_its_original_expiry(tmp_path, monkeypatch):
+    clock = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(chunk_lease_store_module.time, "time", lambda: clock.now)
+    db_path = tmp_path / "leases.db"
+    slow = ChunkLeaseStore(db_path, owner="a", lease_seconds=10)
+    other = ChunkLeaseStore(db_path, owner="b", lease_seconds=10)
+
+    assert slow.acquire(["1", "2"], limit=2) == ["1", "2"]
+    clock.now = 1008.0
+    slow.renew(["1"])
+
+    # Chunk 2 was not renewed and expired; chunk 1 is still being processed
+    clock.now = 1015.0
+    assert other.acquire(["1", "2"], limit=2) == ["2"]
+    clock.now = 1019.0
+    assert other.acquire(["1"], limit=1) == ["1"]
+
+    slow.close()
+    other.close()
+
+
+def test_forget_drops_completed_records(tmp_path):
+    store = ChunkLeaseStore(tmp_path / "leases.db", owner="a")
+    store.complete(["old", "current"])
+    store.forget(["old"])
+    assert store.completed_ids() == ["current"]
+    store.close()
@@ -1,5 +1,6 @@
 import json
 import sys
+from unittest.mock import Mock
 import pytest
 import types
 from pathlib import Path
@@ -10,7 +11,9 @@ import streamlit as st
 st.secrets = types.SimpleNamespace()
 st.secrets.is_local = True
 
+from model.core.chunk.chunk_lease_store import ChunkLeaseStore
 from model.core.chunk.chunk_manager import ChunkManager
+from model.core.chunk.chunk_store import ChunkStoreWriter
 from utils.constants import JSON_CHUNK_VERSION
 
 # Add project root to Python path
@@ -158,3 +161,165 @@ class TestChunkManager:
         assert "ChunkManager(" in repr(manager)
         assert "processed=1/2" in repr(manager)
         assert json_file.name in repr(manager)
+
+    def test_jsonl_chunk_file(self, tmp_path):
+        manifest_path = tmp_path / "chunks.json"
+        with ChunkStoreWriter(str(manifest_path)) as writer:
+            first_id = writer.write_chunk(pd.DataFrame({"col1": [1, 2]}))
+            second_id = writer.write_chunk(pd.DataFrame({"col1": [3]}))
+
+        manager = ChunkManager(str(manifest_path))
+        assert manager.total_chunks == 2
+
+        chunk, chunk_id = manager.get_next_chunk()
+        assert chunk_id == first_id
+        assert list(chunk["col1"]) == [1, 2]
+        manager.mark_chunk_processed()
+        manager.save_state()
+
+        reloaded = ChunkManager(str(manifest_path))
+        assert reloaded.remaining_chunks == 1
+        assert reloaded.get_next_chunk()[1] == second_id
+
+    def test_save_state_appends_to_journal_without_rewriting_file(self, tmp_path):
+        json_file = create_test_json_file(tmp_path)
+        original = json_file.read_text()
+        manager = ChunkManager(str(json_file))
+
+        manager.get_next_chunk()
+        manager.mark_chunk_processed()
+        manager.save_state()
+
+        assert json_file.read_text() == original
+        assert manager.journal.path.read_text() == "1\n"
+
+        # A reload replays the journal as if the run had crashed here
+        reloaded = ChunkManager(str(json_file))
+        assert reloaded.remaining_chunks == 1
+
+    def test_journal_compacts_at_interval(self, tmp_path):
+        json_file = create_test_json_file(tmp_path)
+        manager = ChunkManager(str(json_file), compact_interval=2)
+
+        manager.mark_chunk_processed("1")
+        manager.save_state()
+        assert manager.journal.path.exists()
+
+        manager.mark_chunk_processed("2")
+        manager.save_state()
+        assert not manager.journal.path.exists()
+
+        summary = json.loads(json_file.read_text())["summary"]
+        assert summary["processed_ids"] == ["1", "2"]
+        assert summary["processed"] == 2
+
+    def test_close_compacts_pending_progress(self, tmp_path):
+        json_file = create_test_json_file(tmp_path)
+        manager = ChunkManager(str(json_file))
+
+        manager.mark_chunk_processed("2")
+        manager.close()
+
+        assert not manager.journal.path.exists()
+        summary = json.loads(json_file.read_text())["summary"]
+        assert summary["processed_ids"] == ["2"]
+
+    def test_get_next_chunks_leases_chunks(self, tmp_path):
+        chunks_data = [{"chunk_id": i, "data": [{"col1": i}]} for i in range(1, 5)]
+        json_file = create_test_json_file(tmp_path, chunks_data=chunks_data)
+        manager = ChunkManager(str(json_file))
+
+        first = manager.get_next_chunks(2)
+        assert [chunk_id for _, chunk_id in first] == ["1", "2"]
+        assert list(first[0][0]["col1"]) == [1]
+        assert manager.leased_chunks == 2
+        assert manager.remaining_chunks == 4
+
+        # Leased chunks are not handed out again
+        assert [chunk_id for _, chunk_id in manager.get_next_chunks(5)] == ["3", "4"]
+        assert manager.get_next_chunks(1) == []
+
+        manager.mark_chunk_processed("1")
+        assert manager.remaining_chunks == 3
+        assert manager.leased_chunks == 3
+
+        manager.release_chunks(["2", "3"])
+        assert manager.leased_chunks == 1
+        assert manager.get_next_chunk()[1] == "2"
+        assert [chunk_id for _, chunk_id in manager.get_next_chunks(5)] == ["2", "3"]
+
+    def test_remaining_count_ignores_repeat_marks(self, tmp_path):
+        json_file = create_test_json_file(tmp_path)
+        manager = ChunkManager(str(json_file))
+
+        manager.mark_chunk_processed("1")
+        manager.mark_chunk_processed("1")
+        manager.mark_chunk_processed("unknown")
+
+        assert manager.remaining_chunks == 1
+        assert manager.get_next_chunk()[1] == "2"
+
+    def test_shared_lease_store_prevents_double_processing(self, tmp_path):
+        chunks_data = [{"chunk_id": i, "data": [{"col1": i}]} for i in range(1, 5)]
+        json_file = create_test_json_file(tmp_path, chunks_data=chunks_data)
+        first = ChunkManager(str(json_file), lease_store=ChunkLeaseStore.for_chunk_file(json_file))
+        second = ChunkManager(str(json_file), lease_store=ChunkLeaseStore.for_chunk_file(json_file))
+
+        assert [chunk_id for _, chunk_id in first.get_next_chunks(2)] == ["1", "2"]
+        assert [chunk_id for _, chunk_id in second.get_next_chunks(4)] == ["3", "4"]
+
+        first.mark_chunk_processed("1")
+        first.release_chunks(["2"])
+        assert [chunk_id for _, chunk_id in second.get_next_chunks(4)] == ["2"]
+
+        second.mark_chunk_processed("2")
+        second.mark_chunk_processed("3")
+        second.mark_chunk_processed("4")
+        second.close()
+        first.close()
+
+        # Both managers' progress reaches the chunk file
+        reloaded = ChunkManager(str(json_file))
+        assert reloaded.remaining_chunks == 0
+
+    def test_close_releases_unfinished_leases(self, tmp_path):
+        chunks_data = [{"chunk_id": i, "data": [{"col1": i}]} for i in range(1, 4)]
+        json_file = create_test_json_file(tmp_path, chunks_data=chunks_data)
+        first = ChunkManager(str(json_file), lease_store=ChunkLeaseStore.for_chunk_file(json_file))
+        second = ChunkManager(str(json_file), lease_store=ChunkLeaseStore.for_chunk_file(json_file))
+
+        first.get_next_chunks(2)
+        first.mark_chunk_processed("1")
+        first.compact = Mock(side_effect=OSError("disk full"))
+        with pytest.raises(OSError):
+            first.close()
+
+        # Chunk 2 is free again without waiting for its lease to expire
+        assert [chunk_id for _, chunk_id in second.get_next_chunks(3)] == ["2", "3"]
+        second.close()
+
+    def test_renew_leases_extends_held_chunks(self, tmp_path):
+        json_file = create_test_json_file(tmp_path)
+        lease_store = Mock(spec=ChunkLeaseStore, lease_seconds=600)
+        lease_store.completed_ids.return_value = []
+        lease_store.acquire.side_effect = lambda ids, limit: list(ids)[:limit]
+        manager = ChunkManager(str(json_file), lease_store=lease_store)
+
+        manager.get_next_chunks(2)
+        manager.mark_chunk_processed("1")
+        # Throttled to the heartbeat interval unless forced
+        manager.renew_leases()
+        lease_store.renew.assert_not_called()
+        manager.renew_leases(force=True)
+        lease_store.renew.assert_called_once_with(["2"])
+
+    def test_load_forgets_completed_records_of_replaced_chunks(self, tmp_path):
+        json_file = create_test_json_file(tmp_path)
+        lease_store = ChunkLeaseStore.for_chunk_file(json_file)
+        lease_store.complete(["from-old-file", "1"])
+
+        manager = ChunkManager(str(json_file), lease_store=lease_store)
+
+        assert lease_store.completed_ids() == ["1"]
+        assert manager.remaining_chunks == 1
+        manager.close()
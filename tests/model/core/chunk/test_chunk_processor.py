@@ -1,21 +1,28 @@
+import time
 import pytest
 import pandas as pd
 import types
 import streamlit as st
-from unittest.mock import Mock, patch, MagicMock, PropertyMock
-from tenacity import RetryError
+from unittest.mock import Mock, patch, MagicMock, PropertyMock, AsyncMock
 
 # Mock Streamlit secrets
 st.secrets = types.SimpleNamespace()
 st.secrets.is_local = True
 
+from model.core.chunk.adaptive_concurrency import AdaptiveConcurrencyLimit
 from model.core.chunk.chunk_processor import ChunkProcessor
+from model.core.llms.circuit_breaker import CircuitBreaker, CircuitState
 from model.core.llms.base_llm_client import BaseLLMClient
 from model.core.chunk.chunk_manager import ChunkManager
 from model.core.llms.gemini_client import GeminiClient
 from model.io.model_prefs import ModelPreference
 from utils.result_type import ResultType
-from utils.exceptions import TokenBudgetExceededError
+from utils.cancellation_token import CancellationToken
+from utils.exceptions import (
+    CircuitOpenError, IncompleteResponseError, OperationCancelledError, RetriesExhaustedError,
+    TokenBudgetExceededError
+)
+from utils.token_usage import TokenUsage
 
 runner_path = "model.core.chunk.chunk_processor.GeminiResilientRunner"
 
@@ -38,6 +45,18 @@ def mock_model_preference():
     return mock_pref
 
 
+def lease_from(chunks):
+    """Builds a get_next_chunks side effect that leases from ``chunks`` in order."""
+    pending = list(chunks)
+
+    def get_next_chunks(n):
+        leased = pending[:n]
+        del pending[:n]
+        return leased
+
+    return get_next_chunks
+
+
 @pytest.fixture
 def sample_dataframe():
     return pd.DataFrame({'col1': [1, 2, 3], 'col2': ['a', 'b', 'c']})
@@ -79,21 +98,47 @@ def test_fatal_error(mock_client, mock_chunk_manager, mock_model_preference, sam
         assert result.chunk.equals(sample_dataframe)
 
 
-def test_retryable_error(mock_client, mock_chunk_manager, mock_model_preference, sample_dataframe):
+def test_exhausted_retries_are_retryable_error_with_stats(mock_client, mock_chunk_manager, mock_model_preference,
+                                                          sample_dataframe):
     mock_chunk_manager.get_next_chunk.return_value = (sample_dataframe, "chunkX")
-    retry_exc = Exception("retryable error")
+    last_error = TimeoutError("quota window did not reset")
 
     with patch(runner_path) as mock_runner_cls:
         runner_instance = mock_runner_cls.return_value
-        runner_instance.run.side_effect = RetryError(last_attempt=MagicMock(exception=lambda: retry_exc))
+
+        def run(prompt, df, retry_stats=None, cancel_token=None):
+            retry_stats.attempts = 3
+            retry_stats.sleep_seconds = 12.0
+            raise RetriesExhaustedError(last_error, 3)
+
+        runner_instance.run.side_effect = run
         runner_instance.fatal_errors = (ValueError,)
 
         processor = ChunkProcessor("prompt", mock_client, mock_chunk_manager, mock_model_preference)
         result = processor.process_next_chunk()
 
-        assert result.result_type == ResultType.RETRYABLE_ERROR
-        assert result.chunk.equals(sample_dataframe)
-        assert str(result.error) == "retryable error"
+    assert result.result_type == ResultType.RETRYABLE_ERROR
+    assert result.error is last_error
+    assert (result.retry_stats.attempts, result.retry_stats.sleep_seconds) == (3, 12.0)
+
+
+def test_incomplete_response_is_retryable_and_charges_tokens(mock_client, mock_chunk_manager, mock_model_preference,
+                                                             sample_dataframe):
+    mock_chunk_manager.get_next_chunk.return_value = (sample_dataframe, "chunkX")
+
+    with patch(runner_path) as mock_runner_cls:
+        runner_instance = mock_runner_cls.return_value
+        runner_instance.run.side_effect = IncompleteResponseError([1], TokenUsage(300, 100, 400))
+        runner_instance.fatal_errors = (ValueError,)
+
+        processor = ChunkProcessor("prompt", mock_client, mock_chunk_manager, mock_model_preference)
+        result = processor.process_next_chunk()
+
+    assert result.result_type == ResultType.RETRYABLE_ERROR
+    assert isinstance(result.error, IncompleteResponseError)
+    assert result.remaining_tokens == 9600
+    assert mock_model_preference.remaining_total_tokens == 9600
+    mock_chunk_manager.mark_chunk_processed.assert_not_called()
 
 
 def test_unexpected_error(mock_client, mock_chunk_manager, mock_model_preference, sample_dataframe):
@@ -119,7 +164,7 @@ def test_token_budget_exceeded(mock_client, mock_chunk_manager, mock_model_prefe
     with patch(runner_path) as mock_runner_cls:
         # Mock the runner to return token usage that would exceed the budget
         runner_instance = mock_runner_cls.return_value
-        runner_instance.run.return_value = ("result", 150)  # 150 tokens used
+        runner_instance.run.return_value = ("result", TokenUsage(100, 50, 150))  # 150 tokens used
         runner_instance.fatal_errors = (ValueError,)  # Mock the fatal_errors tuple
         
         # Create processor with limited token budget
@@ -135,3 +180,260 @@ def test_token_budget_exceeded(mock_client, mock_chunk_manager, mock_model_prefe
         assert isinstance(result.error, TokenBudgetExceededError)
         assert result.error.used_tokens == 150
         assert result.error.remaining_tokens == 100
+
+
+def test_process_chunks_runs_all_chunks_concurrently(mock_client, mock_chunk_manager, mock_model_preference,
+                                                     sample_dataframe):
+    chunk_ids = [f"chunk{i}" for i in range(6)]
+    mock_chunk_manager.get_next_chunks.side_effect = lease_from(
+        [(sample_dataframe, cid) for cid in chunk_ids]
+    )
+
+    with patch(runner_path) as mock_runner_cls:
+        runner_instance = mock_runner_cls.return_value
+        runner_instance.run.return_value = ("1: a\n2: b\n3: c", TokenUsage(6, 4, 10))
+        runner_instance.fatal_errors = (ValueError,)
+
+        processor = ChunkProcessor("prompt", mock_client, mock_chunk_manager, mock_model_preference)
+        results = list(processor.process_chunks(max_chunks=10, max_workers=3))
+
+    successes = [r for r in results if r.result_type == ResultType.SUCCESS]
+    assert sorted(r.chunk_id for r in successes) == chunk_ids
+    assert results[-1].result_type == ResultType.NO_MORE_CHUNKS
+    assert processor.remaining_tokens == 10000 - 6 * 10
+    assert sorted(r.remaining_tokens for r in successes) == [9940, 9950, 9960, 9970, 9980, 9990]
+    assert all(r.token_usage == TokenUsage(6, 4, 10) for r in successes)
+    assert mock_chunk_manager.mark_chunk_processed.call_count == 6
+    assert mock_chunk_manager.save_state.call_count == 6
+    # Leases of chunks in flight are kept alive while the run waits on them
+    mock_chunk_manager.renew_leases.assert_called()
+
+
+def test_process_chunks_respects_max_chunks(mock_client, mock_chunk_manager, mock_model_preference,
+                                            sample_dataframe):
+    mock_chunk_manager.get_next_chunks.side_effect = lease_from(
+        [(sample_dataframe, f"chunk{i}") for i in range(5)]
+    )
+
+    with patch(runner_path) as mock_runner_cls:
+        runner_instance = mock_runner_cls.return_value
+        runner_instance.run.return_value = ("ok", TokenUsage(1, 0, 1))
+        runner_instance.fatal_errors = (ValueError,)
+
+        processor = ChunkProcessor("prompt", mock_client, mock_chunk_manager, mock_model_preference)
+        results = list(processor.process_chunks(max_chunks=2, max_workers=4))
+
+    assert len(results) == 2
+    assert all(r.result_type == ResultType.SUCCESS for r in results)
+
+
+def test_process_chunks_stops_dispatch_after_fatal_error(mock_client, mock_chunk_manager, mock_model_preference,
+                                                         sample_dataframe):
+    mock_chunk_manager.get_next_chunks.side_effect = lease_from(
+        [(sample_dataframe, f"chunk{i}") for i in range(5)]
+    )
+
+    with patch(runner_path) as mock_runner_cls:
+        runner_instance = mock_runner_cls.return_value
+        runner_instance.run.side_effect = ValueError("fatal")
+        runner_instance.fatal_errors = (ValueError,)
+
+        processor = ChunkProcessor("prompt", mock_client, mock_chunk_manager, mock_model_preference)
+        results = list(processor.process_chunks(max_chunks=5, max_workers=1))
+
+    assert len(results) == 1
+    assert results[0].result_type == ResultType.FATAL_ERROR
+    mock_chunk_manager.mark_chunk_processed.assert_not_called()
+    mock_chunk_manager.release_chunks.assert_called_once_with(["chunk0"])
+
+
+def test_process_chunks_follows_adaptive_limit(mock_client, mock_chunk_manager, mock_model_preference,
+                                              sample_dataframe):
+    mock_chunk_manager.get_next_chunks.side_effect = lease_from(
+        [(sample_dataframe, f"chunk{i}") for i in range(6)]
+    )
+    concurrency = AdaptiveConcurrencyLimit(initial_limit=1, max_limit=8)
+
+    with patch(runner_path) as mock_runner_cls:
+        runner_instance = mock_runner_cls.return_value
+        runner_instance.fatal_errors = (ValueError,)
+
+        def run(prompt, df, retry_stats=None, cancel_token=None):
+            runner_instance.latency_listener(0.01)
+            return "ok", TokenUsage(1, 0, 1)
+
+        runner_instance.run.side_effect = run
+
+        processor = ChunkProcessor("prompt", mock_client, mock_chunk_manager, mock_model_preference)
+        results = list(processor.process_chunks(max_chunks=6, max_workers=8, concurrency=concurrency))
+
+    assert sum(r.result_type == ResultType.SUCCESS for r in results) == 6
+    # Leases grow with the limit instead of filling all eight workers at once
+    lease_sizes = [c.args[0] for c in mock_chunk_manager.get_next_chunks.call_args_list]
+    assert lease_sizes[0] == 1
+    assert max(lease_sizes) < 8
+    assert concurrency.limit > 1
+    assert runner_instance.overload_listener is None
+    assert runner_instance.latency_listener is None
+
+
+def test_slow_chunk_with_fast_requests_does_not_back_off(mock_client, mock_chunk_manager, mock_model_preference,
+                                                         sample_dataframe):
+    mock_chunk_manager.get_next_chunks.side_effect = lease_from(
+        [(sample_dataframe, f"chunk{i}") for i in range(3)]
+    )
+    concurrency = AdaptiveConcurrencyLimit(initial_limit=2, max_limit=2)
+    concurrency.record_success(0.01)
+
+    with patch(runner_path) as mock_runner_cls:
+        runner_instance = mock_runner_cls.return_value
+        runner_instance.fatal_errors = (ValueError,)
+
+        def run(prompt, df, retry_stats=None, cancel_token=None):
+            # A retried request: the backoff makes the chunk slow, each request is fast
+            runner_instance.latency_listener(0.01)
+            time.sleep(0.1)
+            runner_instance.latency_listener(0.01)
+            return "ok", TokenUsage(1, 0, 1)
+
+        runner_instance.run.side_effect = run
+
+        processor = ChunkProcessor("prompt", mock_client, mock_chunk_manager, mock_model_preference)
+        list(processor.process_chunks(max_chunks=3, max_workers=2, concurrency=concurrency))
+
+    assert concurrency.decreases == 0
+
+
+def test_process_chunks_backs_off_on_runner_overload(mock_client, mock_chunk_manager, mock_model_preference,
+                                                     sample_dataframe):
+    mock_chunk_manager.get_next_chunks.side_effect = lease_from(
+        [(sample_dataframe, f"chunk{i}") for i in range(4)]
+    )
+    concurrency = AdaptiveConcurrencyLimit(initial_limit=4, max_limit=4)
+
+    with patch(runner_path) as mock_runner_cls:
+        runner_instance = mock_runner_cls.return_value
+        runner_instance.fatal_errors = (ValueError,)
+
+        def run(prompt, df, retry_stats=None, cancel_token=None):
+            runner_instance.overload_listener(TimeoutError("slow down"))
+            return "ok", TokenUsage(1, 0, 1)
+
+        runner_instance.run.side_effect = run
+
+        processor = ChunkProcessor("prompt", mock_client, mock_chunk_manager, mock_model_preference)
+        list(processor.process_chunks(max_chunks=4, max_workers=4, concurrency=concurrency))
+
+    assert concurrency.decreases >= 1
+    assert concurrency.limit < 4
+
+
+def test_process_chunks_probes_with_one_chunk_after_circuit_opens(mock_client, mock_chunk_manager,
+                                                                 mock_model_preference, sample_dataframe):
+    mock_chunk_manager.get_next_chunks.side_effect = lease_from(
+        [(sample_dataframe, f"chunk{i}") for i in range(3)]
+    )
+    breaker = CircuitBreaker(failure_threshold=1, recovery_seconds=0.05)
+    breaker.record_failure()
+
+    with patch(runner_path) as mock_runner_cls:
+        runner_instance = mock_runner_cls.return_value
+        runner_instance.fatal_errors = (ValueError,)
+        runner_instance.circuit_breaker = breaker
+
+        def run(prompt, df, retry_stats=None, cancel_token=None):
+            breaker.before_call()
+            breaker.record_success()
+            return "ok", TokenUsage(1, 0, 1)
+
+        runner_instance.run.side_effect = run
+
+        processor = ChunkProcessor("prompt", mock_client, mock_chunk_manager, mock_model_preference)
+        results = list(processor.process_chunks(max_chunks=3, max_workers=3))
+
+    assert [r.result_type for r in results] == [ResultType.SUCCESS] * 3
+    lease_sizes = [c.args[0] for c in mock_chunk_manager.get_next_chunks.call_args_list]
+    assert lease_sizes[:2] == [1, 2]
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_circuit_open_result_returns_chunk_to_pool(mock_client, mock_chunk_manager, mock_model_preference,
+                                                   sample_dataframe):
+    mock_chunk_manager.get_next_chunks.side_effect = lease_from([(sample_dataframe, "chunk0")])
+
+    with patch(runner_path) as mock_runner_cls:
+        runner_instance = mock_runner_cls.return_value
+        runner_instance.fatal_errors = (ValueError,)
+        runner_instance.circuit_breaker = None
+        runner_instance.run.side_effect = CircuitOpenError(30)
+
+        processor = ChunkProcessor("prompt", mock_client, mock_chunk_manager, mock_model_preference)
+        results = list(processor.process_chunks(max_chunks=1, max_workers=1))
+
+    assert results[0].result_type == ResultType.CIRCUIT_OPEN
+    assert results[0].error.retry_in == 30
+    mock_chunk_manager.release_chunks.assert_any_call(["chunk0"])
+    mock_chunk_manager.mark_chunk_processed.assert_not_called()
+
+
+def test_process_chunks_stops_dispatch_when_cancelled(mock_client, mock_chunk_manager, mock_model_preference,
+                                                      sample_dataframe):
+    mock_chunk_manager.get_next_chunks.side_effect = lease_from(
+        [(sample_dataframe, f"chunk{i}") for i in range(5)]
+    )
+    token = CancellationToken()
+
+    with patch(runner_path) as mock_runner_cls:
+        runner_instance = mock_runner_cls.return_value
+        runner_instance.fatal_errors = (ValueError,)
+        runner_instance.circuit_breaker = None
+        runner_instance.run.return_value = ("ok", TokenUsage(1, 0, 1))
+
+        processor = ChunkProcessor("prompt", mock_client, mock_chunk_manager, mock_model_preference)
+        results = processor.process_chunks(max_chunks=5, max_workers=1, cancel_token=token)
+        first = next(results)
+        token.cancel()
+        rest = list(results)
+
+    assert first.result_type == ResultType.SUCCESS
+    assert rest == []
+    assert runner_instance.run.call_args.kwargs["cancel_token"] is token
+    assert mock_chunk_manager.mark_chunk_processed.call_count == 1
+
+
+def test_cancelled_chunk_is_not_marked_processed(mock_client, mock_chunk_manager, mock_model_preference,
+                                                 sample_dataframe):
+    mock_chunk_manager.get_next_chunk.return_value = (sample_dataframe, "chunkX")
+
+    with patch(runner_path) as mock_runner_cls:
+        runner_instance = mock_runner_cls.return_value
+        runner_instance.fatal_errors = (ValueError,)
+        runner_instance.run.side_effect = OperationCancelledError()
+
+        processor = ChunkProcessor("prompt", mock_client, mock_chunk_manager, mock_model_preference)
+        result = processor.process_next_chunk()
+
+    assert result.result_type == ResultType.CANCELLED
+    mock_chunk_manager.mark_chunk_processed.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_aprocess_chunks_runs_all_chunks(mock_client, mock_chunk_manager, mock_model_preference,
+                                               sample_dataframe):
+    mock_chunk_manager.get_next_chunks.side_effect = lease_from(
+        [(sample_dataframe, f"chunk{i}") for i in range(4)]
+    )
+
+    with patch(runner_path) as mock_runner_cls:
+        runner_instance = mock_runner_cls.return_value
+        runner_instance.arun = AsyncMock(return_value=("ok", TokenUsage(3, 2, 5)))
+        runner_instance.fatal_errors = (ValueError,)
+
+        processor = ChunkProcessor("prompt", mock_client, mock_chunk_manager, mock_model_preference)
+        results = [result async for result in processor.aprocess_chunks(max_chunks=10, max_concurrency=2)]
+
+    successes = [r for r in results if r.result_type == ResultType.SUCCESS]
+    assert len(successes) == 4
+    assert results[-1].result_type == ResultType.NO_MORE_CHUNKS
+    assert processor.remaining_tokens == 10000 - 4 * 5
+    assert runner_instance.arun.await_count == 4
@@ -0,0 +1,175 @@
+import json
+import types
+from unittest.mock import Mock
+
+import pandas as pd
+import pytest
+import streamlit as st
+
+# Mock Streamlit secrets
+st.secrets = types.SimpleNamespace()
+st.secrets.is_local = True
+
+import model.core.chunk.chunk_store as chunk_store_module
+from model.core.chunk.chunk_store import (
+    ChunkStoreWriter,
+    JsonlChunkStore,
+    LegacyChunkStore,
+    ProgressJournal,
+    open_chunk_store,
+)
+from utils.constants import JSON_CHUNK_VERSION, JSONL_CHUNK_VERSION
+
+
+@pytest.fixture
+def chunk_frames():
+    return [
+        pd.DataFrame({"col1": [1, 2], "source_id": ["a", "b"]}),
+        pd.DataFrame({"col1": [3], "source_id": ["c"]}),
+    ]
+
+
+def test_writer_creates_manifest_and_jsonl(tmp_path, chunk_frames):
+    manifest_path = tmp_path / "chunks.json"
+    with ChunkStoreWriter(str(manifest_path), chunk_size=2, metadata={"k": "v"}) as writer:
+        ids = [writer.write_chunk(df) for df in chunk_frames]
+
+    manifest = json.loads(manifest_path.read_text())
+    assert manifest["version"] == JSONL_CHUNK_VERSION
+    assert manifest["data_file"] == f"chunks.{writer.generation}.jsonl"
+    assert manifest["metadata"] == {"k": "v"}
+    assert manifest["summary"] == {"total_chunks": 2, "processed_ids": [], "chunk_size": 2}
+    assert [entry["chunk_id"] for entry in manifest["chunk_index"]] == ids
+    # Manifest holds no row data
+    assert "chunks" not in manifest
+
+    lines = writer.data_path.read_text().splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[1])["data"] == [{"col1": 3, "source_id": "c"}]
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_writer_discards_partial_data_on_error(tmp_path, chunk_frames):
+    manifest_path = tmp_path / "chunks.json"
+    with pytest.raises(RuntimeError):
+        with ChunkStoreWriter(str(manifest_path)) as writer:
+            writer.write_chunk(chunk_frames[0])
+            raise RuntimeError("interrupted")
+
+    assert not manifest_path.exists()
+    assert not list(tmp_path.glob("*.jsonl*"))
+
+
+def test_rewrite_keeps_manifest_consistent_until_it_is_replaced(tmp_path, chunk_frames, monkeypatch):
+    manifest_path = tmp_path / "chunks.json"
+    with ChunkStoreWriter(str(manifest_path)) as writer:
+        old_ids = [writer.write_chunk(df) for df in chunk_frames]
+    old_data_path = writer.data_path
+
+    # Crash after the new data file is published but before the manifest is replaced
+    rewriter = ChunkStoreWriter(str(manifest_path))
+    rewriter.write_chunk(pd.DataFrame({"col1": [9, 8, 7], "source_id": ["x", "y", "z"]}))
+    monkeypatch.setattr(chunk_store_module, "_atomic_write_json", Mock(side_effect=OSError("crash")))
+    with pytest.raises(OSError):
+        rewriter.close()
+
+    store = open_chunk_store(str(manifest_path))
+    assert list(store.read_chunk(old_ids[1])["source_id"]) == ["c"]
+    monkeypatch.undo()
+
+    # A completed rewrite switches over and removes the replaced data file
+    with ChunkStoreWriter(str(manifest_path)) as writer:
+        new_id = writer.write_chunk(chunk_frames[1])
+    assert open_chunk_store(str(manifest_path)).chunk_ids == [new_id]
+    assert not old_data_path.exists()
+
+
+def test_jsonl_store_reads_chunks_lazily(tmp_path, chunk_frames):
+    manifest_path = tmp_path / "chunks.json"
+    with ChunkStoreWriter(str(manifest_path)) as writer:
+        ids = [writer.write_chunk(df) for df in chunk_frames]
+
+    store = open_chunk_store(str(manifest_path))
+    assert isinstance(store, JsonlChunkStore)
+    assert store.chunk_ids == ids
+    assert store.columns == list(chunk_frames[0].columns)
+
+    second = store.read_chunk(ids[1])
+    assert list(second["source_id"]) == ["c"]
+
+    streamed = list(store.iter_chunks())
+    assert [chunk_id for chunk_id, _ in streamed] == ids
+    assert list(streamed[0][1]["col1"]) == [1, 2]
+
+
+def test_jsonl_store_save_summary_only_rewrites_manifest(tmp_path, chunk_frames):
+    manifest_path = tmp_path / "chunks.json"
+    with ChunkStoreWriter(str(manifest_path)) as writer:
+        ids = [writer.write_chunk(df) for df in chunk_frames]
+    data_before = writer.data_path.read_bytes()
+
+    store = open_chunk_store(str(manifest_path))
+    store.save_summary({"total_chunks": 2, "processed_ids": [ids[0]]})
+
+    assert writer.data_path.read_bytes() == data_before
+    assert json.loads(manifest_path.read_text())["summary"]["processed_ids"] == [ids[0]]
+
+
+def test_open_chunk_store_reads_legacy_files(tmp_path):
+    legacy_path = tmp_path / "legacy.json"
+    legacy_path.write_text(json.dumps({
+        "version": JSON_CHUNK_VERSION,
+        "chunks": [{"chunk_id": 7, "data": [{"x": 1}]}],
+        "summary": {"total_chunks": 1, "processed_ids": []}
+    }))
+
+    store = open_chunk_store(str(legacy_path))
+    assert isinstance(store, LegacyChunkStore)
+    assert store.chunk_ids == ["7"]
+    assert store.columns == ["x"]
+    assert list(store.read_chunk("7")["x"]) == [1]
+
+
+def test_progress_journal_appends_and_replays(tmp_path):
+    journal = ProgressJournal(tmp_path / "chunks.json")
+    assert journal.path == tmp_path / "chunks.journal"
+    assert journal.read() == []
+
+    journal.append(["a", "b"])
+    journal.append(["c"])
+    assert journal.read() == ["a", "b", "c"]
+
+    journal.clear()
+    assert not journal.path.exists()
+
+
+def test_progress_journal_drops_torn_trailing_line(tmp_path):
+    journal = ProgressJournal(tmp_path / "chunks.json")
+    journal.path.write_bytes(b"a\nb\npartial-i")
+
+    assert journal.read() == ["a", "b"]
+
+    journal.append(["c"])
+    assert journal.read() == ["a", "b", "c"]
+
+
+def test_writer_clears_stale_journal(tmp_path, chunk_frames):
+    manifest_path = tmp_path / "chunks.json"
+    journal = ProgressJournal(manifest_path)
+    journal.append(["old-id"])
+
+    with ChunkStoreWriter(str(manifest_path)) as writer:
+        writer.write_chunk(chunk_frames[0])
+
+    assert not journal.path.exists()
+
+
+def test_writer_records_processed_chunks_in_summary(tmp_path, chunk_frames):
+    manifest_path = tmp_path / "chunks.json"
+    with ChunkStoreWriter(manifest_path) as writer:
+        writer.write_chunk(chunk_frames[0])
+        carried_id = writer.write_chunk(chunk_frames[1], processed=True)
+
+    store = open_chunk_store(manifest_path)
+    assert store.summary["total_chunks"] == 2
+    assert store.summary["processed_ids"] == [carried_id]
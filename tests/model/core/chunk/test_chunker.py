@@ -12,7 +12,7 @@ from pathlib import Path
 st.secrets = types.SimpleNamespace()
 st.secrets.is_local = True
 
-from model.core.chunk.chunker import DataFrameChunker
+from model.core.chunk.chunker import DataFrameChunker, content_source_ids
 
 
 @pytest.fixture
@@ -43,6 +43,44 @@ def test_chunk_dataframe_splits_and_adds_source_ids(sample_df):
         for sid in chunk["source_id"]:
             UUID(sid)  # Will raise if not a valid UUID
 
+def test_chunk_dataframe_source_ids_are_reproducible(sample_df):
+    first = pd.concat(DataFrameChunker(chunk_size=2).chunk_dataframe(sample_df))["source_id"]
+    again = pd.concat(DataFrameChunker(chunk_size=3).chunk_dataframe(sample_df.copy()))["source_id"]
+
+    assert first.tolist() == again.tolist()
+    assert "source_id" not in sample_df.columns
+
+def test_content_source_ids_distinguish_duplicate_rows():
+    df = pd.DataFrame({"a": [1, 2, 1, 1], "b": ["x", "y", "x", "x"]})
+    ids = content_source_ids(df)
+
+    assert len(set(ids)) == 4
+    # Ids depend on a row's content and its occurrence, not its position
+    assert content_source_ids(df.iloc[[1, 0]].reset_index(drop=True)).tolist() == [ids[1], ids[0]]
+    assert content_source_ids(df.iloc[:0]).tolist() == []
+
+def test_content_source_ids_survive_dtype_widening():
+    df = pd.DataFrame({"n": [1, 2], "s": ["x", "y"]})
+    ids = content_source_ids(df)
+
+    # A blank cell turns the int column into float64
+    widened = pd.concat([df, pd.DataFrame({"n": [float("nan")], "s": ["z"]})], ignore_index=True)
+    assert widened["n"].dtype == "float64"
+    assert content_source_ids(widened).tolist()[:2] == ids.tolist()
+
+
+def test_content_source_ids_ignore_column_order():
+    df = pd.DataFrame({"a": [1, 2], "b": ["x", "y"], "c": [0.5, None]})
+    assert content_source_ids(df[["c", "a", "b"]]).tolist() == content_source_ids(df).tolist()
+
+
+def test_content_source_ids_treat_blank_and_missing_cells_alike():
+    blank = pd.DataFrame({"a": [1, 2], "b": ["", "y"]})
+    missing = pd.DataFrame({"a": [1, 2], "b": [None, "y"]})
+    assert content_source_ids(blank).tolist() == content_source_ids(missing).tolist()
+    # Values only match under their own column name
+    assert content_source_ids(blank.rename(columns={"b": "c"}))[1] != content_source_ids(blank)[1]
+
 def test_chunk_dataframe_empty_df_returns_empty_list():
     df = pd.DataFrame(columns=["col1", "col2"])
     chunker = DataFrameChunker(chunk_size=2)
@@ -93,3 +131,64 @@ def test_save_chunks_to_json_creates_parent_dirs(sample_df):
         # Cleanup
         if deep_path.exists():
             os.remove(deep_path)
+
+def test_save_chunks_to_jsonl_streams_generator(sample_df, temp_json_path):
+    chunker = DataFrameChunker(chunk_size=2)
+    chunks = chunker.chunk_dataframe(sample_df)
+
+    chunker.save_chunks_to_jsonl((chunk for chunk in chunks), file_path=str(temp_json_path))
+
+    with open(temp_json_path, "r") as f:
+        manifest = json.load(f)
+    assert manifest["summary"]["total_chunks"] == len(chunks)
+    assert len(manifest["chunk_index"]) == len(chunks)
+    assert (temp_json_path.parent / manifest["data_file"]).exists()
+
+def test_save_chunks_to_jsonl_raises_on_empty(temp_json_path):
+    chunker = DataFrameChunker()
+    with pytest.raises(ValueError, match="No chunks to save"):
+        chunker.save_chunks_to_jsonl([], file_path=str(temp_json_path))
+    assert not temp_json_path.exists()
+
+def test_chunk_dataframe_by_tokens_packs_rows_up_to_target(sample_df):
+    chunker = DataFrameChunker()
+    chunks = chunker.chunk_dataframe_by_tokens(sample_df, [3, 3, 3, 10, 1], token_target=6)
+
+    # [3, 3] fits, the third row starts a new chunk, the 10-token row stands alone
+    assert [chunk["col1"].tolist() for chunk in chunks] == [[1, 2], [3], [4], [5]]
+    source_ids = pd.concat(chunks)["source_id"]
+    assert source_ids.is_unique
+    for sid in source_ids:
+        UUID(sid)
+
+def test_chunk_dataframe_by_tokens_respects_max_rows(sample_df):
+    chunker = DataFrameChunker()
+    chunks = chunker.chunk_dataframe_by_tokens(sample_df, [1] * 5, token_target=100, max_rows=2)
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+
+def test_chunk_dataframe_by_tokens_validates_inputs(sample_df):
+    chunker = DataFrameChunker()
+    with pytest.raises(ValueError):
+        chunker.chunk_dataframe_by_tokens(sample_df, [1, 2], token_target=10)
+    with pytest.raises(ValueError):
+        chunker.chunk_dataframe_by_tokens(sample_df, [1] * 5, token_target=0)
+
+def test_chunk_dataframe_keeps_precomputed_source_ids(sample_df):
+    source_ids = content_source_ids(sample_df)
+    chunks = DataFrameChunker(chunk_size=2).chunk_dataframe(sample_df.iloc[2:], source_ids=source_ids[2:])
+    assert pd.concat(chunks)["source_id"].tolist() == source_ids[2:].tolist()
+
+    with pytest.raises(ValueError):
+        DataFrameChunker().chunk_dataframe(sample_df, source_ids=source_ids[:2])
+
+def test_save_chunks_to_jsonl_marks_processed_chunks(sample_df, temp_json_path):
+    chunker = DataFrameChunker(chunk_size=2)
+    pending = chunker.chunk_dataframe(sample_df.iloc[:3])
+    carried = chunker.chunk_dataframe(sample_df.iloc[3:])
+
+    chunk_ids = chunker.save_chunks_to_jsonl(pending, file_path=str(temp_json_path), processed_chunks=carried)
+
+    with open(temp_json_path, "r") as f:
+        summary = json.load(f)["summary"]
+    assert len(chunk_ids) == 3
+    assert summary["processed_ids"] == chunk_ids[2:]
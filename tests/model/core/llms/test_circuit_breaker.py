@@ -0,0 +1,177 @@
+import asyncio
+import types
+from unittest.mock import MagicMock
+
+import pytest
+import streamlit as st
+
+# Mock Streamlit secrets
+st.secrets = types.SimpleNamespace()
+st.secrets.is_local = True
+
+import model.core.llms.circuit_breaker as circuit_breaker_module
+from model.core.llms.circuit_breaker import CircuitBreaker, CircuitState, get_circuit_breaker
+from model.core.llms.resilient_llm_runner import ResilientLLMRunner
+from model.core.llms.retry_policy import RetryPolicy
+from utils.exceptions import CircuitOpenError, RetriesExhaustedError
+
+
+class Outage(Exception):
+    pass
+
+
+class Quota(Exception):
+    pass
+
+
+class Refused(Exception):
+    pass
+
+
+class DummyRunner(ResilientLLMRunner):
+    @property
+    def retryable_errors(self):
+        return (Outage, Quota)
+
+    @property
+    def fatal_errors(self):
+        return (Refused,)
+
+    @property
+    def quota_errors(self):
+        return (Quota,)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(circuit_breaker_module.time, "monotonic", clock.monotonic)
+    return clock
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, recovery_seconds=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitState.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+    assert breaker.times_opened == 1
+    with pytest.raises(CircuitOpenError) as exc_info:
+        breaker.before_call()
+    assert exc_info.value.retry_in == 30
+
+
+def test_half_open_admits_a_single_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, recovery_seconds=30)
+    breaker.record_failure()
+    clock.now = 30
+    assert breaker.state == CircuitState.HALF_OPEN
+    assert breaker.retry_in() == 0
+
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CircuitState.CLOSED
+    breaker.before_call()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=1, recovery_seconds=30)
+    breaker.record_failure()
+    clock.now = 31
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+    assert breaker.retry_in() == 30
+    assert breaker.times_opened == 2
+
+
+def test_ignored_outcome_frees_the_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, recovery_seconds=30)
+    breaker.record_failure()
+    clock.now = 30
+    breaker.before_call()
+    breaker.record_ignored()
+    assert breaker.state == CircuitState.HALF_OPEN
+    breaker.before_call()
+
+
+def test_get_circuit_breaker_is_shared_per_model():
+    assert get_circuit_breaker("model-a") is get_circuit_breaker("model-a")
+    assert get_circuit_breaker("model-a") is not get_circuit_breaker("model-b")
+
+
+def test_runner_stops_calling_while_open(clock, monkeypatch):
+    monkeypatch.setattr("time.sleep", lambda seconds: None)
+    client = MagicMock()
+    client.call.side_effect = Outage("503")
+    breaker = CircuitBreaker(failure_threshold=2, recovery_seconds=30)
+    runner = DummyRunner(client, retry_policy=RetryPolicy(max_attempts=5, base_delay=0), circuit_breaker=breaker)
+
+    # The third attempt is refused by the open breaker instead of reaching the client
+    with pytest.raises(CircuitOpenError):
+        runner.run("prompt")
+    assert client.call.call_count == 2
+
+    with pytest.raises(CircuitOpenError):
+        runner.run("prompt")
+    assert client.call.call_count == 2
+
+
+def test_runner_counts_only_outages_as_failures(clock):
+    client = MagicMock()
+    breaker = CircuitBreaker(failure_threshold=1, recovery_seconds=30)
+    runner = DummyRunner(client, retry_policy=RetryPolicy(max_attempts=1, quota_deadline=0), circuit_breaker=breaker)
+
+    for error in (Refused("400"), ValueError("bug")):
+        client.call.side_effect = error
+        with pytest.raises(type(error)):
+            runner.run("prompt")
+    assert breaker.state == CircuitState.CLOSED
+
+    client.call.side_effect = Quota("429")
+    with pytest.raises(RetriesExhaustedError):
+        runner.run("prompt")
+    assert breaker.state == CircuitState.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_frees_the_probe_slot():
+    # No fake clock: asyncio itself runs on time.monotonic
+    breaker = CircuitBreaker(failure_threshold=1, recovery_seconds=0)
+    breaker.record_failure()
+    assert breaker.state == CircuitState.HALF_OPEN
+
+    probe_started = asyncio.Event()
+
+    async def hang(prompt, df=None):
+        probe_started.set()
+        await asyncio.sleep(60)
+
+    client = MagicMock()
+    client.acall = hang
+    runner = DummyRunner(client, circuit_breaker=breaker)
+
+    probe = asyncio.ensure_future(runner.arun("prompt"))
+    await probe_started.wait()
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+
+    # The next call may probe instead of being rejected forever
+    breaker.before_call()
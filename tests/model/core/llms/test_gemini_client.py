@@ -1,10 +1,13 @@
 # tests/model/core/llms/test_gemini_client.py
+import asyncio
 import builtins
+import time
 import pytest
 import pandas as pd
 import types
+from types import SimpleNamespace
 import streamlit as st
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 
 # Mock Streamlit secrets
 st.secrets = types.SimpleNamespace()
@@ -12,6 +15,7 @@ st.secrets.is_local = True
 
 import model.core.llms.gemini_client as gemini_client_module
 from model.core.llms.gemini_client import GeminiClient
+from utils.token_usage import TokenUsage
 
 
 @pytest.fixture
@@ -56,20 +60,20 @@ def test_call_success(monkeypatch, sample_df):
     client.generation_config = {}
     client.llm = mock_llm
 
-    # Prepare mock token counting
-    mock_llm.count_tokens.side_effect = [
-        MagicMock(total_tokens=10),  # input tokens
-        MagicMock(total_tokens=5)    # output tokens
-    ]
-    mock_llm.generate_content.return_value = MagicMock(text="the response")
+    # Token usage is reported by the generation response itself
+    mock_llm.generate_content.return_value = MagicMock(
+        text="the response",
+        usage_metadata=MagicMock(prompt_token_count=10, candidates_token_count=5, total_token_count=15)
+    )
 
     # Act
-    result_text, total_tokens = client.call("prompt here", sample_df)
+    result_text, usage = client.call("prompt here", sample_df)
 
     # Assert
     assert result_text == "the response"
-    assert total_tokens == 15
-    assert mock_llm.count_tokens.call_count == 2
+    assert usage == TokenUsage(input_tokens=10, output_tokens=5, total_tokens=15)
+    assert usage.estimated is False
+    mock_llm.count_tokens.assert_not_called()
     mock_llm.generate_content.assert_called_once()
 
 
@@ -82,16 +86,33 @@ def test_call_success_with_empty_text(monkeypatch, sample_df):
     client.generation_config = {}
     client.llm = mock_llm
 
-    mock_llm.count_tokens.side_effect = [
-        MagicMock(total_tokens=4),
-        MagicMock(total_tokens=6)
-    ]
-    mock_llm.generate_content.return_value = MagicMock(text=None)
+    mock_llm.generate_content.return_value = MagicMock(
+        text=None,
+        usage_metadata=MagicMock(prompt_token_count=4, candidates_token_count=6, total_token_count=10)
+    )
 
-    text, tokens = client.call("prompt here", sample_df)
+    text, usage = client.call("prompt here", sample_df)
 
     assert text == ""
-    assert tokens == 10
+    assert usage.total_tokens == 10
+
+
+def test_call_estimates_tokens_without_usage_metadata(monkeypatch, sample_df):
+    mock_llm = MagicMock()
+    client = GeminiClient.__new__(GeminiClient)
+    client.model = "gemini-model"
+    client.api_key = "fake-key"
+    client.generation_config = {}
+    client.llm = mock_llm
+
+    mock_llm.generate_content.return_value = SimpleNamespace(text="abc")
+    monkeypatch.setattr(gemini_client_module, "estimate_tokens", lambda text, model: len(text))
+
+    text, usage = client.call("prompt here", sample_df)
+
+    formatted_len = len(client._format_input("prompt here", sample_df))
+    assert usage == TokenUsage(formatted_len, 3, formatted_len + 3, estimated=True)
+    mock_llm.count_tokens.assert_not_called()
 
 
 
@@ -112,3 +133,76 @@ def test_call_failure(sample_df):
     with pytest.raises(Exception) as exc_info:
         client.call("prompt here", sample_df)
     assert "API down" in str(exc_info.value)
+
+
+@pytest.mark.asyncio
+async def test_acall_success(sample_df):
+    mock_llm = MagicMock()
+    client = GeminiClient.__new__(GeminiClient)
+    client.model = "gemini-model"
+    client.api_key = "fake-key"
+    client.generation_config = {}
+    client.llm = mock_llm
+
+    mock_llm.generate_content_async = AsyncMock(return_value=MagicMock(
+        text="async response",
+        usage_metadata=MagicMock(prompt_token_count=7, candidates_token_count=3, total_token_count=10)
+    ))
+
+    text, usage = await client.acall("prompt here", sample_df)
+
+    assert text == "async response"
+    assert usage.total_tokens == 10
+    mock_llm.generate_content_async.assert_awaited_once()
+    mock_llm.generate_content.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_acall_failure_propagates(sample_df):
+    mock_llm = MagicMock()
+    mock_llm.generate_content_async = AsyncMock(side_effect=Exception("API down"))
+
+    client = GeminiClient.__new__(GeminiClient)
+    client.model = "gemini-model"
+    client.api_key = "fake-key"
+    client.generation_config = {}
+    client.llm = mock_llm
+
+    with pytest.raises(Exception, match="API down"):
+        await client.acall("prompt here", sample_df)
+
+
+def test_call_raises_timeout_after_request_deadline(sample_df):
+    mock_llm = MagicMock()
+    mock_llm.generate_content.side_effect = lambda *args, **kwargs: time.sleep(1)
+
+    client = GeminiClient.__new__(GeminiClient)
+    client.model = "gemini-model"
+    client.api_key = "fake-key"
+    client.generation_config = {}
+    client.llm = mock_llm
+    client.request_timeout = 0.05
+
+    start = time.monotonic()
+    with pytest.raises(TimeoutError, match="deadline"):
+        client.call("prompt here", sample_df)
+    assert time.monotonic() - start < 0.5
+
+
+@pytest.mark.asyncio
+async def test_acall_raises_timeout_after_request_deadline(sample_df):
+    async def hang(*args, **kwargs):
+        await asyncio.sleep(1)
+
+    mock_llm = MagicMock()
+    mock_llm.generate_content_async = hang
+
+    client = GeminiClient.__new__(GeminiClient)
+    client.model = "gemini-model"
+    client.api_key = "fake-key"
+    client.generation_config = {}
+    client.llm = mock_llm
+    client.request_timeout = 0.05
+
+    with pytest.raises(TimeoutError):
+        await client.acall("prompt here", sample_df)
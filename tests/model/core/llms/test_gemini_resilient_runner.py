@@ -35,6 +35,7 @@ def test_retryable_errors_contains_expected_exceptions(runner):
         api_exceptions.ServiceUnavailable,
         api_exceptions.InternalServerError,
         api_exceptions.Aborted,
+        api_exceptions.ResourceExhausted,
         ConnectionError,
         TimeoutError,
     )
@@ -48,7 +49,6 @@ def test_retryable_errors_contains_expected_exceptions(runner):
 def test_fatal_errors_contains_expected_exceptions(runner):
     fatal = runner.fatal_errors
     expected = (
-        api_exceptions.ResourceExhausted,
         api_exceptions.PermissionDenied,
         api_exceptions.Unauthenticated,
         api_exceptions.InvalidArgument,
@@ -60,6 +60,16 @@ def test_fatal_errors_contains_expected_exceptions(runner):
     assert all(isinstance(exc, type) for exc in fatal)
 
 
+def test_overload_errors_are_classified_errors(runner):
+    overload = set(runner.overload_errors)
+    assert overload == {
+        api_exceptions.DeadlineExceeded,
+        api_exceptions.ServiceUnavailable,
+        api_exceptions.ResourceExhausted,
+    }
+    assert overload <= set(runner.retryable_errors) | set(runner.fatal_errors)
+
+
 def test_properties_are_read_only(runner):
     # The properties should not allow reassignment
     with pytest.raises(AttributeError):
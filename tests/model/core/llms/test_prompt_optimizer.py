@@ -1,4 +1,5 @@
 # tests/model/core/utils/test_prompt_optimizer.py
+import numpy as np
 import pytest
 import pandas as pd
 import types
@@ -10,7 +11,18 @@ from unittest.mock import patch
 st.secrets = types.SimpleNamespace()
 st.secrets.is_local = True
 
-from model.core.llms.prompt_optimizer import PromptOptimizer
+import model.core.llms.prompt_optimizer as prompt_optimizer
+import model.core.llms.token_estimator as token_estimator
+from model.core.llms.prompt_optimizer import PromptOptimizer, TokenCountCache
+
+
+@pytest.fixture(autouse=True)
+def clear_token_caches():
+    token_estimator._load_encoding.cache_clear()
+    prompt_optimizer.token_counts.clear()
+    yield
+    token_estimator._load_encoding.cache_clear()
+    prompt_optimizer.token_counts.clear()
 
 
 @pytest.fixture
@@ -51,7 +63,7 @@ def test_format_row_formats_dataframe_row(df_example):
     assert "- B: bar" in row_text
 
 
-@patch("model.core.llms.prompt_optimizer.tiktoken.encoding_for_model")
+@patch("model.core.llms.token_estimator.tiktoken.encoding_for_model")
 def test_find_optimal_row_number_success(mock_encoding_for_model, fake_encoding, df_example, monkeypatch):
     # Always return fake encoding
     mock_encoding_for_model.return_value = fake_encoding
@@ -66,8 +78,8 @@ def test_find_optimal_row_number_success(mock_encoding_for_model, fake_encoding,
     assert 1 <= result <= 100
 
 
-@patch("model.core.llms.prompt_optimizer.tiktoken.encoding_for_model", side_effect=KeyError)
-@patch("model.core.llms.prompt_optimizer.tiktoken.get_encoding")
+@patch("model.core.llms.token_estimator.tiktoken.encoding_for_model", side_effect=KeyError)
+@patch("model.core.llms.token_estimator.tiktoken.get_encoding")
 def test_find_optimal_row_number_falls_back_on_keyerror(mock_get_encoding, mock_enc_for_model, df_example):
     mock_get_encoding.return_value = SimpleNamespace(encode=lambda s: [1, 2])
     opt = PromptOptimizer("missing")
@@ -79,7 +91,7 @@ def test_find_optimal_row_number_tokens_per_row_zero(df_example, monkeypatch):
     opt = PromptOptimizer("model")
     fake_enc = SimpleNamespace(encode=lambda s: [])
     monkeypatch.setattr(
-        "model.core.llms.prompt_optimizer.tiktoken.encoding_for_model",
+        "model.core.llms.token_estimator.tiktoken.encoding_for_model",
         lambda m: fake_enc
     )
     monkeypatch.setattr(
@@ -97,7 +109,7 @@ def test_find_optimal_row_number_handles_exception(monkeypatch, df_example):
     assert result == 10
 
 
-@patch("model.core.llms.prompt_optimizer.tiktoken.encoding_for_model")
+@patch("model.core.llms.token_estimator.tiktoken.encoding_for_model")
 def test_calculate_used_tokens_basic(mock_encoding_for_model, fake_encoding, df_example):
     mock_encoding_for_model.return_value = fake_encoding
     opt = PromptOptimizer("model")
@@ -106,8 +118,8 @@ def test_calculate_used_tokens_basic(mock_encoding_for_model, fake_encoding, df_
     assert result > 0
 
 
-@patch("model.core.llms.prompt_optimizer.tiktoken.encoding_for_model", side_effect=KeyError)
-@patch("model.core.llms.prompt_optimizer.tiktoken.get_encoding")
+@patch("model.core.llms.token_estimator.tiktoken.encoding_for_model", side_effect=KeyError)
+@patch("model.core.llms.token_estimator.tiktoken.get_encoding")
 def test_calculate_used_tokens_fallback(mock_get_encoding, mock_enc_for_model, df_example):
     mock_get_encoding.return_value = SimpleNamespace(encode=lambda s: [1])
     opt = PromptOptimizer("whatever")
@@ -116,13 +128,18 @@ def test_calculate_used_tokens_fallback(mock_get_encoding, mock_enc_for_model, d
 
 def test_calculate_used_tokens_handles_exception(df_example):
     opt = PromptOptimizer("model")
-    with patch(
-        "model.core.llms.prompt_optimizer.tiktoken.encoding_for_model",
-        side_effect=Exception("fail")
-    ):
+    failing = SimpleNamespace(encode=lambda s: 1 / 0)
+    with patch("model.core.llms.token_estimator.tiktoken.encoding_for_model", return_value=failing):
         assert opt.calculate_used_tokens("prompt", df_example, "resp", 1) == 0
 
 
+def test_unloadable_encoding_falls_back_to_character_estimate(df_example):
+    # Same loader and fallback as estimate_tokens, e.g. when the BPE file cannot be downloaded
+    opt = PromptOptimizer("model")
+    with patch("model.core.llms.token_estimator.tiktoken.encoding_for_model", side_effect=Exception("offline")):
+        assert opt.calculate_used_tokens("prompt", df_example, "resp", 1) > 0
+
+
 def test_calculate_max_chunks_with_quota_basic(monkeypatch, df_example):
     opt = PromptOptimizer("model")
     monkeypatch.setattr(opt, "calculate_used_tokens", lambda **kwargs: 5)
@@ -140,3 +157,132 @@ def test_calculate_max_chunks_with_quota_handles_exception(monkeypatch, df_examp
     opt = PromptOptimizer("model")
     monkeypatch.setattr(opt, "calculate_used_tokens", lambda **kwargs: 1/0)
     assert opt.calculate_max_chunks_with_quota("p", df_example, "r", 10, 100) == 0
+
+
+@patch("model.core.llms.token_estimator.tiktoken.encoding_for_model")
+def test_calculate_used_tokens_counts_header_once_per_chunk(mock_encoding_for_model, fake_encoding, df_example):
+    mock_encoding_for_model.return_value = fake_encoding
+    opt = PromptOptimizer("model")
+
+    one = opt.calculate_used_tokens("prompt", df_example, "resp", 1, row_format="table")
+    ten = opt.calculate_used_tokens("prompt", df_example, "resp", 10, row_format="table")
+    rows_ten = opt.calculate_used_tokens("prompt", df_example, "resp", 10)
+
+    # "| 1 | foo | bar |" plus the 4-character response per additional row
+    assert ten - one == 9 * (len("| 1 | foo | bar |") + 1 + len("resp"))
+    assert ten < rows_ten
+
+
+@patch("model.core.llms.token_estimator.tiktoken.encoding_for_model")
+def test_find_optimal_row_number_fits_more_rows_with_compact_format(mock_encoding_for_model, fake_encoding,
+                                                                      df_example, monkeypatch):
+    mock_encoding_for_model.return_value = fake_encoding
+    monkeypatch.setattr(
+        "model.core.llms.prompt_optimizer.SAFE_PROMPT_LIMITS",
+        {"default": 1000}
+    )
+    opt = PromptOptimizer("model")
+
+    rows = opt.find_optimal_row_number("Prompt", df_example, "resp", usage_ratio=1.0)
+    table = opt.find_optimal_row_number("Prompt", df_example, "resp", usage_ratio=1.0, row_format="table")
+    assert table > rows
+
+
+@patch("model.core.llms.token_estimator.tiktoken.encoding_for_model")
+def test_repeated_estimates_reuse_encoding_and_token_counts(mock_encoding_for_model, df_example):
+    encoded = []
+    mock_encoding_for_model.return_value = SimpleNamespace(encode=lambda s: encoded.append(s) or list(s))
+    opt = PromptOptimizer("model")
+
+    first = opt.calculate_used_tokens("prompt " * 1000, df_example, "resp", 5)
+    encodes = len(encoded)
+    assert opt.calculate_used_tokens("prompt " * 1000, df_example, "resp", 5) == first
+    assert PromptOptimizer("model").find_optimal_row_number("prompt " * 1000, df_example, "resp") >= 1
+
+    assert len(encoded) == encodes
+    assert mock_encoding_for_model.call_count == 1
+
+
+def test_token_count_cache_evicts_least_recently_used():
+    cache = TokenCountCache(maxsize=2)
+    encoding = SimpleNamespace(encode=lambda s: list(s))
+
+    cache.count("m", encoding, "aa")
+    cache.count("m", encoding, "bbb")
+    cache.count("m", encoding, "aa")
+    cache.count("m", encoding, "c")
+    assert (cache.hits, cache.misses) == (1, 3)
+
+    cache.count("m", encoding, "aa")
+    cache.count("m", encoding, "bbb")
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_sample_rows_takes_one_row_per_stratum():
+    df = pd.DataFrame({"A": range(10_000)})
+    sample = PromptOptimizer.sample_rows(df, sample_size=100)
+
+    assert len(sample) == 100
+    assert (sample["A"] // 100).tolist() == list(range(100))
+    assert len(PromptOptimizer.sample_rows(df.head(50), sample_size=100)) == 50
+
+
+@patch("model.core.llms.token_estimator.tiktoken.encoding_for_model")
+def test_estimate_row_token_stats_batches_sampled_rows(mock_encoding_for_model, fake_encoding):
+    batches = []
+    fake_encoding.encode_batch = lambda texts: batches.append(texts) or [list(t) for t in texts]
+    mock_encoding_for_model.return_value = fake_encoding
+    df = pd.DataFrame({"A": ["x" * 10] * 90 + ["x" * 100] * 10})
+
+    stats = PromptOptimizer("model").estimate_row_token_stats(df, "resp", row_format="csv")
+
+    assert len(batches) == 1 and len(batches[0]) == 100
+    # csv adds a line break and "1," per row, plus the 4-character response
+    assert stats.max == 3 + 100 + 4
+    assert stats.mean == pytest.approx(0.9 * 17 + 0.1 * 107)
+    assert stats.p95 == 107
+    assert stats.sample_size == 100
+
+
+@patch("model.core.llms.token_estimator.tiktoken.encoding_for_model")
+def test_recommend_chunk_size_accounts_for_heavy_tail(mock_encoding_for_model, fake_encoding, monkeypatch):
+    mock_encoding_for_model.return_value = fake_encoding
+    monkeypatch.setattr(
+        "model.core.llms.prompt_optimizer.SAFE_PROMPT_LIMITS",
+        {"default": 5000}
+    )
+    rng = np.random.default_rng(1)
+    lengths = np.where(rng.random(5000) < 0.05, 400, 20)
+    df = pd.DataFrame({"A": ["x" * n for n in lengths]})
+    opt = PromptOptimizer("model")
+
+    first_row_only = opt.find_optimal_row_number("Prompt", df.head(1), "r", usage_ratio=1.0)
+    loose = opt.recommend_chunk_size("Prompt", df, "r", usage_ratio=1.0, overflow_probability=0.4)
+    strict = opt.recommend_chunk_size("Prompt", df, "r", usage_ratio=1.0, overflow_probability=0.001)
+
+    assert strict.chunk_size < loose.chunk_size < first_row_only
+    # "Row 1:\n- A: " around the longest cell, plus the 1-character response
+    assert strict.row_stats.max == len("Row 1:\n- A: ") + 400 + 1
+    assert strict.expected_tokens(strict.chunk_size) <= 5000
+
+
+def test_recommend_chunk_size_rejects_invalid_probability():
+    with pytest.raises(ValueError):
+        PromptOptimizer("model").recommend_chunk_size("p", pd.DataFrame({"A": [1]}), "r", overflow_probability=1.5)
+
+
+@patch("model.core.llms.token_estimator.tiktoken.encoding_for_model")
+def test_row_token_counts_and_available_row_tokens(mock_encoding_for_model, fake_encoding, monkeypatch):
+    mock_encoding_for_model.return_value = fake_encoding
+    monkeypatch.setattr(
+        "model.core.llms.prompt_optimizer.SAFE_PROMPT_LIMITS",
+        {"default": 1000}
+    )
+    df = pd.DataFrame({"A": ["ab", "abcdef"], "B": ["c", None]})
+    opt = PromptOptimizer("model")
+
+    counts = opt.row_token_counts(df, "ok", row_format="csv")
+    # "\n1,ab,c" and "\n2,abcdef," plus the 2-character response
+    assert counts.tolist() == [7 + 2, 10 + 2]
+    # "row,A,B" header plus the 6-character prompt
+    assert opt.available_row_tokens("Prompt", df, usage_ratio=1.0, row_format="csv") == 1000 - 6 - 7
@@ -0,0 +1,106 @@
+import asyncio
+import types
+from unittest.mock import AsyncMock, MagicMock
+
+import pandas as pd
+import pytest
+import streamlit as st
+
+# Mock Streamlit secrets
+st.secrets = types.SimpleNamespace()
+st.secrets.is_local = True
+
+import model.core.llms.rate_limiter as rate_limiter_module
+from model.core.llms.rate_limiter import RateLimiter, TokenBucket, get_rate_limiter
+from model.core.llms.resilient_llm_runner import ResilientLLMRunner
+from utils.token_usage import TokenUsage
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter_module.time, "monotonic", clock.monotonic)
+    return clock
+
+
+def test_token_bucket_allows_a_minute_of_burst_then_paces(clock):
+    bucket = TokenBucket(per_minute=60)
+    assert all(bucket.reserve(1, now=0.0) == 0.0 for _ in range(60))
+    # Each further request waits one more second behind the previous one
+    assert bucket.reserve(1, now=0.0) == pytest.approx(1.0)
+    assert bucket.reserve(1, now=0.0) == pytest.approx(2.0)
+    assert bucket.reserve(1, now=2.0) == pytest.approx(1.0)
+
+
+def test_rate_limiter_waits_for_the_tighter_budget(clock):
+    limiter = RateLimiter(requests_per_minute=100, tokens_per_minute=1000)
+    assert limiter.reserve(900) == 0.0
+    # 400 tokens short of the budget at 1000 tokens per minute
+    assert limiter.reserve(500) == pytest.approx(24.0)
+
+
+def test_settle_charges_actual_usage(clock):
+    limiter = RateLimiter(tokens_per_minute=600)
+    limiter.reserve(100)
+    limiter.settle(100, 700)
+    # 100 tokens in debt at 10 tokens per second
+    assert limiter.reserve(0) == pytest.approx(10.0)
+
+
+def test_disabled_limits_never_wait(clock):
+    limiter = RateLimiter()
+    assert not limiter.enabled
+    assert limiter.reserve(10 ** 9) == 0.0
+
+
+def test_get_rate_limiter_shares_one_limiter_per_model(monkeypatch):
+    monkeypatch.setattr(rate_limiter_module, "_limiters", {})
+    first = get_rate_limiter("model-a", 10, 0)
+    again = get_rate_limiter("model-a", 20, 500)
+
+    assert first is again
+    assert first.requests.per_minute == 20 and first.tokens.per_minute == 500
+    assert get_rate_limiter("model-b", 10, 0) is not first
+
+
+class DummyRunner(ResilientLLMRunner):
+    retryable_errors = (ConnectionError,)
+    fatal_errors = (PermissionError,)
+
+
+def test_runner_acquires_before_and_settles_after_each_call(monkeypatch):
+    client = MagicMock()
+    client.model_name = "model"
+    client._format_input.return_value = "x" * 40
+    client.call.return_value = ("1: ok", TokenUsage(10, 5, 15))
+    limiter = MagicMock(spec=RateLimiter)
+    monkeypatch.setattr("model.core.llms.resilient_llm_runner.estimate_tokens", lambda text, model: 10)
+
+    runner = DummyRunner(client, max_attempts=1, rate_limiter=limiter)
+    assert runner.run("prompt", pd.DataFrame({"a": [1]})) == ("1: ok", TokenUsage(10, 5, 15))
+
+    limiter.acquire.assert_called_once_with(10)
+    limiter.settle.assert_called_once_with(10, 15)
+
+
+def test_runner_awaits_rate_limiter_in_async_calls(monkeypatch):
+    client = MagicMock()
+    client.model_name = "model"
+    client.acall = AsyncMock(return_value=("1: ok", TokenUsage(10, 5, 15)))
+    limiter = MagicMock(spec=RateLimiter)
+    limiter.aacquire = AsyncMock()
+    monkeypatch.setattr("model.core.llms.resilient_llm_runner.estimate_tokens", lambda text, model: 7)
+
+    runner = DummyRunner(client, max_attempts=1, rate_limiter=limiter)
+    asyncio.run(runner.arun("prompt"))
+
+    limiter.aacquire.assert_awaited_once_with(7)
+    limiter.settle.assert_called_once_with(7, 15)
@@ -0,0 +1,214 @@
+import asyncio
+import threading
+import time
+import types
+from unittest.mock import MagicMock
+
+import pytest
+import streamlit as st
+
+# Mock Streamlit secrets
+st.secrets = types.SimpleNamespace()
+st.secrets.is_local = True
+
+from model.core.llms.request_hedger import LatencyTracker, RequestHedger
+from model.core.llms import resilient_llm_runner
+from model.core.llms.resilient_llm_runner import ResilientLLMRunner
+from utils.token_usage import TokenUsage
+
+
+class Outage(Exception):
+    pass
+
+
+class DummyRunner(ResilientLLMRunner):
+    @property
+    def retryable_errors(self):
+        return (Outage,)
+
+    @property
+    def fatal_errors(self):
+        return ()
+
+
+def warmed_hedger(max_extra_tokens=1_000, latency=0.01, samples=3):
+    hedger = RequestHedger(max_extra_tokens=max_extra_tokens, min_samples=samples)
+    for _ in range(samples):
+        hedger.latencies.record(latency)
+    return hedger
+
+
+class SlowFirstClient:
+    """The first request hangs for ``first_delay`` seconds; later ones answer at once."""
+
+    model_name = "gemini-1.5-flash"
+
+    def __init__(self, first_delay=1.0, first_error=None):
+        self.first_delay = first_delay
+        self.first_error = first_error
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _next(self):
+        with self._lock:
+            self.calls += 1
+            return self.calls
+
+    def call(self, prompt, df=None):
+        n = self._next()
+        if n == 1:
+            time.sleep(self.first_delay)
+            if self.first_error:
+                raise self.first_error
+            return "primary", TokenUsage(10, 5, 15)
+        return "hedge", TokenUsage(10, 5, 15)
+
+    async def acall(self, prompt, df=None):
+        n = self._next()
+        if n == 1:
+            await asyncio.sleep(self.first_delay)
+            return "primary", TokenUsage(10, 5, 15)
+        return "hedge", TokenUsage(10, 5, 15)
+
+
+def test_latency_tracker_percentile_over_window():
+    tracker = LatencyTracker(window=3)
+    assert tracker.percentile(0.5) is None
+    for seconds in (100, 1, 2, 3):
+        tracker.record(seconds)
+    assert len(tracker) == 3
+    assert tracker.percentile(0.5) == 2
+    assert tracker.percentile(1.0) == 3
+
+
+def test_hedge_delay_waits_for_enough_samples():
+    hedger = RequestHedger(max_extra_tokens=100, percentile=0.5, min_samples=2)
+    hedger.latencies.record(1.0)
+    assert hedger.hedge_delay() is None
+    hedger.latencies.record(3.0)
+    assert hedger.hedge_delay() == 2.0
+
+
+def test_invalid_percentile_is_rejected():
+    with pytest.raises(ValueError):
+        RequestHedger(max_extra_tokens=100, percentile=1.0)
+
+
+def test_try_reserve_respects_token_cap():
+    hedger = RequestHedger(max_extra_tokens=100)
+    assert hedger.try_reserve(60)
+    assert not hedger.try_reserve(60)
+    assert hedger.hedges == 1
+    hedger.record_outcome(hedge_won=True, output_tokens=30)
+    assert hedger.extra_tokens == 90
+    assert hedger.hedge_wins == 1
+
+
+def test_run_without_history_sends_a_single_request():
+    client = MagicMock()
+    client.call.return_value = ("ok", TokenUsage(1, 1, 2))
+    hedger = RequestHedger(max_extra_tokens=1_000)
+    runner = DummyRunner(client, hedger=hedger)
+
+    assert runner.run("prompt") == ("ok", TokenUsage(1, 1, 2))
+    assert client.call.call_count == 1
+    assert len(hedger.latencies) == 1
+    assert hedger.hedges == 0
+
+
+def test_run_takes_hedge_when_primary_is_slow():
+    client = SlowFirstClient(first_delay=1.0)
+    hedger = warmed_hedger()
+    runner = DummyRunner(client, hedger=hedger)
+
+    text, usage = runner.run("prompt")
+
+    assert text == "hedge"
+    assert client.calls == 2
+    assert (hedger.hedges, hedger.hedge_wins) == (1, 1)
+    # The duplicate is charged to the returned usage, so it counts against the budget
+    assert usage.total_tokens > 15 and usage.estimated
+    assert hedger.extra_tokens == usage.total_tokens - 15
+
+
+class SlowLimiter:
+    """Holds every request for ``wait`` seconds before admitting it."""
+
+    def __init__(self, wait):
+        self.wait = wait
+
+    def acquire(self, estimated_tokens):
+        time.sleep(self.wait)
+
+    async def aacquire(self, estimated_tokens):
+        await asyncio.sleep(self.wait)
+
+    def settle(self, estimated_tokens, actual_tokens):
+        pass
+
+
+def test_limiter_wait_neither_counts_as_latency_nor_triggers_a_hedge():
+    client = MagicMock(model_name="gemini-1.5-flash")
+    client.call.return_value = ("ok", TokenUsage(1, 1, 2))
+    hedger = warmed_hedger(latency=0.01)
+    runner = DummyRunner(client, hedger=hedger, rate_limiter=SlowLimiter(0.3))
+
+    assert runner.run("prompt")[0] == "ok"
+    assert client.call.call_count == 1
+    assert hedger.hedges == 0
+    assert hedger.latencies.percentile(1.0) < 0.3
+
+
+@pytest.mark.asyncio
+async def test_async_limiter_wait_does_not_trigger_a_hedge():
+    client = SlowFirstClient(first_delay=0.0)
+    hedger = warmed_hedger(latency=0.01)
+    runner = DummyRunner(client, hedger=hedger, rate_limiter=SlowLimiter(0.3))
+
+    assert (await runner.arun("prompt"))[0] == "primary"
+    assert client.calls == 1
+    assert hedger.latencies.percentile(1.0) < 0.3
+
+
+def test_runners_share_one_hedge_pool():
+    threads_before = threading.active_count()
+    for _ in range(3):
+        runner = DummyRunner(SlowFirstClient(first_delay=0.2), hedger=warmed_hedger())
+        assert runner.run("prompt")[0] == "hedge"
+    # A fresh runner per run must not leave a fresh set of idle pool threads behind
+    assert resilient_llm_runner._hedge_pool() is resilient_llm_runner._hedge_pool()
+    assert threading.active_count() - threads_before <= 4
+
+
+def test_run_does_not_hedge_beyond_token_cap():
+    client = SlowFirstClient(first_delay=0.1)
+    hedger = warmed_hedger(max_extra_tokens=0)
+    runner = DummyRunner(client, hedger=hedger)
+
+    assert runner.run("prompt") == ("primary", TokenUsage(10, 5, 15))
+    assert client.calls == 1
+    assert hedger.hedges == 0
+
+
+def test_run_falls_back_to_hedge_when_primary_fails():
+    client = SlowFirstClient(first_delay=0.1, first_error=ValueError("boom"))
+    hedger = warmed_hedger()
+    runner = DummyRunner(client, hedger=hedger)
+
+    text, _ = runner.run("prompt")
+    assert text == "hedge"
+
+
+@pytest.mark.asyncio
+async def test_arun_takes_hedge_and_cancels_primary():
+    client = SlowFirstClient(first_delay=5.0)
+    hedger = warmed_hedger()
+    runner = DummyRunner(client, hedger=hedger)
+
+    started = time.monotonic()
+    text, usage = await runner.arun("prompt")
+
+    assert text == "hedge"
+    assert time.monotonic() - started < 1.0
+    assert hedger.hedge_wins == 1
+    assert usage.estimated
@@ -1,14 +1,19 @@
 # tests/model/core/runners/test_resilient_llm_runner.py
+import pandas as pd
 import pytest
 import types
 import streamlit as st
-from unittest.mock import MagicMock, call
+from unittest.mock import MagicMock, AsyncMock, call
 
 # Mock Streamlit secrets
 st.secrets = types.SimpleNamespace()
 st.secrets.is_local = True
 
 from model.core.llms.resilient_llm_runner import ResilientLLMRunner
+from model.io.response_cache import ResponseCache
+from utils.exceptions import IncompleteResponseError, RetriesExhaustedError
+from utils.retry_stats import RetryStats
+from utils.token_usage import TokenUsage
 
 
 class MyRetryableError(Exception):
@@ -28,6 +33,10 @@ class DummyRunner(ResilientLLMRunner):
     def fatal_errors(self):
         return (MyFatalError,)
 
+    @property
+    def overload_errors(self):
+        return (MyRetryableError,)
+
 
 @pytest.fixture
 def dummy_client():
@@ -65,6 +74,18 @@ def test_run_retries_on_retryable_error(runner, dummy_client):
     assert dummy_client.call.call_count == 2
 
 
+def test_run_raises_when_retries_are_exhausted(runner, dummy_client, monkeypatch):
+    monkeypatch.setattr("time.sleep", lambda seconds: None)
+    dummy_client.call.side_effect = MyRetryableError("still down")
+    stats = RetryStats()
+
+    with pytest.raises(RetriesExhaustedError) as exc_info:
+        runner.run("prompt", retry_stats=stats)
+    assert isinstance(exc_info.value.last_error, MyRetryableError)
+    assert dummy_client.call.call_count == 2
+    assert stats.attempts == 2
+
+
 def test_run_raises_immediately_on_fatal_error(runner, dummy_client):
     dummy_client.call.side_effect = MyFatalError("bad request")
     with pytest.raises(MyFatalError):
@@ -79,3 +100,218 @@ def test_run_raises_immediately_on_unexpected_error(runner, dummy_client):
         runner.run("prompt")
     # Unexpected errors also stop retries
     assert dummy_client.call.call_count == 1
+
+
+def test_run_reports_every_overloaded_attempt(runner, dummy_client):
+    overloads = []
+    runner.overload_listener = overloads.append
+    error = MyRetryableError("busy")
+    dummy_client.call.side_effect = [error, ("done", 1)]
+
+    assert runner.run("prompt", None) == ("done", 1)
+    assert overloads == [error]
+
+
+def test_run_does_not_report_other_errors_as_overload(runner, dummy_client):
+    overloads = []
+    runner.overload_listener = overloads.append
+    dummy_client.call.side_effect = MyFatalError("bad request")
+
+    with pytest.raises(MyFatalError):
+        runner.run("prompt")
+    assert overloads == []
+
+
+def test_run_reports_latency_of_successful_requests_only(runner, dummy_client):
+    latencies = []
+    runner.latency_listener = latencies.append
+    dummy_client.call.side_effect = [MyRetryableError("busy"), ("done", 1)]
+
+    assert runner.run("prompt", None) == ("done", 1)
+    assert len(latencies) == 1 and latencies[0] >= 0
+
+
+@pytest.mark.asyncio
+async def test_arun_returns_value_on_success(runner, dummy_client):
+    dummy_client.acall = AsyncMock(return_value=("ok", 42))
+    result = await runner.arun("prompt", None)
+    assert result == ("ok", 42)
+    dummy_client.acall.assert_awaited_once_with("prompt", None)
+
+
+@pytest.mark.asyncio
+async def test_arun_retries_on_retryable_error(runner, dummy_client, monkeypatch):
+    monkeypatch.setattr("asyncio.sleep", AsyncMock())
+    dummy_client.acall = AsyncMock(side_effect=[MyRetryableError("temporary"), ("done", 1)])
+    overloads = []
+    runner.overload_listener = overloads.append
+    result = await runner.arun("prompt", None)
+    assert result == ("done", 1)
+    assert dummy_client.acall.await_count == 2
+    assert len(overloads) == 1
+
+
+@pytest.mark.asyncio
+async def test_arun_raises_immediately_on_fatal_error(runner, dummy_client):
+    dummy_client.acall = AsyncMock(side_effect=MyFatalError("bad request"))
+    with pytest.raises(MyFatalError):
+        await runner.arun("prompt")
+    assert dummy_client.acall.await_count == 1
+
+
+@pytest.fixture
+def cached_runner(dummy_client, tmp_path):
+    dummy_client.model_name = "model"
+    dummy_client.generation_config = {"temperature": 0.2}
+    dummy_client.row_format = "rows"
+    cache = ResponseCache(tmp_path / "cache.db")
+    yield DummyRunner(dummy_client, max_attempts=2, response_cache=cache)
+    cache.close()
+
+
+def test_run_sends_only_rows_missing_from_cache(cached_runner, dummy_client):
+    dummy_client.call.return_value = ("1: A\n2: B", TokenUsage(10, 2, 12))
+    cached_runner.run("prompt", pd.DataFrame({"text": ["a", "b"], "source_id": ["s1", "s2"]}))
+
+    dummy_client.call.reset_mock()
+    dummy_client.call.return_value = ("1: C", TokenUsage(5, 1, 6))
+    df = pd.DataFrame({"text": ["b", "c", "a"], "source_id": ["x1", "x2", "x3"]})
+    text, usage = cached_runner.run("prompt", df)
+
+    sent = dummy_client.call.call_args[0][1]
+    assert sent["text"].tolist() == ["c"]
+    assert sent.index.tolist() == [0]
+    assert text == "1: B\n2: C\n3: A"
+    assert usage.total_tokens == 6
+    assert (cached_runner.response_cache.hits, cached_runner.response_cache.misses) == (2, 3)
+
+
+def test_run_serves_fully_cached_chunk_without_calling_client(cached_runner, dummy_client):
+    df = pd.DataFrame({"text": ["a"]})
+    dummy_client.call.return_value = ("1: A", TokenUsage(3, 1, 4))
+    cached_runner.run("prompt", df)
+
+    text, usage = cached_runner.run("prompt", df)
+    assert text == "1: A"
+    assert usage.total_tokens == 0
+    assert dummy_client.call.call_count == 1
+
+    # A different prompt is a different cache entry
+    cached_runner.run("other prompt", df)
+    assert dummy_client.call.call_count == 2
+
+
+def test_run_raises_when_rows_stay_unanswered(cached_runner, dummy_client):
+    dummy_client.call.return_value = ("no numbered lines", TokenUsage(3, 1, 4))
+    with pytest.raises(IncompleteResponseError) as exc_info:
+        cached_runner.run("prompt", pd.DataFrame({"text": ["a"]}))
+
+    # The first request and one re-request per repair level, all of them charged
+    assert dummy_client.call.call_count == 1 + cached_runner.repair_depth
+    assert exc_info.value.missing_rows == [0]
+    assert exc_info.value.usage.total_tokens == 4 * dummy_client.call.call_count
+    assert len(cached_runner.response_cache) == 0
+
+
+def test_run_rerequests_only_missing_rows(runner, dummy_client):
+    df = pd.DataFrame({"text": ["a", "b", "c"]})
+    dummy_client.call.side_effect = [
+        ("1: A\n3: C", TokenUsage(6, 2, 8)),
+        ("1: B", TokenUsage(2, 1, 3)),
+    ]
+
+    text, usage = runner.run("prompt", df)
+
+    assert text == "1: A\n2: B\n3: C"
+    assert usage == TokenUsage(8, 3, 11)
+    resent = dummy_client.call.call_args_list[1][0][1]
+    assert resent["text"].tolist() == ["b"]
+    assert resent.index.tolist() == [0]
+
+
+def test_run_bisects_chunk_when_no_row_is_answered(runner, dummy_client):
+    df = pd.DataFrame({"text": ["a", "b", "c", "d"]})
+    dummy_client.call.side_effect = [
+        ("Sorry, I cannot help with that.", TokenUsage(8, 2, 10)),
+        ("1: A\n2: B", TokenUsage(4, 2, 6)),
+        ("1: C\n2: D\n3: extra line", TokenUsage(4, 2, 6)),
+    ]
+
+    text, usage = runner.run("prompt", df)
+
+    assert text == "1: A\n2: B\n3: C\n4: D"
+    assert usage.total_tokens == 22
+    halves = [c[0][1]["text"].tolist() for c in dummy_client.call.call_args_list[1:]]
+    assert halves == [["a", "b"], ["c", "d"]]
+
+
+def test_run_reports_rows_missing_after_repair(runner, dummy_client):
+    runner.repair_depth = 1
+    df = pd.DataFrame({"text": ["a", "b", "c"]})
+    dummy_client.call.side_effect = [
+        ("1: A", TokenUsage(6, 2, 8)),
+        ("2: C", TokenUsage(4, 1, 5)),
+    ]
+
+    with pytest.raises(IncompleteResponseError) as exc_info:
+        runner.run("prompt", df)
+
+    assert exc_info.value.missing_rows == [1]
+    assert exc_info.value.usage.total_tokens == 13
+
+
+def test_run_accepts_row_prefixed_response_lines(runner, dummy_client):
+    df = pd.DataFrame({"text": [f"t{i}" for i in range(8)]})
+    dummy_client.call.return_value = (
+        "\n".join(f"Row {i}: ok{i}" for i in range(1, 9)), TokenUsage(16, 8, 24)
+    )
+
+    text, _ = runner.run("prompt", df)
+
+    assert text == "\n".join(f"{i}: ok{i}" for i in range(1, 9))
+    assert dummy_client.call.call_count == 1
+
+
+def test_run_caps_repair_calls_per_chunk(dummy_client):
+    runner = DummyRunner(dummy_client, repair_depth=3, max_repair_calls=2)
+    df = pd.DataFrame({"text": [f"t{i}" for i in range(8)]})
+    dummy_client.call.return_value = ("no numbered lines", TokenUsage(3, 1, 4))
+
+    with pytest.raises(IncompleteResponseError) as exc_info:
+        runner.run("prompt", df)
+
+    assert dummy_client.call.call_count == 3
+    assert exc_info.value.missing_rows == list(range(8))
+    assert exc_info.value.usage.total_tokens == 12
+
+
+def test_run_without_repair_returns_response_untouched(dummy_client):
+    runner = DummyRunner(dummy_client, repair_depth=0)
+    dummy_client.call.return_value = ("no numbered lines", TokenUsage(3, 1, 4))
+    text, _ = runner.run("prompt", pd.DataFrame({"text": ["a"]}))
+    assert text == "no numbered lines"
+    assert dummy_client.call.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_arun_rerequests_only_missing_rows(runner, dummy_client):
+    df = pd.DataFrame({"text": ["a", "b"]})
+    dummy_client.acall = AsyncMock(side_effect=[
+        ("2: B", TokenUsage(4, 1, 5)),
+        ("1: A", TokenUsage(2, 1, 3)),
+    ])
+
+    text, usage = await runner.arun("prompt", df)
+
+    assert text == "1: A\n2: B"
+    assert usage.total_tokens == 8
+
+
+@pytest.mark.asyncio
+async def test_arun_uses_response_cache(cached_runner, dummy_client):
+    dummy_client.acall = AsyncMock(return_value=("1: A", TokenUsage(3, 1, 4)))
+    df = pd.DataFrame({"text": ["a"]})
+    await cached_runner.arun("prompt", df)
+    text, _ = await cached_runner.arun("prompt", df)
+    assert text == "1: A"
+    assert dummy_client.acall.await_count == 1
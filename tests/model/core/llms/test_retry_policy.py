@@ -0,0 +1,155 @@
+import random
+import types
+import pytest
+import streamlit as st
+from unittest.mock import AsyncMock
+
+from google.api_core import exceptions as api_exceptions
+
+# Mock Streamlit secrets
+st.secrets = types.SimpleNamespace()
+st.secrets.is_local = True
+
+from model.core.llms import retry_policy as retry_policy_module
+from model.core.llms.retry_policy import RetryPolicy, retry_after_seconds
+from utils.cancellation_token import CancellationToken
+from utils.exceptions import OperationCancelledError, RetriesExhaustedError
+from utils.retry_stats import RetryStats
+
+
+class Transient(Exception):
+    pass
+
+
+class Quota(Exception):
+    pass
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Records sleeps instead of waiting, advancing a fake monotonic clock."""
+    clock = {"now": 0.0}
+    recorded = []
+
+    def sleep(seconds):
+        recorded.append(seconds)
+        clock["now"] += seconds
+
+    monkeypatch.setattr(retry_policy_module.time, "sleep", sleep)
+    monkeypatch.setattr(retry_policy_module.time, "monotonic", lambda: clock["now"])
+    return recorded
+
+
+def failing(errors, result="ok"):
+    pending = list(errors)
+
+    def func():
+        if pending:
+            raise pending.pop(0)
+        return result
+
+    return func
+
+
+def test_retry_after_from_header():
+    error = Exception("busy")
+    error.response = types.SimpleNamespace(headers={"Retry-After": "7"})
+    assert retry_after_seconds(error) == 7.0
+
+
+def test_retry_after_from_retry_info_details():
+    delay = types.SimpleNamespace(seconds=3, nanos=500_000_000)
+    error = api_exceptions.ResourceExhausted("quota", details=[types.SimpleNamespace(retry_delay=delay)])
+    assert retry_after_seconds(error) == 3.5
+
+
+def test_retry_after_from_message_and_missing():
+    assert retry_after_seconds(Exception("Quota exceeded. Please retry in 12.5s.")) == 12.5
+    assert retry_after_seconds(Exception("boom")) is None
+
+
+def test_decorrelated_jitter_stays_within_bounds():
+    policy = RetryPolicy(base_delay=1, max_delay=10, rng=random.Random(0))
+    previous = None
+    for _ in range(50):
+        delay = policy.next_delay(previous)
+        upper = 1 if previous is None else max(1, previous * 3)
+        assert 1 <= delay <= min(10, upper)
+        previous = delay
+
+
+def test_retry_hint_is_a_lower_bound_beyond_the_cap():
+    policy = RetryPolicy(base_delay=1, max_delay=10)
+    assert policy.next_delay(None, Exception("retry in 30s")) == 30
+
+
+def test_call_retries_and_records_stats(sleeps):
+    stats = RetryStats()
+    policy = RetryPolicy(max_attempts=3, base_delay=1, max_delay=5)
+    assert policy.call(failing([Transient(), Transient()]), (Transient,), stats=stats) == "ok"
+    assert stats.attempts == 3
+    assert stats.retries == 2
+    assert stats.sleep_seconds == pytest.approx(sum(sleeps))
+
+
+def test_call_gives_up_after_max_attempts(sleeps):
+    stats = RetryStats()
+    policy = RetryPolicy(max_attempts=2, base_delay=1)
+    with pytest.raises(RetriesExhaustedError) as exc_info:
+        policy.call(failing([Transient("a"), Transient("b"), Transient("c")]), (Transient,), stats=stats)
+    assert str(exc_info.value.last_error) == "b"
+    assert exc_info.value.attempts == 2
+    assert len(sleeps) == 1
+
+
+def test_quota_errors_are_retried_until_the_deadline(sleeps):
+    policy = RetryPolicy(max_attempts=2, base_delay=10, max_delay=10, quota_deadline=45)
+    # Four waits of 10s fit in the deadline, the fifth would not
+    assert policy.call(failing([Quota()] * 4), (Transient, Quota), (Quota,)) == "ok"
+    assert sleeps == [10, 10, 10, 10]
+
+    sleeps.clear()
+    with pytest.raises(RetriesExhaustedError):
+        policy.call(failing([Quota()] * 10), (Transient, Quota), (Quota,))
+    assert len(sleeps) == 4
+
+
+def test_non_retryable_errors_propagate_immediately(sleeps):
+    policy = RetryPolicy()
+    with pytest.raises(ValueError):
+        policy.call(failing([ValueError()]), (Transient,))
+    assert sleeps == []
+
+
+def test_cancelled_token_skips_the_call():
+    token = CancellationToken()
+    token.cancel()
+    func = failing([])
+    with pytest.raises(OperationCancelledError):
+        RetryPolicy().call(func, (Transient,), cancel_token=token)
+
+
+def test_cancel_during_backoff_stops_retrying():
+    token = CancellationToken()
+    calls = []
+
+    def func():
+        calls.append(1)
+        token.cancel()
+        raise Transient()
+
+    with pytest.raises(OperationCancelledError):
+        RetryPolicy(max_attempts=5, base_delay=30, max_delay=30).call(func, (Transient,), cancel_token=token)
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_acall_retries_with_awaited_sleep(monkeypatch):
+    sleep = AsyncMock()
+    monkeypatch.setattr(retry_policy_module.asyncio, "sleep", sleep)
+    stats = RetryStats()
+    func = AsyncMock(side_effect=[Transient(), "ok"])
+
+    assert await RetryPolicy(base_delay=1).acall(func, (Transient,), stats=stats) == "ok"
+    assert stats.attempts == 2
+    sleep.assert_awaited_once()
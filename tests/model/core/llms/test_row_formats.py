@@ -0,0 +1,108 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+
+from model.core.llms.row_formats import (
+    ROW_FORMATTERS,
+    ROW_FORMAT_LABELS,
+    format_columns,
+    format_csv,
+    format_jsonl,
+    format_jsonl_short,
+    format_markdown_table,
+    format_rows,
+    format_table,
+    format_tsv,
+)
+
+
+def legacy_format_rows(df: pd.DataFrame) -> str:
+    """Row formatting as originally implemented with iterrows."""
+    blocks = []
+    df = df.fillna("")
+    for idx, row in df.iterrows():
+        lines = [f"Row {idx + 1}:"]
+        for col in df.columns:
+            lines.append(f"- {col}: {row[col]}")
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+
+@pytest.mark.parametrize("df", [
+    pd.DataFrame({"name": ["Alice", None, "Carol"], "age": [30, 25, 41], "score": [1.5, np.nan, 0.1 + 0.2]}),
+    pd.DataFrame({"a": [1, 2], "b": [0.5, 2.25]}),
+    pd.DataFrame({"flag": [True, False], "count": [1, 2]}),
+    pd.DataFrame({"x": np.array([0.1, 1e16], dtype="float32"), "y": np.array([1.0, 2.0], dtype="float32")}),
+    pd.DataFrame({"when": pd.to_datetime(["2024-01-01 00:00", "2024-06-30 12:30"])}),
+    pd.DataFrame({"when": pd.to_datetime(["2024-01-01", None]), "label": ["a", "b"]}),
+    pd.DataFrame({"v": [1, 2, 3]}, index=[10, 11, 12]),
+    pd.DataFrame({"v": pd.array([1, 2], dtype="Int64"), "s": ["x", "y"]}),
+    pd.DataFrame({"only": pd.Series([], dtype=object)}),
+])
+def test_format_rows_matches_iterrows_output(df):
+    assert format_rows(df) == legacy_format_rows(df)
+
+
+@pytest.fixture
+def sample_df():
+    return pd.DataFrame({"name": ["Alice", "Bob, Jr."], "age": [30, None]})
+
+
+def test_format_csv_numbers_rows_and_writes_header_once(sample_df):
+    assert format_csv(sample_df) == 'row,name,age\n1,Alice,30.0\n2,"Bob, Jr.",'
+
+
+def test_format_tsv(sample_df):
+    assert format_tsv(sample_df) == "row\tname\tage\n1\tAlice\t30.0\n2\tBob, Jr.\t"
+
+
+def test_format_jsonl(sample_df):
+    lines = format_jsonl(sample_df).splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"row": 1, "name": "Alice", "age": 30.0},
+        {"row": 2, "name": "Bob, Jr.", "age": None},
+    ]
+    assert format_jsonl(sample_df.iloc[0:0]) == ""
+    assert format_jsonl(pd.DataFrame(index=[0])) == '{"row":1}'
+
+
+def test_format_markdown_table_writes_header_once(sample_df):
+    table = pd.DataFrame({"name": ["A|B", "line\nbreak"], "age": [30, None]})
+    assert format_markdown_table(table) == (
+        "| row | name | age |\n"
+        "| --- | --- | --- |\n"
+        "| 1 | A\\|B | 30.0 |\n"
+        "| 2 | line break |  |"
+    )
+
+
+def test_format_columns(sample_df):
+    assert format_columns(sample_df) == "row: 1 | 2\nname: Alice | Bob, Jr.\nage: 30.0 | "
+    assert format_columns(sample_df.iloc[0:0]) == ""
+
+
+def test_format_jsonl_short_abbreviates_keys(sample_df):
+    legend, *lines = format_jsonl_short(sample_df).splitlines()
+    assert legend == "Keys: c1=name, c2=age"
+    assert [json.loads(line) for line in lines] == [
+        {"r": 1, "c1": "Alice", "c2": 30.0},
+        {"r": 2, "c1": "Bob, Jr.", "c2": None},
+    ]
+
+
+def test_every_format_has_a_label():
+    assert set(ROW_FORMAT_LABELS) == set(ROW_FORMATTERS)
+
+
+def test_compact_layouts_do_not_modify_input(sample_df):
+    original = sample_df.copy()
+    for formatter in ROW_FORMATTERS.values():
+        formatter(sample_df)
+    pd.testing.assert_frame_equal(sample_df, original)
+
+
+def test_format_table_rejects_unknown_format(sample_df):
+    assert format_table(sample_df) == format_rows(sample_df)
+    with pytest.raises(ValueError, match="Unknown row format"):
+        format_table(sample_df, "yaml")
@@ -0,0 +1,48 @@
+import types
+from types import SimpleNamespace
+
+import pytest
+import streamlit as st
+
+# Mock Streamlit secrets
+st.secrets = types.SimpleNamespace()
+st.secrets.is_local = True
+
+import model.core.llms.token_estimator as token_estimator
+from model.core.llms.token_estimator import estimate_tokens
+
+
+@pytest.fixture(autouse=True)
+def clear_encoding_cache():
+    token_estimator._load_encoding.cache_clear()
+    yield
+    token_estimator._load_encoding.cache_clear()
+
+
+def test_estimate_tokens_uses_tiktoken_encoding(monkeypatch):
+    fake_encoding = SimpleNamespace(encode=lambda text: text.split())
+    monkeypatch.setattr(token_estimator.tiktoken, "encoding_for_model", lambda name: fake_encoding)
+    assert estimate_tokens("one two three", "gpt-4") == 3
+
+
+def test_estimate_tokens_falls_back_to_base_encoding(monkeypatch):
+    fake_encoding = SimpleNamespace(encode=lambda text: list(text))
+
+    def unknown_model(name):
+        raise KeyError(name)
+
+    monkeypatch.setattr(token_estimator.tiktoken, "encoding_for_model", unknown_model)
+    monkeypatch.setattr(token_estimator.tiktoken, "get_encoding", lambda name: fake_encoding)
+    assert estimate_tokens("abcd", "gemini-2.0-flash") == 4
+
+
+def test_estimate_tokens_uses_character_heuristic_offline(monkeypatch):
+    def offline(name):
+        raise ConnectionError("no network")
+
+    monkeypatch.setattr(token_estimator.tiktoken, "encoding_for_model", offline)
+    assert estimate_tokens("x" * 10, "gpt-4") == 3  # ceil(10 / 4)
+
+
+def test_estimate_tokens_empty_text():
+    assert estimate_tokens("", "gpt-4") == 0
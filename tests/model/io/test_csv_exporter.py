@@ -106,3 +106,105 @@ def test_export_cleans_duplicate_chunk_id_columns(sample_processed_rows, tmp_pat
     saved_df = mock_csv.call_args[0][0] if mock_csv.call_args else None
     mock_merge.assert_called()
     mock_csv.assert_called_once()
+
+
+def save_results(saver, chunk_rows):
+    saver.save([
+        {
+            "source_id": source_id,
+            "chunk_id": chunk_id,
+            "prompt": "prompt",
+            "response": f"resp-{source_id}",
+            "model_version": "gemini-test",
+        }
+        for chunk_id, source_ids in chunk_rows.items()
+        for source_id in source_ids
+    ])
+
+
+def test_streaming_export_matches_in_memory_export(tmp_path):
+    from model.core.chunk.chunk_store import ChunkStoreWriter
+
+    json_path = tmp_path / "chunks.json"
+    with ChunkStoreWriter(str(json_path)) as writer:
+        first = writer.write_chunk(pd.DataFrame({"source_id": ["a", "b"], "orig_val": [1, 2]}))
+        second = writer.write_chunk(pd.DataFrame({"source_id": ["c"], "orig_val": [3]}))
+
+    with SQLiteResultSaver(tmp_path / "results.db") as saver:
+        save_results(saver, {second: ["c"], first: ["a", "b"]})
+        exp = CSVExporter(json_path=json_path, db_saver=saver)
+
+        exp.export_processed_with_original_rows(tmp_path / "full.csv")
+        written = exp.export_processed_streaming(tmp_path / "stream.csv", batch_size=1)
+
+    full_df = pd.read_csv(tmp_path / "full.csv").sort_values("source_id", ignore_index=True)
+    stream_df = pd.read_csv(tmp_path / "stream.csv").sort_values("source_id", ignore_index=True)
+
+    assert written == 3
+    assert list(stream_df.columns) == list(full_df.columns)
+    pd.testing.assert_frame_equal(stream_df, full_df)
+    assert list(stream_df["orig_val"]) == [1, 2, 3]
+
+
+def test_streaming_export_without_json_uses_database_columns(tmp_path, capsys):
+    with SQLiteResultSaver(tmp_path / "results.db") as saver:
+        save_results(saver, {"chunk-1": ["a"]})
+        exp = CSVExporter(json_path=tmp_path / "missing.json", db_saver=saver)
+        exp.export_processed_streaming(tmp_path / "out.csv")
+
+    assert "Warning: Chunk JSON file not found" in capsys.readouterr().out
+    out_df = pd.read_csv(tmp_path / "out.csv")
+    assert list(out_df["response"]) == ["resp-a"]
+
+
+def test_streaming_export_raises_when_no_processed_data(tmp_path):
+    with SQLiteResultSaver(tmp_path / "results.db") as saver:
+        exp = CSVExporter(json_path=tmp_path / "dummy.json", db_saver=saver)
+        with pytest.raises(ValueError, match="No processed data"):
+            exp.export_processed_streaming(tmp_path / "out.csv")
+
+    assert not (tmp_path / "out.csv").exists()
+
+
+def test_streaming_export_reads_each_chunk_once(tmp_path):
+    from model.core.chunk.chunk_store import ChunkStoreWriter, JsonlChunkStore
+
+    json_path = tmp_path / "chunks.json"
+    with ChunkStoreWriter(str(json_path)) as writer:
+        first = writer.write_chunk(pd.DataFrame({"source_id": ["a", "b"], "orig_val": [1, 2]}))
+        second = writer.write_chunk(pd.DataFrame({"source_id": ["c", "d"], "orig_val": [3, 4]}))
+
+    with SQLiteResultSaver(tmp_path / "results.db") as saver:
+        # Chunks saved interleaved, as concurrent dispatch does
+        for chunk_rows in ({first: ["a"]}, {second: ["c"]}, {first: ["b"]}, {second: ["d"]}):
+            save_results(saver, chunk_rows)
+        exp = CSVExporter(json_path=json_path, db_saver=saver)
+        with patch.object(JsonlChunkStore, "read_chunk", autospec=True,
+                          side_effect=JsonlChunkStore.read_chunk) as read_chunk:
+            assert exp.export_processed_streaming(tmp_path / "out.csv", batch_size=1) == 4
+
+    assert sorted(call.args[1] for call in read_chunk.call_args_list) == sorted([first, second])
+    out_df = pd.read_csv(tmp_path / "out.csv").sort_values("source_id")
+    assert list(out_df["orig_val"]) == [1, 2, 3, 4]
+
+
+def test_streaming_export_keeps_original_columns_after_stale_chunk(tmp_path):
+    from model.core.chunk.chunk_store import ChunkStoreWriter
+
+    json_path = tmp_path / "chunks.json"
+    with ChunkStoreWriter(str(json_path)) as writer:
+        current = writer.write_chunk(pd.DataFrame({"source_id": ["b", "c"], "name": ["Bo", "Cy"], "age": [4, 5]}))
+
+    with SQLiteResultSaver(tmp_path / "results.db") as saver:
+        # Results of a chunk from an earlier chunk file come first
+        save_results(saver, {"0-stale-chunk": ["a"]})
+        save_results(saver, {current: ["c", "b"]})
+        exp = CSVExporter(json_path=json_path, db_saver=saver)
+        exp.export_processed_streaming(tmp_path / "out.csv")
+
+    out_df = pd.read_csv(tmp_path / "out.csv")
+    assert list(out_df.columns[:3]) == ["source_id", "name", "age"]
+    assert list(out_df["source_id"]) == ["a", "c", "b"]
+    assert out_df["name"].isna()[0]
+    assert list(out_df["name"][1:]) == ["Cy", "Bo"]
+    assert list(out_df["age"][1:]) == [5, 4]
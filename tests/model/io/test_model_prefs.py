@@ -84,3 +84,18 @@ class TestModelPreference:
         self.model_prefs.model_list = ["model1", "model2"]
         del self.model_prefs.model_list
         assert self.model_prefs.model_list == []
+
+    def test_row_format_property(self):
+        # Test the row format defaults to the row-block layout and persists
+        assert self.model_prefs.row_format == "rows"
+        self.model_prefs.row_format = "table"
+        assert ModelPreference(db_path=self.db_path).row_format == "table"
+
+    def test_rate_limits_per_model(self):
+        assert self.model_prefs.get_rate_limits("gemini-2.0-flash") == (0, 0)
+
+        self.model_prefs.set_rate_limits("gemini-2.0-flash", 15, 1_000_000)
+        self.model_prefs.set_rate_limits("gemini-2.5-pro", 5, 250_000)
+
+        assert self.model_prefs.get_rate_limits("gemini-2.0-flash") == (15, 1_000_000)
+        assert self.model_prefs.get_rate_limits("gemini-2.5-pro") == (5, 250_000)
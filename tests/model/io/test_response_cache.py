@@ -0,0 +1,84 @@
+import types
+
+import pandas as pd
+import pytest
+import streamlit as st
+
+# Mock Streamlit secrets
+st.secrets = types.SimpleNamespace()
+st.secrets.is_local = True
+
+from model.io.response_cache import ResponseCache, row_cache_keys
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.db")
+    yield cache
+    cache.close()
+
+
+def test_get_many_returns_stored_responses_and_counts_rows(cache):
+    cache.put_many([("k1", "one"), ("k2", "two")])
+
+    assert cache.get_many(["k1", "missing", "k2"]) == {"k1": "one", "k2": "two"}
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    cache.reset_stats()
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_expired_entries_are_ignored_and_evicted(tmp_path, monkeypatch):
+    cache = ResponseCache(tmp_path / "cache.db", ttl_seconds=60)
+    clock = iter([1000.0, 1030.0, 1061.0, 1061.0])
+    monkeypatch.setattr("model.io.response_cache.time.time", lambda: next(clock))
+
+    cache.put_many([("old", "response")])
+    assert cache.get_many(["old"]) == {"old": "response"}
+    assert cache.get_many(["old"]) == {}
+
+    cache.put_many([("new", "response")])
+    assert len(cache) == 1
+    cache.close()
+
+
+def test_least_recently_used_entries_are_evicted_beyond_max_entries(tmp_path, monkeypatch):
+    cache = ResponseCache(tmp_path / "cache.db", max_entries=2)
+    clock = iter([1.0, 2.0, 3.0, 4.0, 5.0])
+    monkeypatch.setattr("model.io.response_cache.time.time", lambda: next(clock))
+
+    cache.put_many([("a", "A")])
+    cache.put_many([("b", "B")])
+    cache.get_many(["a"])
+    cache.put_many([("c", "C")])
+
+    assert cache.get_many(["a", "b", "c"]) == {"a": "A", "c": "C"}
+    cache.close()
+
+
+def test_entry_count_is_tracked_without_counting_the_table(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.db", max_entries=3)
+    cache.put_many([("a", "A"), ("b", "B")])
+    cache.put_many([("b", "B2"), ("c", "C"), ("c", "C")])
+    assert cache._entries == len(cache) == 3
+    cache.close()
+
+    # Reopening counts the stored entries once; later writes keep the count in memory
+    cache = ResponseCache(tmp_path / "cache.db", max_entries=3)
+    statements = []
+    cache._conn.set_trace_callback(statements.append)
+    cache.put_many([("d", "D")])
+    assert not any("COUNT(*) FROM response_cache;" in statement for statement in statements)
+    assert cache._entries == len(cache) == 3
+    cache.close()
+
+
+def test_row_cache_keys_ignore_source_id_and_depend_on_context():
+    df = pd.DataFrame({"text": ["a", "b", "a"], "source_id": ["1", "2", "3"]})
+    keys = row_cache_keys("prompt", df, "model", {"temperature": 0.2}, "rows")
+
+    assert keys[0] == keys[2] != keys[1]
+    assert row_cache_keys(" prompt\n", df, "model", {"temperature": 0.2}, "rows") == keys
+    assert row_cache_keys("prompt", df, "model", {"temperature": 0.9}, "rows")[0] != keys[0]
+    assert row_cache_keys("prompt", df, "other-model", {"temperature": 0.2}, "rows")[0] != keys[0]
+    assert row_cache_keys("prompt", df, "model", {"temperature": 0.2}, "csv")[0] != keys[0]
@@ -4,7 +4,12 @@ import tempfile
 import pytest
 from datetime import datetime, timezone
 
-from model.io.sqlite_result_saver import SQLiteResultSaver
+from model.io.sqlite_result_saver import (
+    RESULTS_SCHEMA_VERSION,
+    SOURCE_ID_QUERY_BATCH_SIZE,
+    SQLiteResultSaver,
+    text_hash,
+)
 
 
 @pytest.fixture
@@ -38,10 +43,10 @@ def test_database_schema(temp_db):
         (0, 'id', 'INTEGER', 0, None, 1),
         (1, 'source_id', 'TEXT', 1, None, 0),
         (2, 'chunk_id', 'TEXT', 1, None, 0),
-        (3, 'prompt', 'TEXT', 1, None, 0),
+        (3, 'prompt_hash', 'TEXT', 1, None, 0),
         (4, 'response', 'TEXT', 1, None, 0),
         (5, 'used_tokens', 'INTEGER', 0, None, 0),
-        (6, 'model_version', 'TEXT', 1, None, 0),
+        (6, 'model_hash', 'TEXT', 1, None, 0),
         (7, 'timestamp', 'TEXT', 1, None, 0)
     ]
     
@@ -171,3 +176,199 @@ def test_timestamp_is_utc(temp_db):
     
     assert before_save <= saved_timestamp <= after_save
     assert saved_timestamp.tzinfo == timezone.utc
+
+
+def test_saver_reuses_one_connection_in_wal_mode(temp_db):
+    """Test that one saver keeps a single WAL-mode connection until closed."""
+    # Given
+    with SQLiteResultSaver(temp_db) as saver:
+        connection = saver._conn
+        saver.save([{
+            'source_id': 'src1',
+            'chunk_id': 'chk1',
+            'prompt': 'Test prompt',
+            'response': 'Test response',
+            'model_version': 'gemini-1.0'
+        }])
+
+        # Then
+        assert saver.has_results()
+        assert saver._conn is connection
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        connection.execute("SELECT 1")
+
+
+def test_save_is_atomic_per_batch(temp_db):
+    """Test that a batch with an invalid row saves nothing."""
+    # Given
+    saver = SQLiteResultSaver(temp_db)
+    valid = {
+        'source_id': 'src1',
+        'chunk_id': 'chk1',
+        'prompt': 'Test prompt',
+        'response': 'Test response',
+        'model_version': 'gemini-1.0'
+    }
+    invalid = dict(valid, source_id='src2')
+    invalid.pop('response')
+
+    # When/Then
+    with pytest.raises(KeyError):
+        saver.save([valid, invalid])
+    assert saver.get_all() == []
+
+
+def test_database_indexes_and_version(temp_db):
+    """Test that lookup indexes exist and the schema version is recorded."""
+    # When
+    SQLiteResultSaver(temp_db).close()
+
+    # Then
+    with sqlite3.connect(temp_db) as conn:
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list(results)")}
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+    assert {"idx_results_chunk_id", "idx_results_model_timestamp", "idx_results_timestamp"} <= indexes
+    assert version == RESULTS_SCHEMA_VERSION
+
+
+def test_prompts_and_models_are_stored_once(temp_db):
+    """Test that repeated prompts and model versions share one lookup row."""
+    # Given
+    saver = SQLiteResultSaver(temp_db)
+    rows = [
+        {
+            'source_id': f'src{i}',
+            'chunk_id': 'chk1',
+            'prompt': 'Shared prompt',
+            'response': f'Response {i}',
+            'model_version': 'gemini-1.0'
+        }
+        for i in range(3)
+    ]
+
+    # When
+    saver.save(rows)
+
+    # Then
+    with sqlite3.connect(temp_db) as conn:
+        assert conn.execute("SELECT prompt_hash, prompt FROM prompts").fetchall() == [
+            (text_hash('Shared prompt'), 'Shared prompt')
+        ]
+        assert conn.execute("SELECT COUNT(*) FROM models").fetchone()[0] == 1
+    assert sorted(saver.has_source_ids(['src0', 'src2', 'missing'], 'Shared prompt')) == ['src0', 'src2']
+    assert saver.has_source_ids(['src0'], 'Other prompt') == []
+
+
+def test_legacy_database_is_migrated(temp_db):
+    """Test that a database with the single-table schema is migrated in place."""
+    # Given
+    with sqlite3.connect(temp_db) as conn:
+        conn.execute("""
+            CREATE TABLE results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source_id TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                response TEXT NOT NULL,
+                used_tokens INTEGER,
+                model_version TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                UNIQUE(source_id, prompt)
+            );
+        """)
+        conn.executemany(
+            "INSERT INTO results (source_id, chunk_id, prompt, response, used_tokens, model_version, timestamp)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                ('src1', 'chk1', 'Prompt A', 'Response 1', 10, 'gemini-1.0', '2024-01-01T00:00:00Z'),
+                ('src2', 'chk1', 'Prompt A', 'Response 2', None, 'gemini-1.0', '2024-01-01T00:00:01Z'),
+            ]
+        )
+
+    # When
+    saver = SQLiteResultSaver(temp_db)
+
+    # Then
+    results = saver.get_all()
+    assert [(r['source_id'], r['prompt'], r['response'], r['used_tokens'], r['model_version']) for r in results] == [
+        ('src1', 'Prompt A', 'Response 1', 10, 'gemini-1.0'),
+        ('src2', 'Prompt A', 'Response 2', None, 'gemini-1.0'),
+    ]
+    assert saver.has_source_ids(['src1'], 'Prompt A') == ['src1']
+
+    # Reopening an already migrated database leaves it untouched
+    saver.close()
+    assert len(SQLiteResultSaver(temp_db).get_all()) == 2
+
+
+def test_iter_results_streams_batches_grouped_by_chunk(temp_db):
+    """Test that results are streamed in bounded batches, by chunk and then in save order."""
+    # Given
+    saver = SQLiteResultSaver(temp_db)
+    saver.save([
+        {
+            'source_id': f'src{i}',
+            'chunk_id': f'chk{i % 2}',
+            'prompt': 'Test prompt',
+            'response': f'Response {i}',
+            'model_version': 'gemini-1.0'
+        }
+        for i in range(5)
+    ])
+
+    # When
+    batches = list(saver.iter_results(batch_size=2))
+
+    # Then
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    rows = [row for batch in batches for row in batch]
+    assert [row['source_id'] for row in rows] == ['src0', 'src2', 'src4', 'src1', 'src3']
+    assert rows[0]['prompt'] == 'Test prompt'
+    assert rows[0]['model_version'] == 'gemini-1.0'
+
+
+def test_has_source_ids_checks_more_ids_than_one_query_binds(temp_db):
+    """Test that source id lookups are batched below SQLite's parameter limit."""
+    # Given
+    saver = SQLiteResultSaver(temp_db)
+    count = SOURCE_ID_QUERY_BATCH_SIZE * 2 + 7
+    saver.save([
+        {
+            'source_id': f'src{i}',
+            'chunk_id': 'chk0',
+            'prompt': 'Test prompt',
+            'response': 'ok',
+            'model_version': 'gemini-1.0'
+        }
+        for i in range(0, count, 3)
+    ])
+
+    # When
+    found = saver.has_source_ids([f'src{i}' for i in range(count)], 'Test prompt')
+
+    # Then
+    assert sorted(found) == sorted(f'src{i}' for i in range(0, count, 3))
+
+
+def test_reassign_chunks_updates_every_prompt_of_a_row(temp_db):
+    """Test that stored results can be moved to new chunk ids after re-chunking."""
+    # Given
+    saver = SQLiteResultSaver(temp_db)
+    saver.save([
+        {'source_id': 'src1', 'chunk_id': 'old', 'prompt': 'Prompt A', 'response': 'a', 'model_version': 'm'},
+        {'source_id': 'src1', 'chunk_id': 'old', 'prompt': 'Prompt B', 'response': 'b', 'model_version': 'm'},
+        {'source_id': 'src2', 'chunk_id': 'old', 'prompt': 'Prompt A', 'response': 'c', 'model_version': 'm'},
+    ])
+
+    # When
+    saver.reassign_chunks({'src1': 'new1'})
+
+    # Then
+    assert [(r['source_id'], r['prompt'], r['chunk_id']) for r in saver.get_all()] == [
+        ('src1', 'Prompt A', 'new1'),
+        ('src1', 'Prompt B', 'new1'),
+        ('src2', 'Prompt A', 'old'),
+    ]
@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+import pytest
+
+from utils.cancellation_token import CancellationToken
+from utils.exceptions import OperationCancelledError
+
+
+def test_token_starts_active_and_cancels():
+    token = CancellationToken()
+    assert not token.cancelled
+    token.raise_if_cancelled()
+
+    token.cancel()
+    assert token.cancelled
+    with pytest.raises(OperationCancelledError):
+        token.raise_if_cancelled()
+
+
+def test_wait_returns_early_when_cancelled():
+    token = CancellationToken()
+    assert token.wait(0.01) is False
+
+    token.cancel()
+    start = time.monotonic()
+    assert token.wait(10) is True
+    assert time.monotonic() - start < 1
+
+
+@pytest.mark.asyncio
+async def test_async_wait_wakes_up_on_cancel():
+    token = CancellationToken()
+    assert await token.async_wait(0.01) is False
+
+    asyncio.get_running_loop().call_later(0.05, token.cancel)
+    start = time.monotonic()
+    assert await token.async_wait(10) is True
+    assert time.monotonic() - start < 1
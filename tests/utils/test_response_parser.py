@@ -0,0 +1,28 @@
+from utils.response_parser import (
+    format_indexed_responses, parse_indexed_responses, parse_response_lines, parse_row_responses
+)
+
+
+def test_parse_response_lines_keeps_line_order():
+    assert parse_response_lines("1: yes\nnoise\n2: no: really\n") == ["yes", "no: really"]
+
+
+def test_parse_indexed_responses_maps_row_numbers():
+    text = "Here you go\n2: second\n1: first\n2: duplicate\n 3 :third"
+    assert parse_indexed_responses(text) == {1: "first", 2: "second", 3: "third"}
+
+
+def test_parse_indexed_responses_accepts_row_prefix():
+    assert parse_indexed_responses("Row 1: ok\nrow 2:fine") == {1: "ok", 2: "fine"}
+
+
+def test_parse_row_responses_falls_back_to_line_positions():
+    assert parse_row_responses("a: x\nb: y", 2) == {1: "x", 2: "y"}
+    # Line count differs from the row count: only the numbered lines are trusted
+    assert parse_row_responses("2: y\nnote: z\nother: w", 2) == {2: "y"}
+
+
+def test_format_indexed_responses_round_trips():
+    text = format_indexed_responses(["a", "b"])
+    assert text == "1: a\n2: b"
+    assert parse_indexed_responses(text) == {1: "a", 2: "b"}
@@ -0,0 +1,46 @@
+import asyncio
+import threading
+
+from utils.exceptions import OperationCancelledError
+
+# Longest uninterrupted await in `CancellationToken.async_wait`
+_ASYNC_POLL_SECONDS = 0.25
+
+
+class CancellationToken:
+    """
+    Cooperative stop signal shared by a processing run and the requests it makes.
+
+    Nothing is interrupted forcibly: workers check the token between steps and
+    wait on it instead of sleeping, so a cancelled run winds down once in-flight
+    requests return or hit their deadline.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise OperationCancelledError()
+
+    def wait(self, seconds: float) -> bool:
+        """Sleeps up to ``seconds``, returning early with True once cancelled."""
+        return self._event.wait(max(0.0, seconds))
+
+    async def async_wait(self, seconds: float) -> bool:
+        """Async counterpart of `wait`, polling the token between short sleeps."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max(0.0, seconds)
+        while not self._event.is_set():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            await asyncio.sleep(min(remaining, _ASYNC_POLL_SECONDS))
+        return True
@@ -1,6 +1,8 @@
 from typing import Optional
 import pandas as pd
 from utils.result_type import ResultType
+from utils.retry_stats import RetryStats
+from utils.token_usage import TokenUsage
 
 
 class ChunkProcessResult:
@@ -11,7 +13,9 @@ class ChunkProcessResult:
             chunk: Optional[pd.DataFrame] = None,
             error: Optional[Exception] = None,
             remaining_tokens: Optional[int] = None,
-            chunk_id: Optional[str] = None
+            chunk_id: Optional[str] = None,
+            token_usage: Optional[TokenUsage] = None,
+            retry_stats: Optional[RetryStats] = None
     ):
         self.result_type = result_type
         self.response = response
@@ -19,3 +23,5 @@ class ChunkProcessResult:
         self.error = error
         self.remaining_tokens = remaining_tokens
         self.chunk_id = chunk_id
+        self.token_usage = token_usage
+        self.retry_stats = retry_stats
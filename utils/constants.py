@@ -4,10 +4,20 @@ from pathlib import Path
 from utils.env_manager import EnvManager
 
 JSON_CHUNK_VERSION = 1.0
+JSONL_CHUNK_VERSION = 2.0
+JSONL_CHUNK_FORMAT = "jsonl"
+SUPPORTED_CHUNK_VERSIONS = (JSON_CHUNK_VERSION, JSONL_CHUNK_VERSION)
+# Journaled chunk ids folded into the chunk file summary per compaction
+JOURNAL_COMPACT_INTERVAL = 100
+# How long a worker may hold a chunk before other workers can claim it
+DEFAULT_LEASE_SECONDS = 600
+# Interval at which a running processor renews the leases of the chunks it holds
+LEASE_HEARTBEAT_SECONDS = 60
 APP_NAME = "CSV PromptWiser"
 DATA_FOLDER_NAME = "data"
 RESULTS_FOLDER_NAME = "results"
 RESULTS_DB_NAME = "processed_chunks.db"
+RESPONSE_CACHE_DB_NAME = "response_cache.db"
 TEMP_FOLDER_NAME = "temp"
 CONFIG_FOLDER_NAME = "config"
 
@@ -20,6 +30,7 @@ RESULTS_DIR = os.path.join(APP_DIR, RESULTS_FOLDER_NAME)
 TEMP_DIR = os.path.join(APP_DIR, TEMP_FOLDER_NAME)
 CONFIG_DIR = os.path.join(APP_DIR, CONFIG_FOLDER_NAME)
 RESULTS_DB_PATH = os.path.join(RESULTS_DIR, RESULTS_DB_NAME)
+RESPONSE_CACHE_DB_PATH = os.path.join(RESULTS_DIR, RESPONSE_CACHE_DB_NAME)
 
 # Ensure required directories exist at import time
 for _dir in (DATA_DIR, RESULTS_DIR, TEMP_DIR, CONFIG_DIR):
@@ -30,6 +41,44 @@ JSON_CHUNK_FILE = os.path.join(TEMP_DIR, "chunks.json")
 
 DEFAULT_CHUNK_SIZE = 25
 DEFAULT_TOKEN_BUDGET = 10000
+# Result rows fetched from the database per batch when streaming an export
+DEFAULT_EXPORT_BATCH_SIZE = 5000
+# Distinct texts whose token counts PromptOptimizer keeps memoized
+TOKEN_COUNT_CACHE_SIZE = 4096
+# Rows tokenized when estimating the per-row token distribution of a dataset
+DEFAULT_TOKEN_SAMPLE_SIZE = 1000
+# Accepted chance that a recommended chunk exceeds the usable token limit
+DEFAULT_OVERFLOW_PROBABILITY = 0.01
+
+# Per-row response cache: entries expire after the TTL; least recently used go first beyond the size cap
+DEFAULT_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+DEFAULT_CACHE_MAX_ENTRIES = 1_000_000
+
+# Concurrent chunk processing
+DEFAULT_MAX_WORKERS = 4
+MAX_WORKERS_LIMIT = 32
+DEFAULT_ASYNC_CONCURRENCY = 64
+# Seconds a single model request may take before it is abandoned as timed out
+DEFAULT_REQUEST_TIMEOUT_SECONDS = 120
+# Retries: decorrelated jitter between the base and max delay; quota errors are
+# retried until the deadline instead of a fixed number of attempts
+DEFAULT_RETRY_ATTEMPTS = 3
+DEFAULT_RETRY_BASE_DELAY = 2
+DEFAULT_RETRY_MAX_DELAY = 60
+DEFAULT_QUOTA_RETRY_DEADLINE = 10 * 60
+# Circuit breaker: consecutive upstream failures that open it, and seconds before a probe
+DEFAULT_CIRCUIT_FAILURE_THRESHOLD = 5
+DEFAULT_CIRCUIT_RECOVERY_SECONDS = 30
+# Hedged requests: a request slower than this latency percentile gets a duplicate,
+# once enough latencies are known; hedges may spend this share of the remaining tokens
+DEFAULT_HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_SAMPLES = 20
+HEDGE_LATENCY_WINDOW = 200
+DEFAULT_HEDGE_TOKEN_RATIO = 0.1
+# Adaptive concurrency: a latency above this multiple of the smoothed latency counts
+# as congestion, and congestion or overload errors scale the limit by the backoff ratio
+CONCURRENCY_LATENCY_TOLERANCE = 2.0
+CONCURRENCY_BACKOFF_RATIO = 0.5
 
 # 🗄️ Model preference DB (shelve) file name and full path
 MODEL_PREFS_DB_NAME = "model_prefs.db"
@@ -40,6 +89,8 @@ MODEL_CONFIG_KEY = "gemini_model_config"
 REMAINING_TOTAL_TOKENS_KEY = "remaining_total_tokens"
 TOTAL_TOKENS_KEY = "total_tokens_key"
 CHUNK_SIZE_KEY = "chunk_size_key2"
+ROW_FORMAT_KEY = "row_format"
+RATE_LIMITS_KEY = "rate_limits"
 
 # 📝 Prompt preferences file
 PROMPT_PREF_PATH = Path(CONFIG_DIR) / ".prompt_pref.json"
@@ -48,11 +99,20 @@ PROMPT_PREF_PATH = Path(CONFIG_DIR) / ".prompt_pref.json"
 MODEL_PREFS_DB_NAME = "model_prefs.db"
 
 
+# Layout used to serialize chunk rows into the prompt (see model/core/llms/row_formats.py)
+DEFAULT_ROW_FORMAT = "rows"
+
 # Generation behavior
 DEFAULT_TEMPERATURE = 0.2
 DEFAULT_TOP_K = 40
 DEFAULT_TOP_P = 1.0
 
+# How many times the unanswered rows of a chunk are re-requested (split in half when
+# none came back) before the chunk is given up; 0 disables the repair
+DEFAULT_RESPONSE_REPAIR_DEPTH = 3
+# Upper bound on the re-requests made for one chunk across all repair levels
+DEFAULT_RESPONSE_REPAIR_CALLS = 4
+
 PROMPT_INSTRUCTION = """
     For each input row, output exactly one line, in order, formatted as:
     {row_index}: <your result>
@@ -1,4 +1,9 @@
 # utils/exceptions.py
+from typing import List
+
+from utils.token_usage import TokenUsage
+
+
 class TokenBudgetExceededError(Exception):
     """Raised when the token usage would exceed the remaining allowed tokens."""
 
@@ -9,3 +14,37 @@ class TokenBudgetExceededError(Exception):
         super().__init__(message)
         self.used_tokens = used_tokens
         self.remaining_tokens = remaining_tokens
+
+
+class RetriesExhaustedError(Exception):
+    """Raised when a retryable error persists after the retry policy gave up."""
+
+    def __init__(self, last_error: Exception, attempts: int):
+        super().__init__(f"Gave up after {attempts} attempts: {last_error}")
+        self.last_error = last_error
+        self.attempts = attempts
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the model while its circuit breaker is open."""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"Circuit breaker is open; next probe in {retry_in:.0f}s.")
+        self.retry_in = retry_in
+
+
+class OperationCancelledError(Exception):
+    """Raised when a processing run was cancelled before a request could be made."""
+
+    def __init__(self):
+        super().__init__("Processing was cancelled.")
+
+
+class IncompleteResponseError(Exception):
+    """Raised when rows of a chunk are still unanswered after re-requesting and splitting them."""
+
+    def __init__(self, missing_rows: List[int], usage: TokenUsage):
+        rows = ", ".join(str(row + 1) for row in missing_rows)
+        super().__init__(f"The model did not answer row(s) {rows} of the chunk.")
+        self.missing_rows = missing_rows  # 0-based positions in the chunk
+        self.usage = usage  # tokens spent on the chunk, including the re-requests
@@ -1,6 +1,18 @@
 import streamlit as st
 from model.io.model_prefs import ModelPreference
+from model.io.response_cache import ResponseCache
+from model.io.sqlite_result_saver import SQLiteResultSaver
 
 @st.cache_resource
 def get_model_prefs():
-    return ModelPreference()
\ No newline at end of file
+    return ModelPreference()
+
+
+@st.cache_resource
+def get_result_saver():
+    return SQLiteResultSaver()
+
+
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache()
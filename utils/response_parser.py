@@ -0,0 +1,48 @@
+import re
+from typing import Dict, List, Sequence
+
+# "<row number>: <response>", the line format requested by PROMPT_INSTRUCTION; models
+# often echo the "Row <n>:" headers of the default row layout, so that prefix is accepted too
+INDEXED_LINE_PATTERN = re.compile(r"^\s*(?:row\s*)?(\d+)\s*:\s?(.*)$", re.IGNORECASE)
+
+
+def parse_response_lines(text: str) -> List[str]:
+    """Per-row responses of a chunk, in line order, taken from every line containing a colon."""
+    return [line.split(":", 1)[1].strip() for line in text.strip().splitlines() if ":" in line]
+
+
+def parse_indexed_responses(text: str) -> Dict[int, str]:
+    """
+    Per-row responses keyed by their 1-based row number.
+
+    Lines that do not start with a row number are ignored; when a row number
+    appears more than once, its first line wins.
+    """
+    responses: Dict[int, str] = {}
+    for line in text.strip().splitlines():
+        match = INDEXED_LINE_PATTERN.match(line)
+        if match:
+            responses.setdefault(int(match.group(1)), match.group(2).strip())
+    return responses
+
+
+def parse_row_responses(text: str, row_count: int) -> Dict[int, str]:
+    """
+    Per-row responses of a chunk of ``row_count`` rows, keyed by 1-based row number.
+
+    Numbered lines are used when they answer every row. Otherwise, when the response
+    has exactly one line with a colon per row (what the saver accepts), the lines are
+    matched to the rows by position.
+    """
+    responses = parse_indexed_responses(text)
+    if all(number in responses for number in range(1, row_count + 1)):
+        return responses
+    lines = parse_response_lines(text)
+    if len(lines) == row_count:
+        return dict(enumerate(lines, start=1))
+    return responses
+
+
+def format_indexed_responses(responses: Sequence[str]) -> str:
+    """Inverse of `parse_indexed_responses` for rows numbered from 1."""
+    return "\n".join(f"{number}: {response}" for number, response in enumerate(responses, start=1))
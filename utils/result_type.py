@@ -7,4 +7,6 @@ class ResultType(Enum):
     FATAL_ERROR = auto()
     UNEXPECTED_ERROR = auto()
     NO_MORE_CHUNKS = auto()
-    TOKENS_BUDGET_EXCEEDED = auto()
\ No newline at end of file
+    TOKENS_BUDGET_EXCEEDED = auto()
+    CIRCUIT_OPEN = auto()
+    CANCELLED = auto()
@@ -0,0 +1,13 @@
+class RetryStats:
+    """Attempts made and seconds spent waiting between them, for one request."""
+
+    def __init__(self):
+        self.attempts = 0
+        self.sleep_seconds = 0.0
+
+    @property
+    def retries(self) -> int:
+        return max(0, self.attempts - 1)
+
+    def __repr__(self):
+        return f"RetryStats(attempts={self.attempts}, sleep_seconds={self.sleep_seconds:.1f})"
@@ -0,0 +1,18 @@
+from typing import NamedTuple
+
+
+class TokenUsage(NamedTuple):
+    """Token breakdown of a single LLM call."""
+    input_tokens: int
+    output_tokens: int
+    total_tokens: int
+    estimated: bool = False  # True when counted locally instead of reported by the API
+
+    def combined(self, other: "TokenUsage") -> "TokenUsage":
+        """Usage of two calls made for the same chunk."""
+        return TokenUsage(
+            self.input_tokens + other.input_tokens,
+            self.output_tokens + other.output_tokens,
+            self.total_tokens + other.total_tokens,
+            self.estimated or other.estimated,
+        )